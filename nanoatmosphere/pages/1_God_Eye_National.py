@@ -1,9 +1,13 @@
+import os
 import streamlit as st
 import folium
+from pathlib import Path
 from datetime import datetime
 from streamlit_folium import st_folium
-import rasterio
-import numpy as np
+from src.data_engine.derived_rasters import risk_histogram
+from src.data_engine.raster_registry import get_meta, raster_version
+from src.ui_components.no2_overlay import get_overlay
+from src.ui_components.tile_server import RENDERER, start_tile_server, tile_url
 
 if "user_logs" not in st.session_state:
     st.session_state.user_logs = []
@@ -18,30 +22,62 @@ st.session_state.user_logs.append({
 # ─── BACK BUTTON + AUTH GUARD ───
 if st.button("🏠 ← Back to Home", use_container_width=False):
     st.switch_page("app.py")
-# 1) Load NO2 raster you exported from GEE
-@st.cache_resource
-def load_no2():
-    src = rasterio.open("nanoatmosphere/data/NO2_Chennai.tif")
-    arr = src.read(1)
-    bounds = src.bounds
-    return src, arr, bounds
-
-src, arr, bounds = load_no2()
-
-# 2) Build base map
-center = [(bounds.top + bounds.bottom)/2, (bounds.left + bounds.right)/2]
-m = folium.Map(location=center, zoom_start=11, tiles="CartoDB dark_matter")
-
-# 3) Add heat layer (simple normalization)
-arr_norm = (arr - np.nanmin(arr)) / (np.nanmax(arr) - np.nanmin(arr))
-# You can convert this into points for HeatMap later; for demo, just show a bounds rectangle
-
-folium.Rectangle(
-    bounds=[[bounds.bottom, bounds.left], [bounds.top, bounds.right]],
-    color="#ff0000",
-    fill=True,
-    fill_opacity=0.2,
-).add_to(m)
+# 1) NO2 raster you exported from GEE
+# (opened lazily through the shared raster registry, reloaded if the file changes)
+NO2_PATH = "nanoatmosphere/data/NO2_Chennai.tif"
+
+# 2) Build base map + colorized NO2 layer, once per raster version
+# Tiles come from the local tile server; set NO2_TILES=0 to embed a single image instead
+USE_TILE_SERVER = os.getenv("NO2_TILES", "1") != "0"
+
+@st.cache_resource(max_entries=4)
+def build_map(version, use_tiles):
+    meta = get_meta(NO2_PATH)
+    b = meta.bounds
+    south, west, north, east = b.bottom, b.left, b.top, b.right
+    center = [(north + south) / 2, (west + east) / 2]
+    m = folium.Map(location=center, zoom_start=11, tiles="CartoDB dark_matter")
+
+    # 3) Heat layer: only the tiles in view are rendered (and cached) by the server
+    if use_tiles:
+        layer = Path(NO2_PATH).stem
+        start_tile_server()
+        vmin, vmax = RENDERER.limits(layer)
+        folium.TileLayer(
+            tiles=tile_url(layer),
+            attr="Kalam NanoAtmosphere · Sentinel‑5P NO₂",
+            name="NO₂",
+            overlay=True,
+            opacity=0.75,
+        ).add_to(m)
+    else:
+        overlay = get_overlay(NO2_PATH)
+        vmin, vmax = overlay.vmin, overlay.vmax
+        folium.raster_layers.ImageOverlay(
+            image=overlay.url,
+            bounds=[[south, west], [north, east]],
+            opacity=0.75,
+            name="NO₂",
+            interactive=False,
+        ).add_to(m)
+    folium.Rectangle(
+        bounds=[[south, west], [north, east]],
+        color="#ff0000",
+        fill=False,
+    ).add_to(m)
+    return m, (vmin, vmax)
+
+m, (vmin, vmax) = build_map(raster_version(NO2_PATH), USE_TILE_SERVER)
+st.caption(f"NO₂ overlay: green ≈ {vmin:.1e} → purple ≈ {vmax:.1e} mol/m²")
+
+# Area per risk band, read from the precomputed risk raster (derived once per source)
+@st.cache_data(max_entries=4)
+def risk_breakdown(version):
+    return risk_histogram(NO2_PATH)
+
+cols = st.columns(3)
+for col, (label, band) in zip(cols, risk_breakdown(raster_version(NO2_PATH)).items()):
+    col.metric(f"{label} risk area", f"{band['area_km2']:,.0f} km²", help=f"{band['pixels']:,} pixels")
 
 # 4) Render + capture click
 st.write("Click on the map to probe a micro-cloud.")
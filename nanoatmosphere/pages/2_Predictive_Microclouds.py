@@ -1,6 +1,9 @@
 import streamlit as st
 from datetime import datetime
-from src.data_engine.no2_sampler import get_no2_at_latlon
+from src.data_engine.mosaic import get_no2_national, neighborhood_national
+from src.ai_core.breathability import score_no2
+from src.ai_core.forecast_precompute import precomputed_forecast_at
+from src.ai_core.trend_model import trend_at
 
 if "user_logs" not in st.session_state:
     st.session_state.user_logs = []
@@ -30,25 +33,52 @@ else:
     lat, lon = st.session_state["clicked_point"]
     st.info(f"Analyzing micro‑zone at {lat:.4f}, {lon:.4f}")
 
-    no2_val = get_no2_at_latlon(lat, lon)
-    # Simple Breathability Index (you can improve later):
-    # assume 0.00005 = perfect, 0.00025 = worst
-    min_v, max_v = 0.00005, 0.00025
-    norm = max(0.0, min(1.0, (no2_val - min_v) / (max_v - min_v)))
-    breathability = (1 - norm) * 100
-
-    risk = "Low"
-    if breathability < 80:
-        risk = "Medium"
-    if breathability < 60:
-        risk = "High"
+    # Bilinear value is stable near pixel edges; the 2 km disk gives the local spread
+    no2_val = get_no2_national(lat, lon, mode="bilinear")
+    local = neighborhood_national(lat, lon, radius_km=2.0)
+    # Breathability Index + risk band scored from that same NO₂ value, so the
+    # three headline metrics agree (0.00005 = perfect, 0.00025 = worst)
+    score = score_no2(no2_val)
+    breathability, risk = float(score.breathability), str(score.risk_label)
 
     c1, c2, c3 = st.columns(3)
     c1.metric("Breathability Index", f"{breathability:.0f}/100")
     c2.metric("Risk Level", risk)
     c3.metric("NO₂ (mol/m²)", f"{no2_val:.1e}")
+    if local["count"]:
+        st.caption(
+            f"Within 2 km: NO₂ {local['mean']:.1e} ± {local['std']:.1e} mol/m² "
+            f"(range {local['min']:.1e}–{local['max']:.1e}, {local['count']:.0f} tiles)"
+        )
+
+    # 24–72h outlook, read from the scheduled precompute run (nothing is fitted here)
+    forecast = precomputed_forecast_at(lat, lon)
+    if forecast is None:
+        st.info(
+            "Forecast not yet computed for this area. "
+            "Run `python -m src.ai_core.forecast_precompute` to generate it."
+        )
+    elif all(f["no2"] == f["no2"] for f in forecast.values()):
+        st.subheader("Breathability Forecast")
+        cols = st.columns(len(forecast))
+        for col, (hours, f) in zip(cols, forecast.items()):
+            col.metric(
+                f"+{hours}h",
+                f"{f['breathability']:.0f}/100",
+                delta=f"{f['breathability'] - breathability:+.0f}",
+                help=f"NO₂ ≈ {f['no2']:.1e} mol/m² · {f['risk']} risk",
+            )
+
+    # Least-squares trend, written by the forecast precompute job (no fitting here)
+    trend = trend_at(lat, lon, hours_ahead=24)
+    if trend["expected"] == trend["expected"]:
+        direction = "rising" if trend["slope_per_day"] > 0 else "falling"
+        st.caption(
+            f"Trend: NO₂ {direction} by {abs(trend['slope_per_day']):.1e} mol/m² per day · "
+            f"expected next value {trend['expected']:.1e} mol/m²"
+        )
 layer = st.session_state.get("time_layer", "Recent")
-no2_val = get_no2_at_latlon(lat, lon, layer)
+no2_val = get_no2_national(lat, lon, layer, mode="bilinear")
 with st.expander("What does this mean?"):
     st.markdown(
         f"""
@@ -1,9 +1,14 @@
 import os
-import textwrap
 import streamlit as st
 from datetime import datetime
-import google.generativeai as genai
 import google.api_core.exceptions as gexceptions
+from src.ai_core.gemini_client import CircuitOpenError, get_gemini_client
+from src.ai_core.gemini_stream import StreamStats, stream_generate
+from src.ai_core.policy_advisor import GEMINI_MODEL, GENERATION_CONFIG, PREDEFINED_FALLBACK, build_policy_prompt
+from src.ai_core.retrieval import build_context
+from src.data_engine.city_profiles import CITY_GASES
+from src.data_engine.spatial_index import nearest_city
+from src.ui_components.chat_interface import ChatEngine
 
 # ─── BACK BUTTON + AUTH GUARD ───
 if st.button("🏠 ← Back to Home", use_container_width=False):
@@ -21,9 +26,6 @@ st.session_state.user_logs.append({
 
 # ---------- GEMINI / GenAI CONFIG ----------
 
-# Choose a fast model that exists in your account
-GEMINI_MODEL = "gemini-2.5-flash"
-
 API_KEY = os.getenv("GEMINI_API_KEY")
 if not API_KEY:
     st.error(
@@ -32,93 +34,59 @@ if not API_KEY:
     )
     st.stop()
 
-genai.configure(api_key=API_KEY)
-model = genai.GenerativeModel(GEMINI_MODEL)
-
-# ---------- PROMPT BUILDING ----------
-
-SYSTEM_INSTRUCTION = """
-You are Kalam NanoAtmosphere, an AI co-pilot helping Indian city officials reduce
-urban NO2, SO2, and CO from traffic and industry.
-
-Rules:
-- Be concise and practical, prefer bullet points.
-- Always quantify impact using Kalam NanoAtmosphere terms:
-  - Breathability Index (0–100, higher is better).
-  - Risk Level: Low / Medium / High.
-- Assume Sentinel-5P satellite inputs at ~1 km resolution.
-- Suggest levers like odd-even traffic, diesel bans, low-emission zones,
-  school-time red alerts, and industrial stack controls.
-- Always close with 3 concrete actions that can be done in the next 30 days.
-"""
-
-def build_policy_prompt(city: str,
-                        baseline_no2: float,
-                        breathe_score: float,
-                        risk_level: str,
-                        user_goal: str) -> str:
-    prompt = f"""
-    {SYSTEM_INSTRUCTION}
-
-    City: {city}
-    Current NO2 (mol/m²): {baseline_no2:.1e}
-    Current Breathability Index: {breathe_score:.0f}/100
-    Current Risk Level: {risk_level}
-
-    Policy maker's goal (from user): {user_goal}
-
-    Tasks:
-    1. Briefly explain what the current numbers mean in plain language.
-    2. Propose 3–5 targeted interventions tailored to this city.
-    3. For each intervention, estimate:
-       - Expected NO2 change (approx %).
-       - Expected Breathability improvement (points).
-       - Implementation difficulty: Low / Medium / High.
-    4. Highlight any trade-offs (traffic, economy, schools, etc.).
-    5. Give a 30-day action plan as 3 bullet points.
-
-    Use short bullet lists, no long paragraphs.
-    """
-    return textwrap.dedent(prompt).strip()
+# One configured client per process, shared by every session and rerun
+model = get_gemini_client(API_KEY, GEMINI_MODEL)
+chat_engine = ChatEngine(model, model_name=GEMINI_MODEL)
 
 # ---------- GEMINI CALL WITH QUOTA HANDLING ----------
-PREDEFINED_FALLBACK = """
-Kalam NanoAtmosphere AI is currently unavailable, so this is a cached playbook for Indian urban micro-zones.
-
-- Tighten traffic around schools and hospitals during peak hours using dynamic diversion and no-parking rings.
-- Enforce no-idling and stricter checks on old diesel vehicles and autos in the dirtiest corridors first.
-- Upgrade or retrofit a small set of top-emitting industrial stacks with low-NOₓ burners and continuous monitoring.
-- Use red / orange alert days to push work-from-home, staggered school timings, and public transport fare discounts.
-- Run one weekly 'clean corridor' where only public transport and EVs are allowed for a fixed 2–3 hour window.
-
-Expected impact (if seriously enforced in the focus micro-zones):
-- NO₂ reduction: roughly 15–25% over 6 months.
-- Breathability Index: +10 to +18 points.
-- Risk Level: can often shift from High → Medium, or Medium → Low for the target corridor.
-"""
-
-def call_gemini_policy_advisor(prompt: str) -> str:
+
+def call_gemini_policy_advisor(prompt: str, placeholder, chunks=None, stats=None) -> str:
+    """
+    Stream Gemini's answer into `placeholder` as it arrives.
+
+    `chunks` replaces the one-shot stream, e.g. with a follow-up from
+    ChatEngine.send() (which must have been given the same `stats`).
+
+    If the call fails, at the start or partway through, the partial text
+    is replaced by PREDEFINED_FALLBACK.
+    """
     if not API_KEY:
         st.error("No GEMINI_API_KEY found. Please set it to use the AI Advisor.")
         return PREDEFINED_FALLBACK
 
+    stats = StreamStats() if stats is None else stats
     try:
         if not GEMINI_MODEL:
             st.error("GEMINI_MODEL is not set. Please specify a valid model name.")
             return PREDEFINED_FALLBACK
 
-        response = model.generate_content(
-            contents=prompt,
-            generation_config={
-                "temperature": 0.4,
-                "max_output_tokens": 2048,
-            },
-        )
-        text = response.text
+        # Identical prompts are answered from the on-disk response cache
+        if chunks is None:
+            chunks = stream_generate(model, prompt, GENERATION_CONFIG, stats, model_name=GEMINI_MODEL)
+        text = ""
+        for chunk in chunks:
+            text += chunk
+            placeholder.markdown(text + " ▌")
         if not text:
             st.warning("Gemini AI returned an empty response. Using fallback.")
             return PREDEFINED_FALLBACK
+        if stats.from_cache:
+            st.caption("Served from the advisor cache (same inputs as an earlier request).")
+        else:
+            st.caption(
+                f"First words after {stats.first_chunk_s:.1f}s · "
+                f"full answer in {stats.total_s:.1f}s"
+            )
         return text
+    except CircuitOpenError as e:
+        st.info(
+            "Gemini AI has been failing, so Kalam NanoAtmosphere is answering from "
+            f"the playbook for now. It will try Gemini again in about {e.retry_in:.0f}s."
+        )
+        return PREDEFINED_FALLBACK
+    except gexceptions.DeadlineExceeded:
+        st.warning("Gemini AI took too long to answer. Using fallback.")
+        return PREDEFINED_FALLBACK
     except gexceptions.ResourceExhausted:
         st.warning(
             "Gemini AI quota exhausted or billing not enabled. "
@@ -152,10 +120,16 @@ st.write(
 col_left, col_right = st.columns([2, 3])
 
 with col_left:
+    # Default to the city nearest the point clicked on the God-Eye map
+    cities = sorted(CITY_GASES)
+    default_city = "Chennai"
+    if "clicked_point" in st.session_state:
+        default_city, _ = nearest_city(*st.session_state["clicked_point"])
+
     city = st.selectbox(
         "Select city",
-        ["Chennai", "Delhi", "Mumbai"],
-        index=0,
+        cities,
+        index=cities.index(default_city) if default_city in cities else 0,
     )
 
     baseline_no2 = st.number_input(
@@ -191,19 +165,62 @@ with col_right:
     st.subheader("Advisor Output")
 
     if ask_button:
-        with st.spinner("Consulting Gemini policy brain..."):
-            full_prompt = build_policy_prompt(
-                city=city,
-                baseline_no2=baseline_no2,
-                breathe_score=breathe_score,
-                risk_level=risk_level,
-                user_goal=user_goal,
-            )
-            advice = call_gemini_policy_advisor(full_prompt)
-
-        st.markdown(advice)
+        # A few of the most relevant local snippets, within a small token budget
+        context = build_context(user_goal, city=city)
+        full_prompt = build_policy_prompt(
+            city=city,
+            baseline_no2=baseline_no2,
+            breathe_score=breathe_score,
+            risk_level=risk_level,
+            user_goal=user_goal,
+            context=context,
+        )
+        output = st.empty()
+        output.info("Consulting Gemini policy brain...")
+        advice = call_gemini_policy_advisor(full_prompt, output)
+        output.markdown(advice)
+
+        # Follow-ups continue from this answer, with the same numbers as context
+        conv = chat_engine.start(
+            context=(
+                f"City: {city}; baseline NO₂ {baseline_no2:.2e} mol/m²; "
+                f"Breathability Index {breathe_score}/100; risk {risk_level}."
+            ),
+            question=user_goal,
+            answer=advice,
+            owner=st.session_state.get("user_email", "guest"),
+            fallback=advice == PREDEFINED_FALLBACK,
+        )
+        st.session_state["advisor_chat_id"] = conv.id
+    elif "advisor_chat_id" in st.session_state:
+        st.caption("Latest advice (ask follow-ups below):")
+        conv = chat_engine.store.load(st.session_state["advisor_chat_id"])
+        if conv is not None and len(conv.turns) >= 2:
+            st.markdown(conv.turns[1]["text"])
     else:
         st.info(
             "Set the city, NO₂ baseline, Breathability Index, and your policy goal, "
             "then click **Ask Kalam NanoAtmosphere AI Advisor** to generate a strategy."
         )
+
+# ---------- FOLLOW-UP CHAT ----------
+
+if "advisor_chat_id" in st.session_state:
+    conv = chat_engine.store.load(st.session_state["advisor_chat_id"])
+    if conv is not None:
+        st.divider()
+        st.subheader("Follow-up chat")
+        for turn in conv.turns[2:]:
+            with st.chat_message(turn["role"]):
+                st.markdown(turn["text"])
+
+        question = st.chat_input("Ask a follow-up about this plan")
+        if question:
+            with st.chat_message("user"):
+                st.markdown(question)
+            with st.chat_message("assistant"):
+                reply = st.empty()
+                stats = StreamStats()
+                reply.markdown(call_gemini_policy_advisor(
+                    question, reply, chunks=chat_engine.send(conv, question, stats), stats=stats,
+                ))
@@ -1,6 +1,10 @@
 import streamlit as st
 from datetime import datetime
-from src.data_engine.no2_sampler import get_no2_at_latlon
+from src.data_engine.mosaic import get_no2_national, neighborhood_national
+from src.ai_core.breathability import RISK_HIGH, breathability_index, score_no2
+from src.ai_core.spatial_whatif import Intervention, apply_interventions, corridor_mask, disk_mask, grid_at
+from src.ai_core.whatif import LEVERS, cheapest_package, pareto_frontier, policy_cost, policy_reduction, sweep, uncertainty_for
+from src.ui_components.no2_overlay import colorize
 
 # ─── BACK BUTTON + AUTH GUARD ───
 if st.button("🏠 ← Back to Home", use_container_width=False):
@@ -31,12 +35,10 @@ lat, lon = st.session_state["clicked_point"]
 st.info(f"Analyzing micro‑zone at {lat:.4f}, {lon:.4f}")
 
 # 2) Get baseline NO2 and Breathability
-no2_base = get_no2_at_latlon(lat, lon)
+no2_base = get_no2_national(lat, lon)
 
-# Same simple Breathability formula you used in Predictive page
-min_v, max_v = 0.00005, 0.00025
-norm_base = max(0.0, min(1.0, (no2_base - min_v) / (max_v - min_v)))
-breathe_base = (1 - norm_base) * 100
+# Same Breathability engine used by the Predictive page
+breathe_base = float(breathability_index(no2_base))
 
 col_base1, col_base2 = st.columns(2)
 col_base1.metric("Baseline NO₂", f"{no2_base:.1e} mol/m²")
@@ -47,42 +49,24 @@ st.markdown("---")
 # 3) Policy sliders (impact assumptions in % NO2 reduction)
 st.subheader("Policy Levers")
 
-col1, col2, col3 = st.columns(3)
-
-trees = col1.slider(
-    "Urban trees / green buffers (units)",
-    min_value=0,
-    max_value=2000,
-    value=500,
-    step=100,
-)
-buses = col2.slider(
-    "Electric / low‑emission buses (lines)",
-    min_value=0,
-    max_value=50,
-    value=10,
-    step=5,
-)
-trucks = col3.slider(
-    "Truck‑time restrictions (hours/day)",
-    min_value=0,
-    max_value=12,
-    value=4,
-    step=1,
-)
+levels = {}
+for col, lever in zip(st.columns(len(LEVERS)), LEVERS):
+    levels[lever.name] = col.slider(
+        lever.label,
+        min_value=lever.min_value,
+        max_value=lever.max_value,
+        value=lever.default,
+        step=lever.step,
+    )
 
 # 4) Convert policies to NO2 reduction (simple illustrative math)
-# You can tweak these coefficients to change strength.
-reduction_trees = 0.00000001 * trees      # 1e‑11 per tree unit
-reduction_buses = 0.00000005 * buses      # 5e‑10 per bus line
-reduction_trucks = 0.0000001 * trucks     # 1e‑9 per restricted hour
-
-total_reduction = reduction_trees + reduction_buses + reduction_trucks
+# The per-lever coefficients and costs live in src/ai_core/whatif.py
+total_reduction = policy_reduction(levels)
 
 no2_new = max(no2_base - total_reduction, 0.0)
 
-norm_new = max(0.0, min(1.0, (no2_new - min_v) / (max_v - min_v)))
-breathe_new = (1 - norm_new) * 100
+score_new = score_no2(no2_new)
+breathe_new = float(score_new.breathability)
 
 improvement = breathe_new - breathe_base
 
@@ -100,21 +84,120 @@ c3.metric(
     "Total Policy Effect",
     f"{total_reduction:.1e} mol/m² NO₂ reduction",
 )
-if breathe_new >= 80:
-    label = "Healthy"
-elif breathe_new >= 60:
-    label = "Caution"
-else:
-    label = "Unhealthy"
-if breathe_new >= 80:
-    scenario = "Safe"
-elif breathe_new >= 60:
-    scenario = "Improved but caution"
-else:
-    scenario = "Still unsafe"
+label = str(score_new.status_label)
+scenario = ("Safe", "Improved but caution", "Still unsafe")[min(int(score_new.risk_code), RISK_HIGH)]
 
 st.write(f"Kalam NanoAtmosphere rates this scenario as: **{scenario} air quality**.")
 st.write(f"Kalam NanoAtmosphere rating for this scenario: **{label} air**.")
+st.caption(f"Estimated package cost: ₹{policy_cost(levels):,.0f} lakh")
+
+# Coefficients above are point guesses; sample them (and the local NO2
+# spread) to see how sure the outcome is. Memoised per location + levers.
+if no2_base == no2_base and st.toggle("Show uncertainty bands (Monte Carlo)"):
+    bands = uncertainty_for(
+        (lat, lon), no2_base, levels,
+        no2_std=neighborhood_national(lat, lon)["std"],
+    )
+    u1, u2, u3 = st.columns(3)
+    u1.metric(
+        "NO₂ (median)",
+        f"{bands.no2[2]:.1e} mol/m²",
+        help=f"90% band {bands.no2[0]:.1e}–{bands.no2[-1]:.1e}, 50% band {bands.no2[1]:.1e}–{bands.no2[3]:.1e}",
+    )
+    u2.metric(
+        "Breathability (median)",
+        f"{bands.breathability[2]:.0f}/100",
+        help=f"90% band {bands.breathability[0]:.0f}–{bands.breathability[-1]:.0f}",
+    )
+    u3.metric("Chance of High risk", f"{bands.p_high_risk:.0%}")
+    st.caption(
+        f"{bands.draws:,} draws · 90% of outcomes land between "
+        f"{bands.breathability[0]:.0f} and {bands.breathability[-1]:.0f}/100"
+    )
+
+st.markdown("---")
+
+# 6) Sweep every lever combination at once
+st.subheader("Policy Sweep")
+result = sweep(no2_base)
+target = st.slider("Target Breathability Index", min_value=0, max_value=100, value=80, step=5)
+best = cheapest_package(result, target)
+if best is None:
+    st.warning(
+        f"None of the {len(result.cost):,} packages reaches {target}/100 here "
+        f"(best possible: {result.breathability.max():.0f}/100)."
+    )
+else:
+    p = result.package(best)
+    st.success(
+        f"Cheapest package reaching {target}/100: {p['trees']} tree units, "
+        f"{p['buses']} bus lines, {p['trucks']} h/day truck limits · "
+        f"₹{p['cost']:,.0f} lakh → {p['breathability']:.0f}/100"
+    )
+
+frontier = pareto_frontier(result.cost, result.breathability)
+if len(frontier):
+    st.caption(
+        f"Cost vs. Breathability frontier over {len(result.cost):,} packages "
+        "(no other package is both cheaper and better)"
+    )
+    st.line_chart(
+        {
+            "Cost (₹ lakh)": result.cost[frontier],
+            "Breathability": result.breathability[frontier],
+        },
+        x="Cost (₹ lakh)",
+        y="Breathability",
+    )
+    st.dataframe([result.package(i) for i in frontier], hide_index=True, use_container_width=True)
+
+st.markdown("---")
+
+# 7) Spatial mode: place the levers as masks and let the effect disperse
+st.subheader("Spatial Impact")
+grid = grid_at(lat, lon)
+if grid is None:
+    st.info("No NO₂ raster covers this micro‑zone, so the spatial mode is unavailable.")
+else:
+    no2_grid, transform = grid
+    s1, s2, s3, s4 = st.columns(4)
+    buffer_km = s1.slider("Green buffer radius (km)", 0.5, 10.0, 2.0, 0.5)
+    corridor_dir = s2.selectbox("Truck / bus corridor", ["East–West", "North–South"])
+    corridor_km = s3.slider("Corridor length (km)", 1.0, 30.0, 10.0, 1.0)
+    dispersion_km = s4.slider("Dispersion (km)", 0.0, 5.0, 1.0, 0.5)
+
+    half_deg = corridor_km / 2 / 111.0
+    if corridor_dir == "East–West":
+        ends = (lat, lon - half_deg), (lat, lon + half_deg)
+    else:
+        ends = (lat - half_deg, lon), (lat + half_deg, lon)
+    buffer = disk_mask(transform, no2_grid.shape, lat, lon, buffer_km)
+    corridor = corridor_mask(transform, no2_grid.shape, *ends, width_km=1.0)
+    spatial = apply_interventions(
+        no2_grid,
+        transform,
+        [
+            Intervention("trees", buffer, levels["trees"]),
+            Intervention("buses", corridor, levels["buses"]),
+            Intervention("trucks", corridor, levels["trucks"]),
+        ],
+        dispersion_km=dispersion_km,
+    )
+
+    impact = spatial.impact
+    m1, m2, m3 = st.columns(3)
+    m1.metric(
+        "Area‑weighted Breathability",
+        f"{impact['mean_after']:.1f}/100",
+        delta=f"{impact['mean_after'] - impact['mean_before']:+.2f}",
+    )
+    m2.metric("Area improved ≥1 point", f"{impact['improved_km2']:,.0f} km²")
+    m3.metric("Area leaving High risk", f"{impact['left_high_risk_km2']:,.0f} km²")
+
+    # Red = low breathability, same ramp as the NO₂ map
+    i1, i2 = st.columns(2)
+    i1.image(colorize(100 - spatial.breathability_before, 0, 100, alpha=255), caption="Before", use_container_width=True)
+    i2.image(colorize(100 - spatial.breathability_after, 0, 100, alpha=255), caption="After", use_container_width=True)
 
 st.markdown("---")
 
@@ -1,6 +1,7 @@
 import streamlit as st
 from datetime import datetime
 from src.data_engine.city_profiles import *
+from src.ai_core.breathability import score_no2
 
 if "user_logs" not in st.session_state:
     st.session_state.user_logs = []
@@ -25,21 +26,16 @@ st.write(
 )
 
 rows = []
-min_v, max_v = 0.00005, 0.00025
 
-for city, g in CITY_GASES.items():
+# Score every city in one vectorized call
+cities = list(CITY_GASES)
+scores = score_no2([CITY_GASES[city]["NO2"] for city in cities])
+
+for i, city in enumerate(cities):
+    g = CITY_GASES[city]
     no2 = g["NO2"]
-    # Simple city-level Breathability from NO2
-    norm = max(0.0, min(1.0, (no2 - min_v) / (max_v - min_v)))
-    breathe = (1 - norm) * 100
-
-    if breathe >= 80:
-        status = "Healthy"
-    elif breathe >= 60:
-        status = "Caution"
-        # below 60 unhealthy
-    else:
-        status = "Unhealthy"
+    breathe = scores.breathability[i]
+    status = scores.status_label[i]
 
     rows.append(
         {
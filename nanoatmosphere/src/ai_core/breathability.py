@@ -0,0 +1,92 @@
+from typing import NamedTuple, Tuple
+
+import numpy as np
+
+# NO2 column (mol/m²) treated as perfect and worst air
+NO2_BEST = 0.00005
+NO2_WORST = 0.00025
+
+# Breathability lower bounds for the Low and Medium risk bands
+RISK_THRESHOLDS: Tuple[float, float] = (80.0, 60.0)
+
+RISK_LOW, RISK_MEDIUM, RISK_HIGH = 0, 1, 2
+# Risk code used where NO2 is missing (fits the uint8 raster nodata)
+RISK_NODATA = 255
+
+RISK_LABELS = ("Low", "Medium", "High")
+STATUS_LABELS = ("Healthy", "Caution", "Unhealthy")
+
+
+def _label_table(labels: Tuple[str, str, str]) -> np.ndarray:
+    table = np.full(256, "Unknown", dtype=object)
+    table[:3] = labels
+    return table
+
+
+_RISK_TABLE = _label_table(RISK_LABELS)
+_STATUS_TABLE = _label_table(STATUS_LABELS)
+
+
+class BreathabilityScore(NamedTuple):
+    breathability: np.ndarray
+    risk_code: np.ndarray
+    risk_label: np.ndarray
+    status_label: np.ndarray
+
+
+def breathability_index(no2, min_v: float = NO2_BEST, max_v: float = NO2_WORST) -> np.ndarray:
+    """
+    Breathability Index (0–100, higher is better) for NO2 of any shape.
+
+    NO2 is normalised linearly between `min_v` (100) and `max_v` (0) and
+    clipped. NaN stays NaN.
+    """
+    no2 = np.asarray(no2, dtype="float64")
+    norm = np.clip((no2 - min_v) / (max_v - min_v), 0.0, 1.0)
+    return (1.0 - norm) * 100.0
+
+
+def risk_class(breathability, thresholds: Tuple[float, float] = RISK_THRESHOLDS) -> np.ndarray:
+    """
+    Risk codes (RISK_LOW / RISK_MEDIUM / RISK_HIGH) as uint8.
+
+    Missing breathability gets RISK_NODATA.
+    """
+    breathability = np.asarray(breathability, dtype="float64")
+    low, medium = thresholds
+    codes = np.full(breathability.shape, RISK_HIGH, dtype=np.uint8)
+    codes[breathability >= medium] = RISK_MEDIUM
+    codes[breathability >= low] = RISK_LOW
+    codes[np.isnan(breathability)] = RISK_NODATA
+    return codes
+
+
+def risk_labels(codes) -> np.ndarray:
+    return _RISK_TABLE[np.asarray(codes, dtype=np.uint8)]
+
+
+def status_labels(codes) -> np.ndarray:
+    return _STATUS_TABLE[np.asarray(codes, dtype=np.uint8)]
+
+
+def score_no2(
+    no2,
+    min_v: float = NO2_BEST,
+    max_v: float = NO2_WORST,
+    thresholds: Tuple[float, float] = RISK_THRESHOLDS,
+) -> BreathabilityScore:
+    """
+    Score NO2 values of any shape, from a single pixel to a national raster.
+
+    Returns breathability, risk codes, and the matching risk (Low / Medium /
+    High) and status (Healthy / Caution / Unhealthy) labels, all with the
+    shape of `no2`.
+    """
+    breathability = breathability_index(no2, min_v, max_v)
+    codes = risk_class(breathability, thresholds)
+    return BreathabilityScore(
+        breathability=breathability,
+        risk_code=codes,
+        risk_label=risk_labels(codes),
+        status_label=status_labels(codes),
+    )
@@ -0,0 +1,393 @@
+"""
+Precomputed 24/48/72h NO2 forecast, Breathability and Risk rasters.
+
+One region is one city export set NO2_<Region>_<n>.tif (n = 1, 2, 3 for the
+Recent / Last Week / Last Month layers). For each region a forecaster is
+fitted on its cube and every horizon is written to
+data/cache/forecast/<Region>/<checksum>/:
+    forecast_<h>h_no2.tif            float32 mol/m², NaN = nodata
+    forecast_<h>h_breathability.tif  uint8 0–100, 255 = nodata
+    forecast_<h>h_risk.tif           uint8 RISK_LOW / MEDIUM / HIGH, 255 = nodata
+    trend_<name>.tif                 float32 per-pixel trend (see trend_model)
+The trend rasters are what trend_model.trend_at reads, so the Predictive
+page never fits anything at request time.
+
+A region is skipped when the SHA-256 of its layers is unchanged since the
+last run. Regions run in parallel on a process pool; each one is written to
+a staging directory and renamed to a new directory beside the live one.
+Once every region is done, manifest.json is re-read, merged and replaced
+atomically under a lock file (several runs may finish at once), and only
+then are the directories it replaced deleted, so readers never see a
+half-written or already-deleted forecast. The Streamlit pages only read
+these outputs.
+
+Run once after new layers land (e.g. nightly from cron), or keep polling:
+    python -m src.ai_core.forecast_precompute [--workers N] [--interval SECONDS]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import rasterio
+from rasterio.crs import CRS
+
+from src.ai_core.breathability import RISK_LABELS, score_no2
+from src.ai_core.predictor import HORIZONS, NO2Forecaster
+from src.ai_core.trend_model import fit_trend, write_trend_rasters
+from src.data_engine.derived_rasters import DATA_DIR, NODATA, source_checksum
+from src.data_engine.mosaic import LAYER_PATTERNS
+from src.data_engine.no2_cube import LAYER_AGE_HOURS, NO2Cube, load_cube
+from src.data_engine.no2_sampler import sample_raster_batch
+
+FORECAST_DIR = DATA_DIR / "cache" / "forecast"
+MANIFEST = "manifest.json"
+MANIFEST_LOCK = "manifest.lock"
+
+# A lock file older than this was left by a crashed run
+STALE_LOCK_SECONDS = 600.0
+
+# NO2_<Region>_<n>.tif
+_REGION_RE = re.compile(r"^NO2_(?P<region>.+)_(?P<n>\d+)\.tif$")
+
+
+
+def find_regions(data_dir: Path = DATA_DIR) -> Dict[str, Dict[str, str]]:
+    """
+    {region: {layer label: path}} for every region with at least two layers.
+    """
+    label_for = {
+        pattern.rsplit("_", 1)[-1].split(".")[0]: label
+        for label, pattern in LAYER_PATTERNS.items()
+    }
+    regions: Dict[str, Dict[str, str]] = {}
+    for path in sorted(Path(data_dir).glob("NO2_*_*.tif")):
+        m = _REGION_RE.match(path.name)
+        if m and m.group("n") in label_for:
+            regions.setdefault(m.group("region"), {})[label_for[m.group("n")]] = str(path)
+    return {region: layers for region, layers in regions.items() if len(layers) >= 2}
+
+
+def region_checksum(layers: Dict[str, str], horizons: Sequence[int] = HORIZONS) -> str:
+    """
+    Fingerprint of a region's inputs: layer bytes, layer ages and horizons.
+    """
+    src = json.dumps(
+        {
+            "layers": {label: source_checksum(path) for label, path in layers.items()},
+            "ages": {label: LAYER_AGE_HOURS[label] for label in layers},
+            "horizons": list(horizons),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(src.encode()).hexdigest()
+
+
+def _profile(cube: NO2Cube, dtype: str, nodata) -> dict:
+    _, height, width = cube.shape
+    return {
+        "driver": "GTiff",
+        "width": width,
+        "height": height,
+        "count": 1,
+        "dtype": dtype,
+        "crs": CRS.from_string(cube.crs) if cube.crs else None,
+        "transform": cube.transform,
+        "nodata": nodata,
+        "compress": "deflate",
+        "tiled": width >= 256 and height >= 256,
+    }
+
+
+def _write(path: Path, arr: np.ndarray, profile: dict) -> None:
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(arr, 1)
+
+
+def compute_region(
+    region: str,
+    layers: Dict[str, str],
+    checksum: str,
+    out_dir: Path = FORECAST_DIR,
+    horizons: Sequence[int] = HORIZONS,
+) -> dict:
+    """
+    Fit and write one region's forecast rasters; returns its manifest entry.
+
+    Runs in a worker process, so it only touches its own region directory.
+    The live output stays in place; run() deletes it after the manifest
+    has moved on to the new one.
+    """
+    region_dir = Path(out_dir) / region
+    cube = load_cube(
+        out_dir=region_dir / "cube",
+        layers=layers,
+        ages={label: LAYER_AGE_HOURS[label] for label in layers},
+    )
+    model = NO2Forecaster().fit(cube)
+
+    staging = region_dir / f".staging-{os.getpid()}"
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir(parents=True)
+
+    float_profile = _profile(cube, "float32", np.nan)
+    uint8_profile = _profile(cube, "uint8", NODATA)
+    files: Dict[str, Dict[str, str]] = {}
+    for h, no2 in model.forecast(cube, horizons).items():
+        score = score_no2(no2)
+        breathability = np.where(
+            np.isnan(score.breathability), NODATA, np.rint(score.breathability)
+        ).astype(np.uint8)
+        names = {
+            "no2": f"forecast_{h}h_no2.tif",
+            "breathability": f"forecast_{h}h_breathability.tif",
+            "risk": f"forecast_{h}h_risk.tif",
+        }
+        _write(staging / names["no2"], no2.astype("float32"), float_profile)
+        _write(staging / names["breathability"], breathability, uint8_profile)
+        _write(staging / names["risk"], score.risk_code, uint8_profile)
+        files[str(h)] = names
+    trend = {name: path.name for name, path in write_trend_rasters(fit_trend(cube), cube, staging).items()}
+
+    # A forced rerun of unchanged inputs must not replace the live directory
+    final = region_dir / checksum[:16]
+    n = 0
+    while final.exists():
+        n += 1
+        final = region_dir / f"{checksum[:16]}-{n}"
+    staging.rename(final)
+
+    _, height, width = cube.shape
+    t = cube.transform
+    return {
+        "checksum": checksum,
+        "dir": final.name,
+        # west, south, east, north of the region's grid
+        "bounds": [t.c, t.f + t.e * height, t.c + t.a * width, t.f],
+        "generated_at": int(time.time()),
+        "layers": sorted(layers),
+        "horizons": list(horizons),
+        "tau_hours": model.tau_hours,
+        "metrics": model.metrics,
+        "files": files,
+        "trend": trend,
+    }
+
+
+def read_manifest(out_dir: Path = FORECAST_DIR) -> dict:
+    path = Path(out_dir) / MANIFEST
+    if not path.exists():
+        return {"regions": {}}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _write_manifest(manifest: dict, out_dir: Path) -> None:
+    path = Path(out_dir) / MANIFEST
+    tmp = path.with_suffix(f".json.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+@contextmanager
+def _manifest_lock(out_dir: Path, timeout: float = 60.0) -> Iterator[None]:
+    """
+    Hold manifest.lock (created with O_EXCL, so it works on any OS).
+    """
+    path = Path(out_dir) / MANIFEST_LOCK
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - path.stat().st_mtime > STALE_LOCK_SECONDS:
+                    path.unlink(missing_ok=True)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{path} is held by another run")
+            time.sleep(0.05)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        yield
+    finally:
+        os.close(fd)
+        path.unlink(missing_ok=True)
+
+
+def _covers(entry: dict, lat: float, lon: float) -> bool:
+    # Entries written before bounds were recorded cover nothing until rerun
+    if "bounds" not in entry:
+        return False
+    west, south, east, north = entry["bounds"]
+    return west <= lon < east and south < lat <= north
+
+
+def _is_current(entry: Optional[dict], checksum: str, out_dir: Path, region: str) -> bool:
+    # Entries from before trend rasters were part of the run are redone
+    return bool(entry) and entry.get("checksum") == checksum and "trend" in entry and \
+        (Path(out_dir) / region / entry["dir"]).is_dir()
+
+
+def run(
+    data_dir: Path = DATA_DIR,
+    out_dir: Path = FORECAST_DIR,
+    regions: Optional[Sequence[str]] = None,
+    workers: Optional[int] = None,
+    force: bool = False,
+    horizons: Sequence[int] = HORIZONS,
+) -> Dict[str, str]:
+    """
+    Refresh forecasts for every region whose inputs changed.
+
+    Returns {region: "updated" | "skipped" | "failed: <error>"}.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    found = find_regions(data_dir)
+    if regions is not None:
+        found = {r: found[r] for r in regions if r in found}
+
+    entries = read_manifest(out_dir).get("regions", {})
+    status: Dict[str, str] = {}
+    updated: Dict[str, dict] = {}
+    todo: Dict[str, str] = {}
+    for region, layers in found.items():
+        checksum = region_checksum(layers, horizons)
+        if not force and _is_current(entries.get(region), checksum, out_dir, region):
+            status[region] = "skipped"
+        else:
+            todo[region] = checksum
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers or min(len(todo), os.cpu_count() or 1)) as pool:
+            futures = {
+                region: pool.submit(compute_region, region, found[region], checksum, out_dir, horizons)
+                for region, checksum in todo.items()
+            }
+            for region, future in futures.items():
+                try:
+                    updated[region] = future.result()
+                    status[region] = "updated"
+                except Exception as e:  # keep the last good forecast for this region
+                    status[region] = f"failed: {e}"
+
+    # Merge into the manifest as it is now: another run may have written it
+    stale: List[Path] = []
+    with _manifest_lock(out_dir):
+        manifest = read_manifest(out_dir)
+        entries = manifest.setdefault("regions", {})
+        for region, entry in updated.items():
+            old = entries.get(region)
+            if old and old["dir"] != entry["dir"]:
+                stale.append(out_dir / region / old["dir"])
+            entries[region] = entry
+        if regions is None:
+            for region in [r for r in entries if r not in found]:
+                del entries[region]
+                stale.append(out_dir / region)
+        manifest["updated_at"] = int(time.time())
+        _write_manifest(manifest, out_dir)
+
+    # Only now that no manifest references them
+    for path in stale:
+        shutil.rmtree(path, ignore_errors=True)
+    return status
+
+
+_manifests: Dict[tuple, dict] = {}
+_lock = threading.Lock()
+
+
+def _cached_manifest(out_dir: Path) -> dict:
+    path = Path(out_dir) / MANIFEST
+    if not path.exists():
+        return {"regions": {}}
+    key = (str(path), path.stat().st_mtime_ns)
+    with _lock:
+        manifest = _manifests.get(key)
+    if manifest is None:
+        manifest = read_manifest(out_dir)
+        with _lock:
+            _manifests.clear()
+            _manifests[key] = manifest
+    return manifest
+
+
+def precomputed_forecast_at(
+    lat: float, lon: float, out_dir: Path = FORECAST_DIR
+) -> Optional[Dict[int, Dict[str, float]]]:
+    """
+    {horizon: {"no2", "breathability", "risk", "generated_at"}} at one point,
+    read from the latest run, or None if no precomputed region covers it.
+
+    Only regions whose bounds contain the point are sampled. A run that
+    finishes mid-read may delete the files; that region is then skipped.
+    """
+    for region, entry in sorted(_cached_manifest(out_dir)["regions"].items()):
+        if not _covers(entry, lat, lon):
+            continue
+        region_dir = Path(out_dir) / region / entry["dir"]
+        out = {}
+        try:
+            for h, names in entry["files"].items():
+                no2 = float(sample_raster_batch(region_dir / names["no2"], lat, lon))
+                if no2 != no2:
+                    break
+                breathability = float(sample_raster_batch(region_dir / names["breathability"], lat, lon))
+                risk = int(sample_raster_batch(region_dir / names["risk"], lat, lon))
+                out[int(h)] = {
+                    "no2": no2,
+                    "breathability": breathability,
+                    "risk": str(RISK_LABELS[risk]),
+                    "generated_at": entry["generated_at"],
+                }
+            else:
+                return out
+        except OSError:
+            continue
+    return None
+
+
+def precomputed_trend_paths(lat: float, lon: float, out_dir: Path = FORECAST_DIR) -> Optional[Dict[str, Path]]:
+    """
+    Trend raster paths of the first precomputed region covering the point.
+    """
+    for region, entry in sorted(_cached_manifest(out_dir)["regions"].items()):
+        if "trend" in entry and _covers(entry, lat, lon):
+            region_dir = Path(out_dir) / region / entry["dir"]
+            return {name: region_dir / filename for name, filename in entry["trend"].items()}
+    return None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Precompute NO2 forecast rasters per region.")
+    parser.add_argument("--region", action="append", help="only these regions (repeatable)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="recompute unchanged regions too")
+    parser.add_argument("--interval", type=float, default=0,
+                        help="keep running, re-checking inputs every N seconds")
+    args = parser.parse_args(argv)
+
+    while True:
+        for region, result in sorted(run(regions=args.region, workers=args.workers, force=args.force).items()):
+            print(f"{region}: {result}", flush=True)
+        if args.interval <= 0:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Process-wide Gemini client with a circuit breaker and request deadlines.
+
+Every Streamlit session shares one configured GenerativeModel. After
+`failure_threshold` consecutive outage-type failures (quota, 5xx,
+timeouts) the breaker opens and calls fail immediately with
+CircuitOpenError, so users get the cached answer or the fallback at once
+instead of each waiting out the timeout. After `reset_timeout` seconds a
+single half-open probe is let through; success closes the breaker, failure
+re-opens it.
+"""
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+import google.api_core.exceptions as gexceptions
+
+from src.ai_core.policy_advisor import GEMINI_MODEL
+
+DEFAULT_DEADLINE = 30.0  # seconds per request, including the whole stream
+FAILURE_THRESHOLD = 3
+RESET_TIMEOUT = 30.0
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# Failures that say "Gemini is unavailable", not "this request is wrong"
+OUTAGE_ERRORS = (
+    gexceptions.ResourceExhausted,
+    gexceptions.ServerError,
+    gexceptions.DeadlineExceeded,
+    gexceptions.RetryError,
+    TimeoutError,
+    ConnectionError,
+)
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, retry_in: float):
+        super().__init__(f"Gemini circuit open, next probe in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def before_call(self) -> None:
+        """
+        Raise CircuitOpenError unless a call may go through now.
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            waited = time.monotonic() - self._opened_at
+            if self._state == OPEN and waited >= self.reset_timeout:
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            raise CircuitOpenError(max(self.reset_timeout - waited, 0.0))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self._state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def record_release(self) -> None:
+        """
+        A call ended without saying anything about Gemini's health.
+        """
+        with self._lock:
+            self._probing = False
+
+
+class _WatchedStream:
+    """
+    Iterator over a streamed response that reports its outcome to the
+    breaker exactly once: when it ends, fails, or is closed or dropped
+    unfinished (a generator never started runs no cleanup, which would
+    leave a half-open probe held).
+    """
+
+    def __init__(self, client: "GeminiClient", response, deadline_at: float):
+        self._client = client
+        self._response = response
+        self._chunks: Optional[Iterator[Any]] = None
+        self._deadline_at = deadline_at
+        self._done = False
+
+    def __iter__(self) -> "_WatchedStream":
+        return self
+
+    def __next__(self) -> Any:
+        if self._done:
+            raise StopIteration
+        try:
+            if self._chunks is None:
+                self._chunks = iter(self._response)
+            chunk = next(self._chunks)
+            if time.monotonic() > self._deadline_at:
+                raise gexceptions.DeadlineExceeded(f"stream exceeded {self._client.deadline:.0f}s deadline")
+        except StopIteration:
+            self._finish(None)
+            raise
+        except BaseException as e:
+            self._finish(e)
+            raise
+        return chunk
+
+    def _finish(self, error: Optional[BaseException]) -> None:
+        if not self._done:
+            self._done = True
+            self._client._outcome(error)
+
+    def close(self) -> None:
+        if not self._done:
+            self._done = True
+            self._client.breaker.record_release()
+
+    __del__ = close
+
+
+class GeminiClient:
+    """
+    Model-like wrapper (generate_content / generate_content_async) that
+    applies the breaker and a per-request deadline.
+    """
+
+    def __init__(self, model, deadline: float = DEFAULT_DEADLINE, breaker: Optional[CircuitBreaker] = None):
+        self.model = model
+        self.model_name = getattr(model, "model_name", "")
+        self.deadline = deadline
+        self.breaker = breaker or CircuitBreaker()
+
+    def _outcome(self, error: Optional[BaseException]) -> None:
+        if error is None:
+            self.breaker.record_success()
+        elif isinstance(error, OUTAGE_ERRORS):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_release()
+
+    def generate_content(self, contents, generation_config: Optional[Dict[str, Any]] = None, stream: bool = False):
+        self.breaker.before_call()
+        try:
+            response = self.model.generate_content(
+                contents,
+                generation_config=generation_config,
+                stream=stream,
+                request_options={"timeout": self.deadline},
+            )
+        except BaseException as e:
+            self._outcome(e)
+            raise
+        if not stream:
+            self._outcome(None)
+            return response
+        return _WatchedStream(self, response, time.monotonic() + self.deadline)
+
+    async def generate_content_async(self, contents, generation_config: Optional[Dict[str, Any]] = None):
+        self.breaker.before_call()
+        try:
+            response = await self.model.generate_content_async(
+                contents,
+                generation_config=generation_config,
+                request_options={"timeout": self.deadline},
+            )
+        except BaseException as e:
+            self._outcome(e)
+            raise
+        self._outcome(None)
+        return response
+
+
+_clients: Dict[tuple, GeminiClient] = {}
+_lock = threading.Lock()
+
+
+def get_gemini_client(api_key: str, model_name: str = GEMINI_MODEL) -> GeminiClient:
+    """
+    The shared client for this API key and model, configured once per process.
+    """
+    key = (api_key, model_name)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            import google.generativeai as genai
+
+            genai.configure(api_key=api_key)
+            client = GeminiClient(genai.GenerativeModel(model_name))
+            _clients[key] = client
+        return client
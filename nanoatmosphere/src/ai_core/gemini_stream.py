@@ -0,0 +1,197 @@
+"""
+Streaming Gemini generation with latency tracking.
+
+stream_generate() yields text chunks as they arrive, so the UI can render
+the first words instead of waiting for the whole answer. Cached answers
+(see response_cache) come back as a single chunk; completed streams are
+added to the cache, interrupted ones are not.
+
+Identical requests (same cache key) that arrive while one is in flight
+share its upstream call: one background thread reads the stream and every
+caller, the first included, follows the same growing list of chunks.
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from src.ai_core.response_cache import ResponseCache, cache_key, get_response_cache
+
+# Recent stream timings kept for latency_summary()
+MAX_RECENT = 200
+
+
+class StreamStats:
+    """
+    Timings of one streamed request, filled in while it runs.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_chunk_s: Optional[float] = None
+        self.total_s: Optional[float] = None
+        self.chunks = 0
+        self.chars = 0
+        self.from_cache = False
+        self.coalesced = False
+        self.error: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "first_chunk_s": self.first_chunk_s,
+            "total_s": self.total_s,
+            "chunks": self.chunks,
+            "chars": self.chars,
+            "from_cache": self.from_cache,
+            "coalesced": self.coalesced,
+            "error": self.error,
+        }
+
+
+_recent: Deque[Dict[str, Any]] = deque(maxlen=MAX_RECENT)
+_lock = threading.Lock()
+
+
+def _record(stats: StreamStats) -> None:
+    stats.total_s = time.perf_counter() - stats.started
+    with _lock:
+        _recent.append(stats.as_dict())
+
+
+def _chunk(stats: StreamStats, text: str) -> str:
+    if stats.first_chunk_s is None:
+        stats.first_chunk_s = time.perf_counter() - stats.started
+    stats.chunks += 1
+    stats.chars += len(text)
+    return text
+
+
+def stream_generate(
+    model,
+    prompt: str,
+    generation_config: Optional[Dict[str, Any]] = None,
+    stats: Optional[StreamStats] = None,
+    cache: Optional[ResponseCache] = None,
+    model_name: Optional[str] = None,
+) -> Iterator[str]:
+    """
+    Yield the response to `prompt` chunk by chunk.
+
+    Errors (at the start or partway through) are recorded on `stats` and
+    re-raised, so the caller decides how to fall back.
+    """
+    stats = StreamStats() if stats is None else stats
+    cache = get_response_cache() if cache is None else cache
+    model_name = model_name or getattr(model, "model_name", "")
+    key = cache_key(prompt, model_name, generation_config)
+
+    cached = cache.get(key)
+    if cached is not None:
+        stats.from_cache = True
+        yield _chunk(stats, cached)
+        _record(stats)
+        return
+
+    with _flights_lock:
+        flight = _flights.get(key)
+        if flight is None:
+            flight = _flights[key] = _Flight()
+            _counters["upstream"] += 1
+            threading.Thread(
+                target=flight.run,
+                args=(model, prompt, generation_config, key, cache, model_name),
+                daemon=True,
+            ).start()
+        else:
+            stats.coalesced = True
+            _counters["coalesced"] += 1
+
+    try:
+        for text in flight.follow():
+            yield _chunk(stats, text)
+    except Exception as e:
+        stats.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _record(stats)
+
+
+class _Flight:
+    """
+    One upstream stream, fanned out to every caller that follows it.
+    """
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._cond = threading.Condition()
+
+    def run(self, model, prompt, generation_config, key, cache: ResponseCache, model_name: str) -> None:
+        try:
+            response = model.generate_content(contents=prompt, generation_config=generation_config, stream=True)
+            for chunk in response:
+                text = chunk.text
+                if text:
+                    with self._cond:
+                        self.chunks.append(text)
+                        self._cond.notify_all()
+        except BaseException as e:
+            self.error = e
+        finally:
+            try:
+                # Complete answers go to the cache before the flight is dropped,
+                # so a request arriving in between still finds one or the other
+                if self.error is None and self.chunks:
+                    cache.put(key, "".join(self.chunks), model_name)
+            finally:
+                with _flights_lock:
+                    _flights.pop(key, None)
+                with self._cond:
+                    self.done = True
+                    self._cond.notify_all()
+
+    def follow(self) -> Iterator[str]:
+        i = 0
+        while True:
+            with self._cond:
+                while i >= len(self.chunks) and not self.done:
+                    self._cond.wait()
+                new, finished = self.chunks[i:], self.done
+            for text in new:
+                yield text
+            i += len(new)
+            if finished and i >= len(self.chunks):
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+_flights: Dict[str, _Flight] = {}
+_flights_lock = threading.Lock()
+_counters = {"upstream": 0, "coalesced": 0}
+
+
+def coalescing_stats() -> Dict[str, int]:
+    """
+    Upstream calls made vs. requests that joined one already in flight.
+    """
+    with _flights_lock:
+        return dict(_counters, in_flight=len(_flights))
+
+
+def latency_summary() -> Dict[str, float]:
+    """
+    Median time to first chunk and total latency over recent API streams.
+    """
+    with _lock:
+        recent = [r for r in _recent if not r["from_cache"] and r["first_chunk_s"] is not None]
+    if not recent:
+        return {"requests": 0}
+    first = sorted(r["first_chunk_s"] for r in recent)
+    total = sorted(r["total_s"] for r in recent)
+    return {
+        "requests": len(recent),
+        "first_chunk_p50_s": first[len(first) // 2],
+        "total_p50_s": total[len(total) // 2],
+    }
@@ -0,0 +1,81 @@
+"""
+Prompt, generation settings and fallback shared by the AI Policy Advisor
+page and the batch briefing job.
+"""
+import textwrap
+
+# Choose a fast model that exists in your account
+GEMINI_MODEL = "gemini-2.5-flash"
+
+GENERATION_CONFIG = {
+    "temperature": 0.4,
+    "max_output_tokens": 2048,
+}
+
+SYSTEM_INSTRUCTION = """
+You are Kalam NanoAtmosphere, an AI co-pilot helping Indian city officials reduce
+urban NO2, SO2, and CO from traffic and industry.
+
+Rules:
+- Be concise and practical, prefer bullet points.
+- Always quantify impact using Kalam NanoAtmosphere terms:
+  - Breathability Index (0–100, higher is better).
+  - Risk Level: Low / Medium / High.
+- Assume Sentinel-5P satellite inputs at ~1 km resolution.
+- Suggest levers like odd-even traffic, diesel bans, low-emission zones,
+  school-time red alerts, and industrial stack controls.
+- Always close with 3 concrete actions that can be done in the next 30 days.
+"""
+
+def build_policy_prompt(city: str,
+                        baseline_no2: float,
+                        breathe_score: float,
+                        risk_level: str,
+                        user_goal: str,
+                        context: str = "") -> str:
+    # Retrieved local snippets (see retrieval.build_context), if any
+    evidence = ""
+    if context:
+        evidence = (
+            "Local evidence from Kalam NanoAtmosphere data "
+            "(use where relevant, do not repeat verbatim):\n" + context + "\n"
+        )
+    prompt = f"""
+    {SYSTEM_INSTRUCTION}
+
+    City: {city}
+    Current NO2 (mol/m²): {baseline_no2:.1e}
+    Current Breathability Index: {breathe_score:.0f}/100
+    Current Risk Level: {risk_level}
+
+    Policy maker's goal (from user): {user_goal}
+
+    {evidence}
+    Tasks:
+    1. Briefly explain what the current numbers mean in plain language.
+    2. Propose 3–5 targeted interventions tailored to this city.
+    3. For each intervention, estimate:
+       - Expected NO2 change (approx %).
+       - Expected Breathability improvement (points).
+       - Implementation difficulty: Low / Medium / High.
+    4. Highlight any trade-offs (traffic, economy, schools, etc.).
+    5. Give a 30-day action plan as 3 bullet points.
+
+    Use short bullet lists, no long paragraphs.
+    """
+    return textwrap.dedent(prompt).strip()
+
+PREDEFINED_FALLBACK = """
+Kalam NanoAtmosphere AI is currently unavailable, so this is a cached playbook for Indian urban micro-zones.
+
+- Tighten traffic around schools and hospitals during peak hours using dynamic diversion and no-parking rings.
+- Enforce no-idling and stricter checks on old diesel vehicles and autos in the dirtiest corridors first.
+- Upgrade or retrofit a small set of top-emitting industrial stacks with low-NOₓ burners and continuous monitoring.
+- Use red / orange alert days to push work-from-home, staggered school timings, and public transport fare discounts.
+- Run one weekly 'clean corridor' where only public transport and EVs are allowed for a fixed 2–3 hour window.
+
+Expected impact (if seriously enforced in the focus micro-zones):
+- NO₂ reduction: roughly 15–25% over 6 months.
+- Breathability Index: +10 to +18 points.
+- Risk Level: can often shift from High → Medium, or Medium → Low for the target corridor.
+"""
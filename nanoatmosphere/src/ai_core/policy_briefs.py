@@ -0,0 +1,227 @@
+"""
+Morning policy briefs for every city in CITY_GASES.
+
+Prompts are built with the advisor's build_policy_prompt from each city's
+NO2 and the breathability engine, then sent concurrently on one asyncio
+loop. A semaphore caps in-flight requests and a token bucket caps the
+request rate, so a run over hundreds of cities is bounded by quota rather
+than by serial round-trips. ResourceExhausted (HTTP 429) is retried with
+exponential backoff and jitter; cities that still fail get
+PREDEFINED_FALLBACK. When the model is a GeminiClient whose breaker has
+opened, a city waits for the next probe (at most MAX_DELAY) and that
+wait counts as an attempt, so a sustained outage ends the run after about
+max_retries waits instead of queueing every city behind one probe.
+
+The command-line run takes each city's NO2 from the zonal mean of our
+rasters where the city polygons cover them (zonal_stats.derive_city_gases)
+and from the city_gases.csv table elsewhere.
+
+Briefs are written to data/cache/briefs/<YYYY-MM-DD>/<City>.md with an
+index.json summarising status, attempts and latency per city:
+    python -m src.ai_core.policy_briefs [--concurrency 8] [--rate 2.0]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+import google.api_core.exceptions as gexceptions
+
+from src.ai_core.breathability import score_no2
+from src.ai_core.gemini_client import CircuitOpenError, get_gemini_client
+from src.ai_core.policy_advisor import GEMINI_MODEL, GENERATION_CONFIG, PREDEFINED_FALLBACK, build_policy_prompt
+from src.data_engine.city_profiles import CITY_GASES
+from src.data_engine.zonal_stats import derive_city_gases
+
+BRIEFS_DIR = Path(__file__).resolve().parents[2] / "data" / "cache" / "briefs"
+
+BRIEF_GOAL = (
+    "Morning briefing: the most effective actions for today and this month "
+    "to cut NO₂ in the city's worst micro-zones."
+)
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RATE = 2.0  # requests per second
+MAX_RETRIES = 5
+BASE_DELAY = 1.0    # seconds, doubled per retry
+MAX_DELAY = 60.0
+
+
+class Brief(NamedTuple):
+    city: str
+    text: str
+    status: str     # "ok", "empty" or "fallback"
+    attempts: int
+    latency_s: float
+    error: Optional[str]
+
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` tokens per second, bursts up to `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def build_city_prompts(city_gases: Dict[str, Dict[str, float]] = CITY_GASES, goal: str = BRIEF_GOAL) -> Dict[str, str]:
+    cities = list(city_gases)
+    scores = score_no2([city_gases[c]["NO2"] for c in cities])
+    return {
+        city: build_policy_prompt(
+            city=city,
+            baseline_no2=city_gases[city]["NO2"],
+            breathe_score=float(scores.breathability[i]),
+            risk_level=str(scores.risk_label[i]),
+            user_goal=goal,
+        )
+        for i, city in enumerate(cities)
+    }
+
+
+async def generate_brief(
+    model,
+    city: str,
+    prompt: str,
+    semaphore: asyncio.Semaphore,
+    bucket: TokenBucket,
+    max_retries: int = MAX_RETRIES,
+    base_delay: float = BASE_DELAY,
+) -> Brief:
+    started = time.perf_counter()
+    error = None
+    attempt = 1
+    while attempt <= max_retries + 1:
+        try:
+            # The semaphore is released while backing off so other cities proceed
+            async with semaphore:
+                await bucket.acquire()
+                response = await model.generate_content_async(prompt, generation_config=GENERATION_CONFIG)
+            text = response.text
+            status = "ok" if text else "empty"
+            return Brief(city, text or PREDEFINED_FALLBACK, status, attempt, time.perf_counter() - started, None)
+        except CircuitOpenError as e:
+            # No request was sent. retry_in is 0 while another city's probe
+            # is in flight, so back off at least as for a 429.
+            error = f"CircuitOpenError: {e}"
+            if attempt > max_retries:
+                break
+            delay = min(MAX_DELAY, max(e.retry_in, base_delay * 2 ** (attempt - 1)))
+            await asyncio.sleep(delay * random.uniform(1.0, 1.5))
+            attempt += 1
+        except gexceptions.ResourceExhausted as e:
+            error = f"ResourceExhausted: {e}"
+            if attempt > max_retries:
+                break
+            delay = min(MAX_DELAY, base_delay * 2 ** (attempt - 1))
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            attempt += 1
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            break
+    return Brief(city, PREDEFINED_FALLBACK, "fallback", attempt, time.perf_counter() - started, error)
+
+
+async def generate_briefs(
+    model,
+    prompts: Dict[str, str],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rate: float = DEFAULT_RATE,
+    max_retries: int = MAX_RETRIES,
+    base_delay: float = BASE_DELAY,
+) -> List[Brief]:
+    semaphore = asyncio.Semaphore(concurrency)
+    bucket = TokenBucket(rate)
+    return list(await asyncio.gather(*(
+        generate_brief(model, city, prompt, semaphore, bucket, max_retries, base_delay)
+        for city, prompt in prompts.items()
+    )))
+
+
+def _atomic_write(path: Path, text: str) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    tmp.replace(path)
+
+
+def write_briefs(briefs: List[Brief], out_dir: Path) -> Path:
+    """
+    Write one Markdown file per city plus index.json; returns the index path.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    index = {"generated_at": int(time.time()), "model": GEMINI_MODEL, "cities": {}}
+    for brief in briefs:
+        name = re.sub(r"[^\w\-]+", "_", brief.city).strip("_") + ".md"
+        _atomic_write(out_dir / name, f"# {brief.city}\n\n{brief.text.strip()}\n")
+        index["cities"][brief.city] = {
+            "file": name,
+            "status": brief.status,
+            "attempts": brief.attempts,
+            "latency_s": round(brief.latency_s, 3),
+            "error": brief.error,
+        }
+    index_path = out_dir / "index.json"
+    _atomic_write(index_path, json.dumps(index, indent=2, ensure_ascii=False))
+    return index_path
+
+
+def run(
+    model,
+    out_dir: Optional[Path] = None,
+    city_gases: Dict[str, Dict[str, float]] = CITY_GASES,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rate: float = DEFAULT_RATE,
+    max_retries: int = MAX_RETRIES,
+    base_delay: float = BASE_DELAY,
+) -> Path:
+    out_dir = out_dir or BRIEFS_DIR / date.today().isoformat()
+    briefs = asyncio.run(generate_briefs(
+        model, build_city_prompts(city_gases), concurrency, rate, max_retries, base_delay,
+    ))
+    return write_briefs(briefs, Path(out_dir))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Generate policy briefs for every city.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="requests per second")
+    parser.add_argument("--out", type=Path, default=None)
+    args = parser.parse_args(argv)
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise SystemExit("GEMINI_API_KEY is not set.")
+
+    index = run(
+        get_gemini_client(api_key), args.out, derive_city_gases(),
+        concurrency=args.concurrency, rate=args.rate,
+    )
+    summary = json.loads(index.read_text(encoding="utf-8"))["cities"]
+    ok = sum(1 for c in summary.values() if c["status"] == "ok")
+    print(f"{ok}/{len(summary)} briefs from Gemini, written to {index.parent}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import hashlib
+import json
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.ai_core.breathability import BreathabilityScore, score_no2
+from src.data_engine.no2_cube import NO2Cube, load_cube
+from src.models.registry import REGISTRY, ModelArtifact
+
+HORIZONS: Tuple[int, ...] = (24, 48, 72)
+
+# Pixels per chunk when fitting / predicting, bounds peak memory
+CHUNK_PIXELS = 1_000_000
+
+# Decay-time limits (hours) keep the fit sane with very few layers
+MIN_TAU, MAX_TAU = 6.0, 24.0 * 365
+
+MODEL_NAME = "no2_forecaster"
+FEATURE_SCHEMA = {
+    "inputs": ["latest_no2", "historical_mean_no2"],
+    "units": "mol/m²",
+    "horizons_hours": list(HORIZONS),
+}
+
+
+class NO2Forecaster:
+    """
+    Damped-persistence NO2 forecaster fitted on every pixel at once.
+
+    Each pixel relaxes from its latest value towards its own historical
+    mean: forecast(h) = mean + exp(-h / tau) * (latest - mean). One global
+    decay time `tau` is fitted by least squares over all consecutive layer
+    pairs of all pixels, in chunks, so a national grid is a handful of
+    array passes.
+    """
+
+    def __init__(self, tau_hours: Optional[float] = None):
+        self.tau_hours = tau_hours
+        self.metrics: Dict[str, float] = {}
+        self.tag: Optional[str] = None
+
+    @classmethod
+    def from_artifact(cls, artifact: ModelArtifact) -> "NO2Forecaster":
+        model = cls(tau_hours=float(artifact.meta["params"]["tau_hours"]))
+        model.metrics = dict(artifact.meta.get("metrics", {}))
+        model.tag = artifact.tag
+        return model
+
+    def save(self, training_checksum: str) -> ModelArtifact:
+        artifact = REGISTRY.save(
+            MODEL_NAME,
+            params={"tau_hours": self.tau_hours},
+            feature_schema=FEATURE_SCHEMA,
+            training_checksum=training_checksum,
+            metrics=self.metrics,
+        )
+        self.tag = artifact.tag
+        return artifact
+
+    @property
+    def fitted(self) -> bool:
+        return self.tau_hours is not None
+
+    def fit(self, cube: NO2Cube, chunk_pixels: int = CHUNK_PIXELS) -> "NO2Forecaster":
+        series, hours = _flatten(cube)
+        if len(hours) < 2:
+            raise ValueError("Need at least two NO2 layers to fit a forecaster")
+        gaps = np.diff(hours)
+
+        # Per gap: sums of a*b, a*a, b*b over all valid pixel pairs
+        sab = np.zeros(len(gaps))
+        saa = np.zeros(len(gaps))
+        sbb = np.zeros(len(gaps))
+        n = 0
+        for start in range(0, series.shape[1], chunk_pixels):
+            block = np.asarray(series[:, start:start + chunk_pixels], dtype="float64")
+            anomaly = block - _nanmean(block)
+            a, b = anomaly[:-1], anomaly[1:]
+            valid = ~(np.isnan(a) | np.isnan(b))
+            a, b = np.where(valid, a, 0.0), np.where(valid, b, 0.0)
+            sab += (a * b).sum(axis=1)
+            saa += (a * a).sum(axis=1)
+            sbb += (b * b).sum(axis=1)
+            n += int(valid.sum())
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            phi = np.clip(sab / saa, 1e-3, 0.999)
+        ok = np.isfinite(phi) & (gaps > 0)
+        if not ok.any():
+            self.tau_hours = MAX_TAU
+        else:
+            # log(phi) = -gap / tau, least squares through the origin
+            g, log_phi = gaps[ok], np.log(phi[ok])
+            tau = -float((g * g).sum() / (g * log_phi).sum())
+            self.tau_hours = float(np.clip(tau, MIN_TAU, MAX_TAU))
+
+        # In-sample error of the fitted decay vs. plain persistence:
+        # sum((b - d*a)^2) = sbb - 2*d*sab + d^2*saa
+        decay = np.exp(-gaps / self.tau_hours)
+        model_se = float((sbb - 2 * decay * sab + decay ** 2 * saa).sum())
+        persist_se = float((sbb - 2 * sab + saa).sum())
+        self.metrics = {
+            "pairs": float(n),
+            "rmse": float(np.sqrt(model_se / n)) if n else float("nan"),
+            "persistence_rmse": float(np.sqrt(persist_se / n)) if n else float("nan"),
+        }
+        return self
+
+    def predict(self, latest, baseline, horizon: float) -> np.ndarray:
+        """
+        Forecast `horizon` hours ahead from arrays of latest and mean NO2.
+        """
+        if not self.fitted:
+            raise RuntimeError("Forecaster is not fitted")
+        latest = np.asarray(latest, dtype="float64")
+        baseline = np.asarray(baseline, dtype="float64")
+        # Pixels with no history fall back to persistence
+        baseline = np.where(np.isnan(baseline), latest, baseline)
+        return baseline + np.exp(-horizon / self.tau_hours) * (latest - baseline)
+
+    def forecast(
+        self,
+        cube: NO2Cube,
+        horizons: Sequence[int] = HORIZONS,
+        chunk_pixels: int = CHUNK_PIXELS,
+    ) -> Dict[int, np.ndarray]:
+        """
+        Forecast rasters (float32, cube grid) for every horizon.
+        """
+        series, _ = _flatten(cube)
+        _, height, width = cube.shape
+        out = {h: np.empty(height * width, dtype="float32") for h in horizons}
+        for start in range(0, series.shape[1], chunk_pixels):
+            block = np.asarray(series[:, start:start + chunk_pixels], dtype="float64")
+            latest, baseline = block[-1], _nanmean(block)
+            for h in horizons:
+                out[h][start:start + chunk_pixels] = self.predict(latest, baseline, h)
+        return {h: arr.reshape(height, width) for h, arr in out.items()}
+
+    def forecast_breathability(
+        self, cube: NO2Cube, horizons: Sequence[int] = HORIZONS
+    ) -> Dict[int, BreathabilityScore]:
+        return {h: score_no2(no2) for h, no2 in self.forecast(cube, horizons).items()}
+
+    def forecast_points(self, cube: NO2Cube, lats, lons, horizons: Sequence[int] = HORIZONS) -> Dict[int, np.ndarray]:
+        """
+        Forecast NO2 at a batch of points from their cube time series.
+        """
+        series = np.moveaxis(np.asarray(cube.time_series(lats, lons), dtype="float64"), -1, 0)
+        latest, baseline = series[-1], _nanmean(series)
+        return {h: self.predict(latest, baseline, h) for h in horizons}
+
+
+def _flatten(cube: NO2Cube) -> Tuple[np.ndarray, np.ndarray]:
+    t, height, width = cube.shape
+    return cube.data.reshape(t, height * width), cube.hours
+
+
+def _nanmean(block: np.ndarray) -> np.ndarray:
+    valid = ~np.isnan(block)
+    n = valid.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(n > 0, np.where(valid, block, 0.0).sum(axis=0) / n, np.nan)
+
+
+def training_checksum(cube: NO2Cube) -> str:
+    """
+    Fingerprint of the layers (file versions and time axis) behind a cube.
+    """
+    src = json.dumps([cube.meta.get("sources"), cube.meta.get("hours")], sort_keys=True)
+    return hashlib.sha256(src.encode()).hexdigest()
+
+
+_models: Dict[tuple, NO2Forecaster] = {}
+_lock = threading.Lock()
+
+
+def get_forecaster(cube: Optional[NO2Cube] = None) -> NO2Forecaster:
+    """
+    Forecaster for the current cube, shared per process.
+
+    Uses the registry's active model if it was trained on this cube's
+    layers, else any saved version that was, else fits and saves a new
+    version. Changing the ACTIVE version takes effect on the next call.
+    """
+    cube = load_cube() if cube is None else cube
+    checksum = training_checksum(cube)
+    key = (checksum, REGISTRY.active_version(MODEL_NAME))
+    with _lock:
+        model = _models.get(key)
+    if model is not None:
+        return model
+
+    artifact = REGISTRY.find(MODEL_NAME, checksum)
+    if artifact is not None:
+        model = NO2Forecaster.from_artifact(artifact)
+    else:
+        model = NO2Forecaster().fit(cube)
+        model.save(checksum)
+        key = (checksum, REGISTRY.active_version(MODEL_NAME))
+
+    with _lock:
+        _models.clear()
+        _models[key] = model
+    return model
+
+
+def forecast_at(lat: float, lon: float, horizons: Sequence[int] = HORIZONS) -> Dict[int, Dict[str, float]]:
+    """
+    {horizon: {"no2", "breathability", "risk", "model"}} at one point.
+    """
+    cube = load_cube()
+    model = get_forecaster(cube)
+    no2 = model.forecast_points(cube, lat, lon, horizons)
+    out = {}
+    for h in horizons:
+        score = score_no2(no2[h])
+        out[h] = {
+            "no2": float(no2[h]),
+            "breathability": float(score.breathability),
+            "risk": str(score.risk_label),
+            "model": model.tag,
+        }
+    return out
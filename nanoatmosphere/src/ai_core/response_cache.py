@@ -0,0 +1,181 @@
+"""
+Persistent cache of Gemini responses.
+
+Entries live in data/cache/gemini_responses.sqlite, keyed by the SHA-256 of
+the whitespace-normalised prompt, the model name and the generation config,
+so identical advisor requests are answered without calling the API and
+survive restarts. Entries expire after `ttl_seconds`; beyond `max_entries`
+or `max_bytes` the least recently used are evicted. Hit / miss counters
+are kept in the same database.
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+CACHE_PATH = Path(__file__).resolve().parents[2] / "data" / "cache" / "gemini_responses.sqlite"
+
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def normalize_prompt(prompt: str) -> str:
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+def cache_key(prompt: str, model_name: str, generation_config: Optional[Dict[str, Any]] = None) -> str:
+    payload = json.dumps(
+        [normalize_prompt(prompt), model_name, generation_config or {}],
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed prompt -> response cache, safe to share across threads.
+    """
+
+    def __init__(
+        self,
+        path: Path = CACHE_PATH,
+        ttl_seconds: float = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def _count(self, name: str, n: int = 1) -> None:
+        self._db.execute(
+            "INSERT INTO counters(name, value) VALUES(?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, n),
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response FROM responses WHERE key = ? AND created_at > ?",
+                (key, now - self.ttl_seconds),
+            ).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._count("hits")
+            return row[0]
+
+    def put(self, key: str, response: str, model_name: str = "") -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses(key, model, response, size, created_at, last_used) "
+                "VALUES(?, ?, ?, ?, ?, ?)",
+                (key, model_name, response, len(response.encode("utf-8")), now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        self._db.execute("DELETE FROM responses WHERE created_at <= ?", (now - self.ttl_seconds,))
+        count, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+        # Drop least recently used rows until both limits hold
+        rows = self._db.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall()
+        doomed = []
+        for key, row_size in rows:
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            size -= row_size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self._count("evictions", len(doomed))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counters = dict(self._db.execute("SELECT name, value FROM counters").fetchall())
+            count, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "evictions": counters.get("evictions", 0),
+            "entries": count,
+            "bytes": size,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.execute("DELETE FROM counters")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+_cache: Optional[ResponseCache] = None
+_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
+
+
+def generate_cached(
+    model,
+    prompt: str,
+    generation_config: Optional[Dict[str, Any]] = None,
+    cache: Optional[ResponseCache] = None,
+    model_name: Optional[str] = None,
+) -> Tuple[str, bool]:
+    """
+    (text, from_cache) for `prompt`, calling model.generate_content on a miss.
+
+    Only non-empty responses are stored; API errors propagate so callers
+    keep their own fallback handling.
+    """
+    cache = get_response_cache() if cache is None else cache
+    model_name = model_name or getattr(model, "model_name", "")
+    key = cache_key(prompt, model_name, generation_config)
+
+    text = cache.get(key)
+    if text is not None:
+        return text, True
+
+    response = model.generate_content(contents=prompt, generation_config=generation_config)
+    text = response.text
+    if text:
+        cache.put(key, text, model_name)
+    return text, False
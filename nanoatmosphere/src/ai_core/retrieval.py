@@ -0,0 +1,205 @@
+"""
+Local retrieval over our own data, used to ground advisor prompts.
+
+Snippets come from city gas profiles, interpret_city notes, community
+reports and past policy briefs. Each is embedded as a hashed bag of words
+and bigrams (no model download, no network) into one float32 matrix;
+search is a single matrix-vector product plus argpartition for the top k.
+build_context() keeps only as many of the best snippets as fit a token
+budget, so prompts stay small.
+"""
+import math
+import re
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from src.ai_core.breathability import score_no2
+from src.ai_core.policy_briefs import BRIEFS_DIR
+from src.data_engine.city_profiles import DATA_PATH, interpret_city, load_city_gases
+from src.data_engine.spatial_index import MAX_CITY_DISTANCE_KM, REPORTS_PATH, tag_community_reports
+
+DIM = 2048
+
+# Rough prompt-token estimate for English text
+CHARS_PER_TOKEN = 4
+
+DEFAULT_K = 6
+DEFAULT_TOKEN_BUDGET = 300
+
+# Score bonus for snippets about the city being asked about
+CITY_BOOST = 0.25
+
+_WORD_RE = re.compile(r"[a-z0-9₂]+")
+
+
+class Snippet(NamedTuple):
+    source: str  # "profile", "notes", "report" or "advisory"
+    city: str
+    text: str
+
+
+class Hit(NamedTuple):
+    snippet: Snippet
+    score: float
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _features(text: str) -> List[str]:
+    words = _WORD_RE.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def embed(texts: Sequence[str], dim: int = DIM) -> np.ndarray:
+    """
+    (len(texts), dim) L2-normalised hashed term vectors with log term counts.
+    """
+    out = np.zeros((len(texts), dim), dtype="float32")
+    for i, text in enumerate(texts):
+        feats = _features(text)
+        if not feats:
+            continue
+        idx = np.fromiter((zlib.crc32(f.encode("utf-8")) % dim for f in feats), dtype=np.int64, count=len(feats))
+        np.add.at(out[i], idx, 1.0)
+    np.log1p(out, out=out)
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    np.divide(out, norms, out=out, where=norms > 0)
+    return out
+
+
+class VectorIndex:
+    """
+    Dense cosine index: one normalised row per snippet.
+    """
+
+    def __init__(self, snippets: Sequence[Snippet], dim: int = DIM):
+        self.snippets = list(snippets)
+        self.dim = dim
+        self.vectors = embed([s.text for s in self.snippets], dim)
+        self._cities = np.array([s.city.lower() for s in self.snippets], dtype=object)
+
+    def __len__(self) -> int:
+        return len(self.snippets)
+
+    def search(self, query: str, k: int = DEFAULT_K, city: Optional[str] = None) -> List[Hit]:
+        if not len(self):
+            return []
+        scores = self.vectors @ embed([query], self.dim)[0]
+        if city:
+            scores = scores + CITY_BOOST * (self._cities == city.strip().lower())
+        k = min(k, len(self))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [Hit(self.snippets[i], float(scores[i])) for i in top if scores[i] > 0]
+
+
+def city_snippets(city_gases: Dict[str, Dict[str, float]]) -> List[Snippet]:
+    cities = list(city_gases)
+    scores = score_no2([city_gases[c]["NO2"] for c in cities])
+    out = []
+    for i, city in enumerate(cities):
+        g = city_gases[city]
+        out.append(Snippet("profile", city, (
+            f"{city} monthly mean: NO₂ {g['NO2']:.1e}, SO₂ {g['SO2']:.1e}, CO {g['CO']:.3f} mol/m²; "
+            f"Breathability {scores.breathability[i]:.0f}/100, {scores.risk_label[i]} risk."
+        )))
+        for note in interpret_city(g):
+            out.append(Snippet("notes", city, f"{city}: {note.replace('**', '')}"))
+    return out
+
+
+def report_snippets(path: Path = REPORTS_PATH, max_km: float = MAX_CITY_DISTANCE_KM) -> List[Snippet]:
+    """
+    One snippet per described report, attributed to the city within
+    `max_km` of its coordinates. Reports further from every city keep the
+    city the reporter typed but are labelled unverified; with no typed
+    city either they are dropped.
+    """
+    if not Path(path).exists():
+        return []
+    out = []
+    for row in tag_community_reports(path, max_km):
+        description = (row.get("description") or "").strip()
+        if not description:
+            continue
+        # Reporter identity never goes into prompts
+        city, where, note = row.get("nearest_city"), "near", ""
+        if not city:
+            city, where, note = (row.get("city") or "").strip().title(), "for", ", location unverified"
+        if not city:
+            continue
+        out.append(Snippet("report", city, (
+            f"Community report {where} {city} ({row.get('timestamp', '')[:10]}{note}): "
+            f"{row.get('category', '')}, severity {row.get('severity', '')}/5, "
+            f"{row.get('status', '').lower()}: \"{description}\""
+        )))
+    return out
+
+
+def advisory_snippets(briefs_dir: Path = BRIEFS_DIR, max_chars: int = 400) -> List[Snippet]:
+    """
+    Bullet points and paragraphs from saved briefs, newest run first.
+    """
+    out = []
+    for run_dir in sorted(Path(briefs_dir).glob("*/"), reverse=True)[:3]:
+        for path in sorted(run_dir.glob("*.md")):
+            lines = path.read_text(encoding="utf-8").splitlines()
+            city = lines[0].lstrip("# ").strip() if lines else path.stem
+            for block in re.split(r"\n\s*\n|\n(?=\s*[-*] )", "\n".join(lines[1:])):
+                block = " ".join(block.split()).lstrip("-* ")
+                if len(block) >= 40:
+                    out.append(Snippet("advisory", city, f"Past advisory for {city} ({run_dir.name}): {block[:max_chars]}"))
+    return out
+
+
+def _mtime(path: Path) -> int:
+    return path.stat().st_mtime_ns if path.exists() else 0
+
+
+_index: Dict[tuple, VectorIndex] = {}
+_lock = threading.Lock()
+
+
+def get_index(briefs_dir: Path = BRIEFS_DIR) -> VectorIndex:
+    """
+    Shared index, rebuilt when a source file changes or a brief run lands.
+    """
+    brief_runs = tuple(sorted(p.name for p in Path(briefs_dir).glob("*/"))) if Path(briefs_dir).exists() else ()
+    key = (_mtime(DATA_PATH), _mtime(REPORTS_PATH), brief_runs)
+    with _lock:
+        index = _index.get(key)
+    if index is None:
+        snippets = city_snippets(load_city_gases()) + report_snippets() + advisory_snippets(briefs_dir)
+        index = VectorIndex(snippets)
+        with _lock:
+            _index.clear()
+            _index[key] = index
+    return index
+
+
+def build_context(
+    query: str,
+    city: Optional[str] = None,
+    k: int = DEFAULT_K,
+    max_tokens: int = DEFAULT_TOKEN_BUDGET,
+    index: Optional[VectorIndex] = None,
+) -> str:
+    """
+    Best-matching snippets as "- ..." lines, within `max_tokens`.
+    """
+    index = get_index() if index is None else index
+    lines, used = [], 0
+    for hit in index.search(f"{city or ''} {query}", k=k, city=city):
+        line = f"- {hit.snippet.text}"
+        cost = estimate_tokens(line) + 1
+        if used + cost > max_tokens:
+            continue
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+
+import numpy as np
+import rasterio
+from rasterio.crs import CRS
+
+from src.data_engine.no2_cube import NO2Cube, load_cube
+from src.data_engine.no2_sampler import sample_raster_batch
+
+TREND_DIR = Path(__file__).resolve().parents[2] / "data" / "cache" / "trend"
+
+RASTERS = ("intercept", "slope", "residual_variance")
+
+# Pixels per chunk when solving, bounds peak memory
+CHUNK_PIXELS = 1_000_000
+
+
+class TrendFit(NamedTuple):
+    intercept: np.ndarray          # NO2 at t = 0 (the newest layer)
+    slope: np.ndarray              # NO2 change per hour
+    residual_variance: np.ndarray  # NaN where there are no spare degrees of freedom
+    seasonal: Optional[np.ndarray]  # (2, y, x) sin/cos amplitudes, if fitted
+    period_hours: Optional[float]
+
+    def predict(self, hours_ahead: float) -> np.ndarray:
+        out = self.intercept + self.slope * hours_ahead
+        if self.seasonal is not None:
+            w = 2 * np.pi * hours_ahead / self.period_hours
+            out = out + self.seasonal[0] * np.sin(w) + self.seasonal[1] * np.cos(w)
+        return out
+
+
+def design_matrix(hours: np.ndarray, period_hours: Optional[float] = None) -> np.ndarray:
+    cols = [np.ones_like(hours), hours]
+    if period_hours:
+        w = 2 * np.pi * hours / period_hours
+        cols += [np.sin(w), np.cos(w)]
+    return np.stack(cols, axis=1)
+
+
+def _pattern_keys(valid: np.ndarray) -> np.ndarray:
+    """
+    One 1-D key per column of the (time, pixels) mask: an integer bitmask
+    up to 64 layers, the packed bits as a fixed-size byte string beyond.
+    """
+    t = valid.shape[0]
+    if t <= 64:
+        weights = np.left_shift(np.uint64(1), np.arange(t, dtype=np.uint64))
+        return (valid.astype(np.uint64) * weights[:, None]).sum(axis=0, dtype=np.uint64)
+    packed = np.ascontiguousarray(np.packbits(valid, axis=0).T)
+    return packed.view(np.dtype((np.void, packed.shape[1]))).ravel()
+
+
+def fit_trend(
+    cube: NO2Cube,
+    period_hours: Optional[float] = None,
+    chunk_pixels: int = CHUNK_PIXELS,
+) -> TrendFit:
+    """
+    Least-squares trend (plus optional sin/cos seasonality) for every pixel.
+
+    All pixels share one design matrix, so the fit is a single
+    pseudo-inverse applied to the (time, pixels) matrix. Pixels with gaps
+    are grouped by their missing-value pattern (any number of layers) and
+    each group is solved with its own pseudo-inverse, still one matrix
+    product per group.
+    """
+    t, height, width = cube.shape
+    X = design_matrix(cube.hours, period_hours)
+    p = X.shape[1]
+    series = cube.data.reshape(t, height * width)
+
+    coef = np.full((p, height * width), np.nan, dtype="float64")
+    rss = np.full(height * width, np.nan, dtype="float64")
+    dof = np.zeros(height * width, dtype=np.int64)
+
+    for start in range(0, series.shape[1], chunk_pixels):
+        Y = np.asarray(series[:, start:start + chunk_pixels], dtype="float64")
+        valid = ~np.isnan(Y)
+        # One group per distinct valid-time pattern; columns of each group
+        # come from a single sort of the group ids
+        _, group, counts = np.unique(_pattern_keys(valid), return_inverse=True, return_counts=True)
+        order = np.argsort(group.ravel(), kind="stable")
+        for cols in np.split(order, np.cumsum(counts)[:-1]):
+            rows = np.flatnonzero(valid[:, cols[0]])
+            if len(rows) < 2:
+                continue
+            Xv = X[rows]
+            Yv = Y[np.ix_(rows, cols)]
+            beta = np.linalg.pinv(Xv) @ Yv
+            resid = Yv - Xv @ beta
+            coef[:, start + cols] = beta
+            rss[start + cols] = (resid ** 2).sum(axis=0)
+            dof[start + cols] = len(rows) - np.linalg.matrix_rank(Xv)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        variance = np.where(dof > 0, rss / np.maximum(dof, 1), np.nan)
+
+    shape = (height, width)
+    return TrendFit(
+        intercept=coef[0].reshape(shape).astype("float32"),
+        slope=coef[1].reshape(shape).astype("float32"),
+        residual_variance=variance.reshape(shape).astype("float32"),
+        seasonal=coef[2:4].reshape((2,) + shape).astype("float32") if period_hours else None,
+        period_hours=period_hours,
+    )
+
+
+def _cube_key(cube: NO2Cube, period_hours: Optional[float]) -> str:
+    src = json.dumps([cube.meta.get("sources"), cube.meta.get("hours"), period_hours], sort_keys=True)
+    return hashlib.sha1(src.encode()).hexdigest()[:16]
+
+
+def _period_tag(period_hours: Optional[float]) -> str:
+    return f"p{period_hours:g}h" if period_hours else "linear"
+
+
+def write_trend_rasters(fit: TrendFit, cube: NO2Cube, out_dir: Path, prefix: str = "trend") -> Dict[str, Path]:
+    """
+    Write <prefix>_<intercept|slope|residual_variance>.tif into `out_dir`.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    _, height, width = cube.shape
+    profile = {
+        "driver": "GTiff",
+        "width": width,
+        "height": height,
+        "count": 1,
+        "dtype": "float32",
+        "crs": CRS.from_string(cube.crs) if cube.crs else None,
+        "transform": cube.transform,
+        "nodata": np.nan,
+        "compress": "deflate",
+    }
+    paths = {}
+    for name in RASTERS:
+        path = out_dir / f"{prefix}_{name}.tif"
+        tmp = path.with_suffix(f".tif.{os.getpid()}.{threading.get_ident()}.tmp")
+        with rasterio.open(tmp, "w", **profile) as dst:
+            dst.write(getattr(fit, name), 1)
+        tmp.replace(path)
+        paths[name] = path
+    return paths
+
+
+_lock = threading.Lock()
+
+
+def get_trend_rasters(
+    cube: Optional[NO2Cube] = None,
+    period_hours: Optional[float] = None,
+    out_dir: Path = TREND_DIR,
+) -> Dict[str, Path]:
+    """
+    Paths of the intercept / slope / residual-variance rasters for the
+    current cube, fitting and writing them only if the cube changed.
+
+    Only older fits with the same `period_hours` are removed; fits for
+    other periods are kept.
+    """
+    cube = load_cube() if cube is None else cube
+    tag = _period_tag(period_hours)
+    prefix = f"trend_{tag}_{_cube_key(cube, period_hours)}"
+    paths = {name: out_dir / f"{prefix}_{name}.tif" for name in RASTERS}
+    if all(p.exists() for p in paths.values()):
+        return paths
+
+    with _lock:
+        if all(p.exists() for p in paths.values()):
+            return paths
+        paths = write_trend_rasters(fit_trend(cube, period_hours), cube, out_dir, prefix)
+        for stale in out_dir.glob(f"trend_{tag}_*.tif"):
+            if not stale.name.startswith(prefix + "_"):
+                stale.unlink(missing_ok=True)
+        return paths
+
+
+def trend_at(lat: float, lon: float, hours_ahead: float = 24.0) -> Dict[str, float]:
+    """
+    Trend at a point from the forecast precompute job: slope per day,
+    residual std and the expected NO2 `hours_ahead` after the newest layer.
+
+    Nothing is fitted here; points outside every precomputed region get NaN.
+    """
+    # Imported here: forecast_precompute itself imports this module
+    from src.ai_core.forecast_precompute import precomputed_trend_paths
+
+    paths = precomputed_trend_paths(lat, lon)
+    if paths is None:
+        return {"slope_per_day": np.nan, "residual_std": np.nan, "expected": np.nan}
+    values = {name: float(sample_raster_batch(p, lat, lon)) for name, p in paths.items()}
+    return {
+        "slope_per_day": values["slope"] * 24.0,
+        "residual_std": float(np.sqrt(values["residual_variance"])),
+        "expected": values["intercept"] + values["slope"] * hours_ahead,
+    }
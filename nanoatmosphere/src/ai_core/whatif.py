@@ -0,0 +1,232 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.ai_core.breathability import RISK_HIGH, breathability_index, risk_class, score_no2
+
+
+class Lever(NamedTuple):
+    name: str
+    label: str
+    min_value: int
+    max_value: int
+    step: int
+    default: int
+    reduction_per_unit: float  # NO2 removed (mol/m²) per unit
+    cost_per_unit: float       # ₹ lakh per unit, illustrative
+    reduction_spread: float    # log-normal sigma around reduction_per_unit
+
+
+# Simple illustrative coefficients; tweak them to change lever strength
+LEVERS = (
+    Lever("trees", "Urban trees / green buffers (units)", 0, 2000, 100, 500, 1e-8, 0.5, 0.5),
+    Lever("buses", "Electric / low‑emission buses (lines)", 0, 50, 5, 10, 5e-8, 40.0, 0.3),
+    Lever("trucks", "Truck‑time restrictions (hours/day)", 0, 12, 1, 4, 1e-7, 15.0, 0.4),
+)
+
+
+def lever_levels(lever: Lever) -> np.ndarray:
+    return np.arange(lever.min_value, lever.max_value + 1, lever.step)
+
+
+def policy_reduction(levels: Dict[str, float], levers: Sequence[Lever] = LEVERS) -> float:
+    return float(sum(lever.reduction_per_unit * levels[lever.name] for lever in levers))
+
+
+def policy_cost(levels: Dict[str, float], levers: Sequence[Lever] = LEVERS) -> float:
+    return float(sum(lever.cost_per_unit * levels[lever.name] for lever in levers))
+
+
+class PolicySweep(NamedTuple):
+    levels: Dict[str, np.ndarray]  # lever name -> level of each package
+    cost: np.ndarray
+    no2: np.ndarray
+    breathability: np.ndarray
+    risk_code: np.ndarray
+
+    def package(self, i: int) -> Dict[str, float]:
+        out = {name: int(level[i]) for name, level in self.levels.items()}
+        out.update(cost=float(self.cost[i]), no2=float(self.no2[i]),
+                   breathability=float(self.breathability[i]))
+        return out
+
+
+def sweep(no2_base: float, levers: Sequence[Lever] = LEVERS) -> PolicySweep:
+    """
+    Score every combination of lever levels at once.
+
+    Each lever contributes an array along its own axis; reductions and
+    costs are broadcast into the full grid (21 x 11 x 13 packages by
+    default) and scored in one score_no2 call. Results are flattened, one
+    entry per package.
+    """
+    axes = np.ix_(*[lever_levels(lever) for lever in levers])
+    reduction = sum(lever.reduction_per_unit * ax for lever, ax in zip(levers, axes))
+    cost = sum(lever.cost_per_unit * ax for lever, ax in zip(levers, axes))
+
+    no2 = np.maximum(no2_base - reduction, 0.0)
+    score = score_no2(no2)
+    shape = no2.shape
+    return PolicySweep(
+        levels={lever.name: np.broadcast_to(ax, shape).ravel() for lever, ax in zip(levers, axes)},
+        cost=np.broadcast_to(cost, shape).ravel(),
+        no2=no2.ravel(),
+        breathability=score.breathability.ravel(),
+        risk_code=score.risk_code.ravel(),
+    )
+
+
+def pareto_frontier(cost: np.ndarray, benefit: np.ndarray) -> np.ndarray:
+    """
+    Indices of the packages no other package beats on both cost and benefit,
+    cheapest first. NaN benefits are ignored.
+    """
+    idx = np.flatnonzero(~np.isnan(benefit))
+    # By cost, then best benefit first among equal costs
+    idx = idx[np.lexsort((-benefit[idx], cost[idx]))]
+    best_before = np.maximum.accumulate(np.concatenate([[-np.inf], benefit[idx][:-1]]))
+    return idx[benefit[idx] > best_before]
+
+
+def cheapest_package(result: PolicySweep, target: float) -> Optional[int]:
+    """
+    Index of the cheapest package reaching `target` breathability (the best
+    such package on ties), or None if none does.
+    """
+    ok = np.flatnonzero(result.breathability >= target)
+    if not ok.size:
+        return None
+    return int(ok[np.lexsort((-result.breathability[ok], result.cost[ok]))[0]])
+
+
+PERCENTILES: Tuple[float, ...] = (5, 25, 50, 75, 95)
+
+# Below this many draws a process pool costs more than it saves
+MIN_POOL_DRAWS = 200_000
+
+# Baseline NO2 noise (relative std) when no local spread is known
+DEFAULT_NO2_NOISE = 0.1
+
+
+class UncertaintyBands(NamedTuple):
+    percentiles: Tuple[float, ...]
+    no2: np.ndarray            # NO2 at each percentile
+    breathability: np.ndarray  # breathability at each percentile
+    p_high_risk: float         # share of draws in the High risk band
+    draws: int
+
+
+def _simulate(
+    no2_base: float,
+    no2_std: float,
+    reductions: np.ndarray,
+    spreads: np.ndarray,
+    n: int,
+    seed,
+) -> np.ndarray:
+    """
+    `n` simulated NO2 values: noisy baseline minus log-normal lever effects.
+    """
+    rng = np.random.default_rng(seed)
+    no2 = rng.normal(no2_base, no2_std, n)
+    factors = rng.lognormal(0.0, 1.0, (n, len(reductions))) ** spreads
+    no2 -= factors @ reductions
+    return np.maximum(no2, 0.0).astype("float32")
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a threaded Streamlit server is not safe
+            _pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+def monte_carlo(
+    no2_base: float,
+    levels: Dict[str, float],
+    draws: int = 200_000,
+    no2_std: Optional[float] = None,
+    seed: int = 0,
+    workers: Optional[int] = None,
+    levers: Sequence[Lever] = LEVERS,
+) -> UncertaintyBands:
+    """
+    Percentile bands of NO2 and breathability under uncertain coefficients.
+
+    Each lever's NO2 reduction per unit is log-normal around its point
+    value (sigma = reduction_spread) and the baseline gets Gaussian noise
+    of `no2_std`. Draws are vectorised per chunk; large runs are split
+    into one chunk per worker on a shared process pool. Results are
+    reproducible for a given `seed` and worker count.
+    """
+    if no2_std is None or not no2_std == no2_std:
+        no2_std = abs(no2_base) * DEFAULT_NO2_NOISE
+    reductions = np.array([lever.reduction_per_unit * levels[lever.name] for lever in levers])
+    spreads = np.array([lever.reduction_spread for lever in levers])
+
+    n_chunks = max(1, workers or (os.cpu_count() or 1)) if draws >= MIN_POOL_DRAWS else 1
+    sizes = np.full(n_chunks, draws // n_chunks)
+    sizes[:draws % n_chunks] += 1
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    args = [(no2_base, no2_std, reductions, spreads, int(n), s) for n, s in zip(sizes, seeds)]
+
+    if n_chunks == 1:
+        samples = _simulate(*args[0])
+    else:
+        pool = _get_pool()
+        samples = np.concatenate(list(pool.map(_simulate, *zip(*args))))
+
+    no2 = np.percentile(samples, PERCENTILES)
+    # Breathability falls as NO2 rises, so its percentiles mirror NO2's
+    breathability = breathability_index(no2[::-1])
+    p_high = float(np.mean(risk_class(breathability_index(samples)) == RISK_HIGH))
+    return UncertaintyBands(PERCENTILES, no2, breathability, p_high, int(draws))
+
+
+_bands: "OrderedDict[tuple, UncertaintyBands]" = OrderedDict()
+_bands_lock = threading.Lock()
+
+
+def uncertainty_for(
+    location: Tuple[float, float],
+    no2_base: float,
+    levels: Dict[str, float],
+    no2_std: Optional[float] = None,
+    draws: int = 200_000,
+) -> UncertaintyBands:
+    """
+    monte_carlo() memoised by (location, baseline NO2 and its spread, lever
+    levels, draws), so refreshed rasters give fresh bands.
+    """
+    std = None if no2_std is None or not no2_std == no2_std else float(no2_std)
+    key = (
+        round(location[0], 5), round(location[1], 5), float(no2_base), std,
+        tuple(sorted(levels.items())), draws,
+    )
+    with _bands_lock:
+        bands = _bands.get(key)
+        if bands is not None:
+            _bands.move_to_end(key)
+            return bands
+    bands = monte_carlo(no2_base, levels, draws=draws, no2_std=no2_std)
+    with _bands_lock:
+        _bands[key] = bands
+        while len(_bands) > 256:
+            _bands.popitem(last=False)
+    return bands
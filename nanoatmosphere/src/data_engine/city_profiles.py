@@ -1,6 +1,7 @@
 from pathlib import Path
 import csv
-from typing import Dict, List
+import json
+from typing import Dict, List, Tuple
 
 
 # Path to data/city_gases.csv relative to this file
@@ -33,6 +34,22 @@ def load_city_gases() -> Dict[str, Dict[str, float]]:
 CITY_GASES: Dict[str, Dict[str, float]] = load_city_gases()
 
 
+def load_city_locations() -> Dict[str, Tuple[float, float]]:
+    """
+    Load each city's (lat, lon) from the GeoJSON `.geo` column of city_gases.csv.
+    """
+    locations: Dict[str, Tuple[float, float]] = {}
+
+    with open(DATA_PATH, newline="") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            geo = json.loads(row[".geo"])
+            lon, lat = geo["coordinates"][:2]
+            locations[row["name"]] = (float(lat), float(lon))
+
+    return locations
+
+
 def interpret_city(gases: Dict[str, float]) -> List[str]:
     """
     Generate simple, readable observations for a city's gas fingerprint.
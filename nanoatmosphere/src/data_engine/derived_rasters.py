@@ -0,0 +1,180 @@
+"""
+Precomputed Breathability and Risk rasters for every NO2 layer.
+
+Each NO2 GeoTIFF gets two compressed uint8 companions in data/cache/derived,
+named after the source's SHA-256, so they are rebuilt only when the source
+bytes change:
+    <stem>_<sha>_breathability.tif   0–100, 255 = nodata
+    <stem>_<sha>_risk.tif            RISK_LOW / MEDIUM / HIGH, 255 = nodata
+
+The God-Eye page reads the risk raster through risk_histogram for its
+area-by-risk breakdown; sample_derived gives the same values at points.
+
+Derive everything up front with:
+    python -m src.data_engine.derived_rasters
+"""
+import hashlib
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, NamedTuple, Tuple
+
+import numpy as np
+import rasterio
+
+from src.ai_core.breathability import RISK_LABELS, RISK_NODATA, score_no2
+from src.data_engine.mosaic import get_catalog
+from src.data_engine.no2_sampler import sample_raster_batch
+from src.data_engine.raster_registry import RasterVersion, get_band, get_meta, raster_version
+
+DATA_DIR = Path(__file__).resolve().parents[2] / "data"
+DERIVED_DIR = DATA_DIR / "cache" / "derived"
+
+NODATA = 255
+
+
+class DerivedLayer(NamedTuple):
+    source: str
+    checksum: str
+    breathability_path: Path
+    risk_path: Path
+
+
+_checksums: Dict[RasterVersion, str] = {}
+_lock = threading.Lock()
+
+
+def source_checksum(path) -> str:
+    """
+    SHA-256 of a raster file, recomputed only when its mtime changes.
+    """
+    version = raster_version(path)
+    with _lock:
+        digest = _checksums.get(version)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(version[0], "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        with _lock:
+            _checksums[version] = digest
+    return digest
+
+
+def _write_uint8(path: Path, arr: np.ndarray, meta) -> None:
+    profile = {
+        "driver": "GTiff",
+        "width": meta.width,
+        "height": meta.height,
+        "count": 1,
+        "dtype": "uint8",
+        "crs": meta.crs,
+        "transform": meta.transform,
+        "nodata": NODATA,
+        "compress": "deflate",
+        "predictor": 2,
+        "tiled": meta.width >= 256 and meta.height >= 256,
+    }
+    # Per-writer temp name: sessions deriving the same layer at once must not share it
+    tmp = path.with_suffix(f".tif.{os.getpid()}.{threading.get_ident()}.tmp")
+    with rasterio.open(tmp, "w", **profile) as dst:
+        dst.write(arr, 1)
+    tmp.replace(path)
+
+
+def derive_layer(path, out_dir: Path = DERIVED_DIR) -> DerivedLayer:
+    """
+    Make sure Breathability / Risk rasters exist for the current source.
+
+    Cheap when nothing changed: one stat() plus two exists() checks. Outputs
+    from older checksums of the same source are removed.
+    """
+    checksum = source_checksum(path)
+    stem = Path(path).stem
+    tag = f"{stem}_{checksum[:16]}"
+    layer = DerivedLayer(
+        source=str(path),
+        checksum=checksum,
+        breathability_path=out_dir / f"{tag}_breathability.tif",
+        risk_path=out_dir / f"{tag}_risk.tif",
+    )
+    if layer.breathability_path.exists() and layer.risk_path.exists():
+        return layer
+
+    score = score_no2(get_band(path))
+    breathability = np.where(
+        np.isnan(score.breathability), NODATA, np.rint(score.breathability)
+    ).astype(np.uint8)
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    own = re.compile(rf"{re.escape(stem)}_[0-9a-f]{{16}}_(breathability|risk)\.tif")
+    for stale in out_dir.glob(f"{stem}_*.tif"):
+        if own.fullmatch(stale.name) and not stale.name.startswith(tag):
+            stale.unlink()
+
+    meta = get_meta(path)
+    _write_uint8(layer.breathability_path, breathability, meta)
+    _write_uint8(layer.risk_path, score.risk_code, meta)
+    return layer
+
+
+def derive_all(data_dir: Path = DATA_DIR) -> Dict[str, DerivedLayer]:
+    return {p.stem: derive_layer(p) for p in sorted(data_dir.glob("NO2_*.tif"))}
+
+
+def sample_derived(lats, lons, layer: str = "Recent") -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Precomputed (breathability, risk code) at many points of a time layer.
+
+    Points are routed through the national mosaic; uncovered points get
+    NaN breathability and RISK_NODATA.
+    """
+    lats = np.asarray(lats, dtype="float64")
+    lons = np.asarray(lons, dtype="float64")
+    breathability = np.full(lats.shape, np.nan)
+    risk = np.full(lats.shape, RISK_NODATA, dtype=np.uint8)
+
+    catalog = get_catalog(layer)
+    for i, mask in sorted(catalog.route(lats, lons).items(), reverse=True):
+        derived = derive_layer(catalog.paths[i])
+        b = sample_raster_batch(derived.breathability_path, lats[mask], lons[mask])
+        r = sample_raster_batch(derived.risk_path, lats[mask], lons[mask])
+        valid = ~np.isnan(b)
+        breathability[mask] = np.where(valid, b, breathability[mask])
+        risk[mask] = np.where(valid, np.nan_to_num(r, nan=RISK_NODATA), risk[mask]).astype(np.uint8)
+    return breathability, risk
+
+
+def breathability_at(lat: float, lon: float, layer: str = "Recent") -> Tuple[float, int]:
+    breathability, risk = sample_derived(lat, lon, layer)
+    return float(breathability), int(risk)
+
+
+def risk_histogram(path, out_dir: Path = DERIVED_DIR) -> Dict[str, Dict[str, float]]:
+    """
+    Pixel count and approximate area (km²) per risk class of a NO2 raster.
+    """
+    derived = derive_layer(path, out_dir)
+    risk = get_band(derived.risk_path)
+    meta = get_meta(path)
+
+    codes = np.where(np.isnan(risk), NODATA, risk).astype(np.int64)
+    # Pixel area shrinks with cos(latitude) on a lat/lon grid
+    lats = meta.transform.f + (np.arange(meta.height) + 0.5) * meta.transform.e
+    km_x = abs(meta.transform.a) * 111.32 * np.cos(np.radians(lats))
+    km_y = abs(meta.transform.e) * 110.57
+    row_area = np.broadcast_to((km_x * km_y)[:, None], codes.shape)
+
+    counts = np.bincount(codes.ravel(), minlength=256)
+    areas = np.bincount(codes.ravel(), weights=row_area.ravel(), minlength=256)
+    return {
+        label: {"pixels": int(counts[code]), "area_km2": float(areas[code])}
+        for code, label in enumerate(RISK_LABELS)
+    }
+
+
+if __name__ == "__main__":
+    for stem, derived in derive_all().items():
+        print(f"{stem}: {derived.breathability_path.name}, {derived.risk_path.name}")
@@ -0,0 +1,300 @@
+import math
+import os
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+import numpy as np
+from affine import Affine
+
+from src.data_engine.no2_sampler import neighborhood_stats, sample_raster_batch
+from src.data_engine.raster_registry import get_meta, raster_version
+
+DATA_DIR = Path(__file__).resolve().parents[2] / "data"
+MOSAIC_DIR = DATA_DIR / "cache" / "mosaic"
+
+# Per-city exports are named NO2_<City>_<n>.tif, one <n> per time layer
+LAYER_PATTERNS: Dict[str, str] = {
+    "Recent": "NO2_*_1.tif",
+    "Last Week": "NO2_*_2.tif",
+    "Last Month": "NO2_*_3.tif",
+}
+
+MERGE_MODES = ("first", "mean", "max")
+
+
+class MosaicCatalog:
+    """
+    Virtual NO2 grid over many (possibly overlapping) city rasters.
+
+    Raster footprints are bucketed into a uniform lat/lon grid, so a batch
+    of points only touches the rasters whose footprint shares a cell with
+    at least one point. Earlier paths win for merge="first".
+    """
+
+    def __init__(self, paths: Sequence, cell_deg: float = 1.0):
+        self.paths: List[str] = [str(p) for p in paths]
+        self.cell_deg = cell_deg
+
+        metas = [get_meta(p) for p in self.paths]
+        self.bounds = np.array(
+            [[m.bounds.left, m.bounds.bottom, m.bounds.right, m.bounds.top] for m in metas],
+            dtype="float64",
+        ).reshape(-1, 4)
+        self.resolutions = np.array(
+            [[abs(m.transform.a), abs(m.transform.e)] for m in metas], dtype="float64"
+        ).reshape(-1, 2)
+
+        self._cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for i, (west, south, east, north) in enumerate(self.bounds):
+            for ix in range(self._cell(west), self._cell(east) + 1):
+                for iy in range(self._cell(south), self._cell(north) + 1):
+                    self._cells[(ix, iy)].append(i)
+
+    def _cell(self, value: float) -> int:
+        return int(math.floor(value / self.cell_deg))
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    @property
+    def extent(self) -> Tuple[float, float, float, float]:
+        """
+        (west, south, east, north) of the union of all footprints.
+        """
+        if not len(self):
+            raise ValueError("Empty mosaic")
+        return (
+            float(self.bounds[:, 0].min()), float(self.bounds[:, 1].min()),
+            float(self.bounds[:, 2].max()), float(self.bounds[:, 3].max()),
+        )
+
+    def route(self, lats, lons) -> Dict[int, np.ndarray]:
+        """
+        Map raster index -> boolean mask of the points inside its footprint.
+        """
+        lats = np.asarray(lats, dtype="float64")
+        lons = np.asarray(lons, dtype="float64")
+        ix = np.floor(lons / self.cell_deg).astype(np.int64)
+        iy = np.floor(lats / self.cell_deg).astype(np.int64)
+
+        cells, inverse = np.unique(np.stack([ix.ravel(), iy.ravel()]), axis=1, return_inverse=True)
+        inverse = inverse.reshape(lats.shape)
+
+        by_raster: Dict[int, List[int]] = defaultdict(list)
+        for u, (cx, cy) in enumerate(cells.T):
+            for i in self._cells.get((int(cx), int(cy)), ()):
+                by_raster[i].append(u)
+
+        routes = {}
+        for i, cell_ids in by_raster.items():
+            west, south, east, north = self.bounds[i]
+            mask = np.isin(inverse, cell_ids)
+            mask &= (lons >= west) & (lons < east) & (lats > south) & (lats <= north)
+            if mask.any():
+                routes[i] = mask
+        return routes
+
+    def sample(
+        self, lats, lons, merge: str = "first", mode: str = "nearest", size: int = 3
+    ) -> np.ndarray:
+        """
+        Sample NO2 for a batch of points across the whole mosaic.
+
+        Where rasters overlap, `merge` picks the first valid value in catalog
+        order, the mean, or the max. Points covered by no raster are NaN.
+        `mode` and `size` are passed to no2_sampler.sample_raster_batch.
+        """
+        if merge not in MERGE_MODES:
+            raise ValueError(f"Unknown merge '{merge}', expected one of {MERGE_MODES}")
+
+        lats = np.asarray(lats, dtype="float64")
+        lons = np.asarray(lons, dtype="float64")
+        out = np.full(lats.shape, np.nan)
+        total = np.zeros(lats.shape) if merge == "mean" else None
+        count = np.zeros(lats.shape) if merge == "mean" else None
+
+        for i, mask in sorted(self.route(lats, lons).items()):
+            values = sample_raster_batch(
+                self.paths[i], lats[mask], lons[mask], mode=mode, size=size
+            )
+            if merge == "first":
+                current = out[mask]
+                out[mask] = np.where(np.isnan(current), values, current)
+            elif merge == "max":
+                out[mask] = np.fmax(out[mask], values)
+            else:
+                valid = ~np.isnan(values)
+                total[mask] += np.where(valid, values, 0.0)
+                count[mask] += valid
+
+        if merge == "mean":
+            with np.errstate(invalid="ignore"):
+                out = np.where(count > 0, total / np.maximum(count, 1), np.nan)
+        return out
+
+    def neighborhood(self, lats, lons, radius_km: float = 2.0) -> Dict[str, np.ndarray]:
+        """
+        no2_sampler.neighborhood_stats across the mosaic (first raster wins).
+        """
+        lats = np.asarray(lats, dtype="float64")
+        lons = np.asarray(lons, dtype="float64")
+        stats = {k: np.full(lats.shape, np.nan) for k in ("mean", "std", "min", "max")}
+        stats["count"] = np.zeros(lats.shape, dtype=np.int64)
+
+        for i, mask in sorted(self.route(lats, lons).items(), reverse=True):
+            part = neighborhood_stats(self.paths[i], lats[mask], lons[mask], radius_km)
+            covered = part["count"] > 0
+            for k, values in part.items():
+                stats[k][mask] = np.where(covered, values, stats[k][mask])
+        return stats
+
+    def read(
+        self,
+        bounds: Tuple[float, float, float, float],
+        width: int,
+        height: int,
+        merge: str = "first",
+    ) -> Tuple[np.ndarray, Affine]:
+        """
+        Read the virtual grid over (west, south, east, north) at a given size.
+
+        Returns the array and its affine transform, like a windowed read
+        from a single dataset.
+        """
+        west, south, east, north = bounds
+        transform = Affine.translation(west, north) * Affine.scale(
+            (east - west) / width, -(north - south) / height
+        )
+        cols = np.arange(width) + 0.5
+        rows = np.arange(height) + 0.5
+        lons = west + cols * transform.a
+        lats = north + rows * transform.e
+        lon_grid, lat_grid = np.meshgrid(lons, lats)
+        return self.sample(lat_grid, lon_grid, merge=merge), transform
+
+    def write_vrt(self, path) -> Path:
+        """
+        Write a GDAL VRT mosaicking all rasters at the finest resolution.
+
+        Rasterio (and the tile server) can open the result like any other
+        GeoTIFF. The first raster in catalog order is drawn on top.
+        """
+        west, south, east, north = self.extent
+        res_x, res_y = self.resolutions[:, 0].min(), self.resolutions[:, 1].min()
+        width = int(math.ceil((east - west) / res_x - 1e-6))
+        height = int(math.ceil((north - south) / res_y - 1e-6))
+
+        sources = []
+        # VRT paints later sources over earlier ones
+        for i in reversed(range(len(self))):
+            meta = get_meta(self.paths[i])
+            b_west, _, b_east, b_north = self.bounds[i]
+            x_off = int(round((b_west - west) / res_x))
+            y_off = int(round((north - b_north) / res_y))
+            x_size = int(round((b_east - b_west) / res_x))
+            y_size = int(round(meta.height * self.resolutions[i, 1] / res_y))
+            sources.append(
+                "    <ComplexSource>\n"
+                f"      <SourceFilename relativeToVRT=\"0\">{escape(meta.path)}</SourceFilename>\n"
+                "      <SourceBand>1</SourceBand>\n"
+                f"      <SrcRect xOff=\"0\" yOff=\"0\" xSize=\"{meta.width}\" ySize=\"{meta.height}\" />\n"
+                f"      <DstRect xOff=\"{x_off}\" yOff=\"{y_off}\" xSize=\"{x_size}\" ySize=\"{y_size}\" />\n"
+                "      <NODATA>nan</NODATA>\n"
+                "    </ComplexSource>\n"
+            )
+
+        crs = get_meta(self.paths[0]).crs
+        srs = f"  <SRS>{escape(crs.to_wkt())}</SRS>\n" if crs else ""
+        vrt = (
+            f"<VRTDataset rasterXSize=\"{width}\" rasterYSize=\"{height}\">\n"
+            f"{srs}"
+            f"  <GeoTransform>{west}, {res_x}, 0.0, {north}, 0.0, {-res_y}</GeoTransform>\n"
+            "  <VRTRasterBand dataType=\"Float32\" band=\"1\">\n"
+            "    <NoDataValue>nan</NoDataValue>\n"
+            f"{''.join(sources)}"
+            "  </VRTRasterBand>\n"
+            "</VRTDataset>\n"
+        )
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".vrt.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(vrt, encoding="utf-8")
+        tmp.replace(path)
+        return path
+
+
+_catalogs: Dict[tuple, MosaicCatalog] = {}
+_lock = threading.Lock()
+
+
+def layer_paths(layer: str = "Recent", data_dir: Path = DATA_DIR) -> List[Path]:
+    return sorted(data_dir.glob(LAYER_PATTERNS[layer]))
+
+
+def get_catalog(layer: str = "Recent", paths: Optional[Sequence] = None) -> MosaicCatalog:
+    """
+    Shared catalog for a time layer, rebuilt when files are added or changed.
+
+    Rebuilding a layer's default catalog also refreshes its NO2_India_<n>
+    VRT, so the tile server always sees the current mosaic.
+    """
+    default = paths is None
+    paths = [str(p) for p in (layer_paths(layer) if default else paths)]
+    key = tuple(raster_version(p) for p in paths)
+    with _lock:
+        catalog = _catalogs.get(key)
+    if catalog is None:
+        catalog = MosaicCatalog(paths)
+        with _lock:
+            _catalogs[key] = catalog
+            while len(_catalogs) > len(LAYER_PATTERNS) * 2:
+                _catalogs.pop(next(iter(_catalogs)))
+        if default and len(catalog):
+            catalog.write_vrt(layer_vrt_path(layer))
+    return catalog
+
+
+def sample_national(
+    lats, lons, layer: str = "Recent", merge: str = "first", mode: str = "nearest", size: int = 3
+) -> np.ndarray:
+    return get_catalog(layer).sample(lats, lons, merge=merge, mode=mode, size=size)
+
+
+def get_no2_national(lat, lon, layer: str = "Recent", mode: str = "nearest") -> float:
+    """
+    NO2 at any lat/lon in India covered by a city export (NaN elsewhere).
+    """
+    return float(sample_national(lat, lon, layer, mode=mode))
+
+
+def neighborhood_national(lat, lon, layer: str = "Recent", radius_km: float = 2.0) -> Dict[str, float]:
+    stats = get_catalog(layer).neighborhood(lat, lon, radius_km)
+    return {k: float(v) for k, v in stats.items()}
+
+
+def layer_vrt_path(layer: str = "Recent") -> Path:
+    suffix = LAYER_PATTERNS[layer].rsplit("_", 1)[-1].split(".")[0]
+    return MOSAIC_DIR / f"NO2_India_{suffix}.vrt"
+
+
+def write_layer_vrt(layer: str = "Recent") -> Path:
+    """
+    Write (or refresh) data/cache/mosaic/NO2_India_<n>.vrt for a time layer.
+    """
+    return get_catalog(layer).write_vrt(layer_vrt_path(layer))
+
+
+def write_layer_vrts() -> Dict[str, Path]:
+    """
+    Refresh the VRT of every time layer that has at least one city export.
+    """
+    return {layer: write_layer_vrt(layer) for layer in LAYER_PATTERNS if layer_paths(layer)}
+
+
+if __name__ == "__main__":
+    for layer, path in write_layer_vrts().items():
+        print(f"{layer}: {path}")
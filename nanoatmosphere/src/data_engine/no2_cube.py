@@ -0,0 +1,296 @@
+"""
+(time, y, x) NO2 cube stacked from the time layers, memory-mapped from disk.
+
+Every build writes its own cube-<build>.npy and cube-<build>.json, then
+swaps the one-line CURRENT pointer with os.replace. A reader resolves
+CURRENT once and opens that build's pair, so it can never mix the array of
+one build with the metadata of another. Builds older than the one just
+replaced are deleted.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from affine import Affine
+
+from src.data_engine.no2_sampler import FILES, latlon_to_pixel
+from src.data_engine.raster_registry import get_band, get_meta, raster_version
+
+# Where the stacked cube and its metadata are written
+CUBE_DIR = Path(__file__).resolve().parents[2] / "data" / "cache" / "no2_cube"
+
+# Age of each named layer in hours, used as the cube's time axis
+LAYER_AGE_HOURS: Dict[str, float] = {
+    "Recent": 0.0,
+    "Last Week": 168.0,
+    "Last Month": 720.0,
+}
+
+# Rows processed per block when reducing over time
+_BLOCK_ROWS = 512
+
+STATS = ("mean", "min", "max", "delta", "slope")
+
+
+class NO2Cube:
+    """
+    Memory-mapped (time, y, x) float32 stack of NO2 layers on one grid.
+
+    Time runs oldest -> newest. `hours` holds each slice's offset from the
+    newest layer (0 = newest, negative = older).
+    """
+
+    def __init__(self, data: np.ndarray, meta: dict):
+        self.data = data
+        self.meta = meta
+        self.labels: List[str] = meta["labels"]
+        self.hours = np.asarray(meta["hours"], dtype="float64")
+        self.transform = Affine(*meta["transform"])
+        self.crs = meta["crs"]
+        self._stats: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return self.data.shape
+
+    def layer(self, label: str) -> np.ndarray:
+        return self.data[self.labels.index(label)]
+
+    def time_series(self, lats, lons) -> np.ndarray:
+        """
+        Return the full time series at one or many points.
+
+        The result has shape `lats.shape + (time,)`; points outside the grid
+        are all-NaN.
+        """
+        rows, cols = latlon_to_pixel(lats, lons, self.transform)
+        _, height, width = self.data.shape
+        inside = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+
+        out = np.full(rows.shape + (self.data.shape[0],), np.nan, dtype="float32")
+        out[inside] = self.data[:, rows[inside], cols[inside]].T
+        return out
+
+    def temporal_stat(self, stat: str) -> np.ndarray:
+        """
+        Per-pixel reduction over time: one of mean, min, max, delta, slope.
+
+        `delta` is newest minus oldest, `slope` is the least-squares trend in
+        mol/m² per hour. Results are computed once per cube and cached.
+        """
+        if stat not in STATS:
+            raise ValueError(f"Unknown stat '{stat}', expected one of {STATS}")
+
+        with self._lock:
+            cached = self._stats.get(stat)
+        if cached is not None:
+            return cached
+
+        _, height, width = self.data.shape
+        out = np.empty((height, width), dtype="float32")
+        for start in range(0, height, _BLOCK_ROWS):
+            block = np.asarray(self.data[:, start:start + _BLOCK_ROWS], dtype="float64")
+            out[start:start + _BLOCK_ROWS] = _reduce_block(block, self.hours, stat)
+        out.flags.writeable = False
+
+        with self._lock:
+            self._stats[stat] = out
+        return out
+
+    def stats_at(self, lats, lons) -> Dict[str, np.ndarray]:
+        """
+        Temporal stats at points, computed from their time series only.
+        """
+        series = np.asarray(self.time_series(lats, lons), dtype="float64")
+        # Move time to the front so _reduce_block sees (time, ...)
+        block = np.moveaxis(series, -1, 0)
+        return {stat: _reduce_block(block, self.hours, stat) for stat in STATS}
+
+
+def _reduce_block(block: np.ndarray, hours: np.ndarray, stat: str) -> np.ndarray:
+    valid = ~np.isnan(block)
+    n = valid.sum(axis=0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if stat == "mean":
+            return np.where(n > 0, np.nansum(block, axis=0) / n, np.nan)
+        if stat == "min":
+            return np.where(n > 0, np.fmin.reduce(block, axis=0), np.nan)
+        if stat == "max":
+            return np.where(n > 0, np.fmax.reduce(block, axis=0), np.nan)
+        if stat == "delta":
+            return block[-1] - block[0]
+
+        # Least-squares slope using only valid samples of each pixel
+        t = hours.reshape((-1,) + (1,) * (block.ndim - 1))
+        t = np.where(valid, t, 0.0)
+        y = np.where(valid, block, 0.0)
+        st, sy = t.sum(axis=0), y.sum(axis=0)
+        stt, sty = (t * t).sum(axis=0), (t * y).sum(axis=0)
+        denom = n * stt - st * st
+        return np.where((n >= 2) & (denom != 0), (n * sty - st * sy) / denom, np.nan)
+
+
+def build_cube(
+    layers: Optional[Dict[str, str]] = None,
+    ages: Optional[Dict[str, float]] = None,
+    out_dir: Path = CUBE_DIR,
+) -> NO2Cube:
+    """
+    Stack NO2 layers into a memory-mapped cube on disk.
+
+    `layers` maps a label to a GeoTIFF path (default: no2_sampler.FILES) and
+    `ages` maps the same labels to their age in hours. All layers must share
+    one grid. New dates are added by passing them in both mappings.
+    """
+    layers = dict(FILES if layers is None else layers)
+    ages = dict(LAYER_AGE_HOURS if ages is None else ages)
+
+    missing = [label for label in layers if label not in ages]
+    if missing:
+        raise ValueError(f"No age given for layers: {missing}")
+
+    # Oldest first
+    order = sorted(layers, key=lambda label: -ages[label])
+    metas = [get_meta(layers[label]) for label in order]
+    first = metas[0]
+    for label, meta in zip(order, metas):
+        if (meta.width, meta.height) != (first.width, first.height) or \
+                not meta.transform.almost_equals(first.transform):
+            raise ValueError(f"Layer '{label}' is not on the same grid as '{order[0]}'")
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    # Time-ordered and unique per writer, so concurrent builds never share a file
+    build = f"{time.time_ns():016x}-{os.getpid()}-{threading.get_ident()}"
+    tmp_path = out_dir / f"cube-{build}.npy.tmp"
+    cube = np.lib.format.open_memmap(
+        tmp_path, mode="w+", dtype="float32",
+        shape=(len(order), first.height, first.width),
+    )
+    for i, label in enumerate(order):
+        cube[i] = get_band(layers[label])
+    cube.flush()
+    del cube
+
+    meta = {
+        "labels": order,
+        "hours": [0.0 - ages[label] for label in order],
+        "transform": list(first.transform)[:6],
+        "crs": first.crs.to_string() if first.crs else None,
+        "sources": {label: list(raster_version(layers[label])) for label in order},
+    }
+    (out_dir / f"cube-{build}.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    os.replace(tmp_path, out_dir / f"cube-{build}.npy")
+
+    # Publishing the pointer is the single step that switches readers over
+    previous = _current_build(out_dir)
+    pointer_tmp = out_dir / f"CURRENT.{build}.tmp"
+    pointer_tmp.write_text(build, encoding="utf-8")
+    os.replace(pointer_tmp, out_dir / "CURRENT")
+    _prune(out_dir, keep=min(previous or build, build))
+    return load_cube(out_dir=out_dir, rebuild_if_stale=False)
+
+
+def _current_build(out_dir: Path) -> Optional[str]:
+    try:
+        return (Path(out_dir) / "CURRENT").read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _prune(out_dir: Path, keep: str) -> None:
+    """
+    Delete builds older than `keep` (and pre-pointer cube.npy/cube.json).
+
+    `keep` is the build that was current until now, so a reader that
+    resolved the old pointer a moment ago still finds both of its files.
+    """
+    for path in list(out_dir.glob("cube*.npy")) + list(out_dir.glob("cube*.json")):
+        build = path.name.split(".")[0][len("cube-"):]
+        if build < keep:
+            path.unlink(missing_ok=True)
+
+
+def _is_stale(meta: dict, layers: Dict[str, str]) -> bool:
+    if set(meta.get("sources", {})) != set(layers):
+        return True
+    for label, path in layers.items():
+        try:
+            if list(raster_version(path)) != meta["sources"][label]:
+                return True
+        except OSError:
+            return True
+    return False
+
+
+_cache: Dict[Tuple[str, int], NO2Cube] = {}
+_cache_lock = threading.Lock()
+
+
+def load_cube(
+    out_dir: Path = CUBE_DIR,
+    rebuild_if_stale: bool = True,
+    layers: Optional[Dict[str, str]] = None,
+    ages: Optional[Dict[str, float]] = None,
+) -> NO2Cube:
+    """
+    Open the cube read-only as a memory map, building it if needed.
+
+    With `rebuild_if_stale`, the cube is re-ingested when any source layer
+    has changed on disk since it was built. One NO2Cube is shared per
+    process and cube version.
+    """
+    layers = dict(FILES if layers is None else layers)
+    out_dir = Path(out_dir)
+
+    cube = None
+    # A second try covers a build being pruned between reading CURRENT and opening it
+    for _ in range(2):
+        build = _current_build(out_dir)
+        if build is None:
+            break
+        key = (str(out_dir), build)
+        with _cache_lock:
+            cube = _cache.get(key)
+        if cube is not None:
+            break
+        try:
+            meta = json.loads((out_dir / f"cube-{build}.json").read_text(encoding="utf-8"))
+            cube = NO2Cube(np.load(out_dir / f"cube-{build}.npy", mmap_mode="r"), meta)
+        except FileNotFoundError:
+            continue
+        with _cache_lock:
+            # Superseded versions of this cube are dropped, releasing their
+            # memory maps once no caller still holds them
+            for old in [k for k in _cache if k[0] == key[0]]:
+                del _cache[old]
+            _cache[key] = cube
+        break
+
+    if cube is None:
+        if not rebuild_if_stale:
+            raise FileNotFoundError(f"No NO2 cube in {out_dir}")
+        return build_cube(layers, ages, out_dir)
+    if rebuild_if_stale and _is_stale(cube.meta, layers):
+        return build_cube(layers, ages, out_dir)
+    return cube
+
+
+def time_series_at(lat: float, lon: float) -> Dict[str, float]:
+    """
+    Convenience lookup: {layer label: NO2} at one point from the cube.
+    """
+    cube = load_cube()
+    series = cube.time_series(lat, lon)
+    return {label: float(v) for label, v in zip(cube.labels, series)}
+
+
+def temporal_stats_at(lat: float, lon: float, stats: Sequence[str] = STATS) -> Dict[str, float]:
+    cube = load_cube()
+    values = cube.stats_at(lat, lon)
+    return {stat: float(values[stat]) for stat in stats}
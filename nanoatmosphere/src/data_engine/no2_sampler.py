@@ -1,16 +1,176 @@
-import rasterio
+import warnings
+from typing import Dict, Tuple
 
+import numpy as np
+
+from src.data_engine.raster_registry import get_band, get_meta
+
+# Datasets are opened lazily through the shared raster registry, which
+# keeps the decoded band in memory and reloads it if the file changes.
 FILES = {
     "Recent": "nanoatmosphere/data/NO2_Chennai_1.tif",
     "Last Week": "nanoatmosphere/data/NO2_Chennai_2.tif",
     "Last Month": "nanoatmosphere/data/NO2_Chennai_3.tif",
 }
 
-_srcs = {name: rasterio.open(path) for name, path in FILES.items()}
 
-def get_no2_at_latlon(lat, lon, layer="Recent"):
-    src = _srcs[layer]
-    for arr in src.sample([(lon, lat)]):
-        return float(arr[0])
+def latlon_to_pixel(lats, lons, transform) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert arrays of lat/lon to (row, col) pixel indices in one step.
+
+    Applies the inverse affine transform to all points at once. Indices are
+    not clipped, so callers must check them against the raster shape.
+    """
+    lats = np.asarray(lats, dtype="float64")
+    lons = np.asarray(lons, dtype="float64")
+    inv = ~transform
+    cols = np.floor(inv.a * lons + inv.b * lats + inv.c).astype(np.int64)
+    rows = np.floor(inv.d * lons + inv.e * lats + inv.f).astype(np.int64)
+    return rows, cols
+
+
+SAMPLE_MODES = ("nearest", "bilinear", "mean", "max")
+
+
+def _gather(arr: np.ndarray, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    """
+    arr[rows, cols] with NaN wherever the index falls off the raster.
+    """
+    height, width = arr.shape
+    inside = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+    out = np.full(rows.shape, np.nan, dtype="float64")
+    out[inside] = arr[rows[inside], cols[inside]]
+    return out
+
+
+def _bilinear(arr: np.ndarray, lats: np.ndarray, lons: np.ndarray, transform) -> np.ndarray:
+    inv = ~transform
+    # Continuous pixel coordinates relative to pixel centres
+    x = inv.a * lons + inv.b * lats + inv.c - 0.5
+    y = inv.d * lons + inv.e * lats + inv.f - 0.5
+    c0, r0 = np.floor(x).astype(np.int64), np.floor(y).astype(np.int64)
+    fx, fy = x - c0, y - r0
+
+    values = np.stack([
+        _gather(arr, r0, c0), _gather(arr, r0, c0 + 1),
+        _gather(arr, r0 + 1, c0), _gather(arr, r0 + 1, c0 + 1),
+    ])
+    weights = np.stack([(1 - fx) * (1 - fy), fx * (1 - fy), (1 - fx) * fy, fx * fy])
+
+    # Renormalise over the valid neighbours so edges and nodata degrade gracefully
+    valid = ~np.isnan(values)
+    weights = np.where(valid, weights, 0.0)
+    total = weights.sum(axis=0)
+    with np.errstate(invalid="ignore"):
+        out = np.asarray((np.where(valid, values, 0.0) * weights).sum(axis=0) / total)
+    out[total <= 0] = np.nan
+
+    # Points outside the raster itself stay NaN, even next to its edge
+    rows, cols = latlon_to_pixel(lats, lons, transform)
+    height, width = arr.shape
+    out[(rows < 0) | (rows >= height) | (cols < 0) | (cols >= width)] = np.nan
+    return out
+
+
+def _window(arr: np.ndarray, rows: np.ndarray, cols: np.ndarray, size: int) -> np.ndarray:
+    """
+    (..., size*size) stack of the k x k pixels centred on each point.
+    """
+    half = size // 2
+    dr, dc = np.mgrid[-half:size - half, -half:size - half]
+    return _gather(arr, rows[..., None] + dr.ravel(), cols[..., None] + dc.ravel())
+
+
+def sample_raster_batch(path, lats, lons, mode: str = "nearest", size: int = 3) -> np.ndarray:
+    """
+    NO2 from any raster for many points at once.
+
+    `lats` and `lons` may be scalars or arrays of any (matching) shape. The
+    result has the same shape; points outside the raster or on nodata
+    pixels are NaN.
+
+    `mode` is one of:
+        nearest   - the pixel containing the point
+        bilinear  - interpolated between the four surrounding pixel centres
+        mean/max  - over the `size` x `size` window centred on the point
+    """
+    if mode not in SAMPLE_MODES:
+        raise ValueError(f"Unknown mode '{mode}', expected one of {SAMPLE_MODES}")
+
+    arr = get_band(path)
+    transform = get_meta(path).transform
+    lats = np.asarray(lats, dtype="float64")
+    lons = np.asarray(lons, dtype="float64")
+
+    if mode == "bilinear":
+        return _bilinear(arr, lats, lons, transform)
+
+    rows, cols = latlon_to_pixel(lats, lons, transform)
+    if mode == "nearest":
+        return _gather(arr, rows, cols)
+
+    height, width = arr.shape
+    inside = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+    window = _window(arr, rows, cols, size)
+    with np.errstate(invalid="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        out = np.nanmean(window, axis=-1) if mode == "mean" else np.nanmax(window, axis=-1)
+    return np.where(inside, out, np.nan)
+
+
+def neighborhood_stats(path, lats, lons, radius_km: float = 2.0) -> Dict[str, np.ndarray]:
+    """
+    NO2 mean, std, min, max and pixel count within `radius_km` of each point.
+
+    Offsets for the largest disk in the batch are built once and gathered
+    for every point in one step; the per-point radius accounts for the
+    pixel width shrinking with latitude. Only finite, on-raster points size
+    that disk; the others get NaN stats and a count of 0.
+    """
+    arr = get_band(path)
+    transform = get_meta(path).transform
+    lats = np.asarray(lats, dtype="float64")
+    lons = np.asarray(lons, dtype="float64")
+    with np.errstate(invalid="ignore"):
+        rows, cols = latlon_to_pixel(lats, lons, transform)
+
+    height, width = arr.shape
+    inside = (
+        np.isfinite(lats) & np.isfinite(lons)
+        & (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+    )
+    stats = {k: np.full(inside.shape, np.nan) for k in ("mean", "std", "min", "max")}
+    stats["count"] = np.zeros(inside.shape, dtype=np.int64)
+    if not inside.any():
+        return stats
+
+    km_y = abs(transform.e) * 110.57
+    km_x = abs(transform.a) * 111.32 * np.cos(np.radians(lats[inside]))
+    ry = int(np.ceil(radius_km / km_y))
+    rx = int(np.ceil(radius_km / max(float(km_x.min()), 1e-9)))
+    dr, dc = np.mgrid[-ry:ry + 1, -rx:rx + 1]
+    dr, dc = dr.ravel(), dc.ravel()
+
+    values = _gather(arr, rows[inside][:, None] + dr, cols[inside][:, None] + dc)
+    dist = np.hypot(dr * km_y, dc * km_x[:, None])
+    values = np.where(dist <= radius_km, values, np.nan)
+
+    with np.errstate(invalid="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        stats["mean"][inside] = np.nanmean(values, axis=-1)
+        stats["std"][inside] = np.nanstd(values, axis=-1)
+        stats["min"][inside] = np.nanmin(values, axis=-1)
+        stats["max"][inside] = np.nanmax(values, axis=-1)
+    stats["count"][inside] = (~np.isnan(values)).sum(axis=-1)
+    return stats
+
+
+def sample_no2_batch(lats, lons, layer: str = "Recent", mode: str = "nearest", size: int = 3) -> np.ndarray:
+    """
+    Sample NO2 for many points at once from one of the named FILES layers.
+    """
+    return sample_raster_batch(FILES[layer], lats, lons, mode=mode, size=size)
 
 
+def get_no2_at_latlon(lat, lon, layer="Recent", mode="nearest"):
+    return float(sample_no2_batch(lat, lon, layer, mode=mode))
@@ -0,0 +1,191 @@
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, NamedTuple, Tuple
+
+import numpy as np
+import rasterio
+
+# (absolute path, mtime in ns) – changes whenever the file is rewritten
+RasterVersion = Tuple[str, int]
+
+
+class RasterMeta(NamedTuple):
+    path: str
+    version: RasterVersion
+    transform: object
+    crs: object
+    width: int
+    height: int
+    count: int
+    bounds: object
+    nodata: object
+
+
+class _Handle:
+    def __init__(self, src):
+        self.src = src
+        self.lock = threading.Lock()
+        # Guarded by the registry lock: users currently holding the handle,
+        # and whether it has left the pool (closed once `refs` drops to 0)
+        self.refs = 0
+        self.retired = False
+
+
+class RasterRegistry:
+    """
+    Shared, lazily opened pool of raster handles and decoded bands.
+
+    Datasets are opened on first use and kept in a bounded LRU keyed by
+    (path, mtime), so a file rewritten on disk is picked up on the next
+    call and the stale handle is retired. Handles are reference counted:
+    one evicted while a reader still holds it is closed when that reader
+    releases it. Decoded bands live in a second LRU bounded by bytes; they
+    are read-only and can be shared between sessions freely.
+    """
+
+    def __init__(self, max_handles: int = 8, max_band_bytes: int = 256 * 2**20):
+        self.max_handles = max_handles
+        self.max_band_bytes = max_band_bytes
+        self._lock = threading.Lock()
+        self._handles: "OrderedDict[RasterVersion, _Handle]" = OrderedDict()
+        self._bands: "OrderedDict[Tuple[RasterVersion, int], np.ndarray]" = OrderedDict()
+        self._band_bytes = 0
+        self._meta: Dict[RasterVersion, RasterMeta] = {}
+
+    @staticmethod
+    def version(path) -> RasterVersion:
+        path = os.path.abspath(os.fspath(path))
+        return path, os.stat(path).st_mtime_ns
+
+    def _retire(self, handle: _Handle) -> bool:
+        """
+        Take `handle` out of service; True if it can be closed now.
+        Caller holds self._lock.
+        """
+        handle.retired = True
+        return handle.refs == 0
+
+    def _acquire(self, version: RasterVersion) -> _Handle:
+        closable = []
+        with self._lock:
+            handle = self._handles.get(version)
+            if handle is not None:
+                self._handles.move_to_end(version)
+                handle.refs += 1
+                return handle
+
+            # Drop older versions of the same file before opening the new one
+            for key in [k for k in self._handles if k[0] == version[0]]:
+                old = self._handles.pop(key)
+                self._meta.pop(key, None)
+                if self._retire(old):
+                    closable.append(old)
+            for key in [k for k in self._bands if k[0][0] == version[0] and k[0] != version]:
+                self._band_bytes -= self._bands.pop(key).nbytes
+
+            handle = _Handle(rasterio.open(version[0]))
+            handle.refs = 1
+            self._handles[version] = handle
+            while len(self._handles) > self.max_handles:
+                key, old = self._handles.popitem(last=False)
+                self._meta.pop(key, None)
+                if self._retire(old):
+                    closable.append(old)
+
+        for old in closable:
+            old.src.close()
+        return handle
+
+    def _release(self, handle: _Handle) -> None:
+        with self._lock:
+            handle.refs -= 1
+            close = handle.retired and handle.refs == 0
+        if close:
+            handle.src.close()
+
+    @contextmanager
+    def open(self, path) -> Iterator[rasterio.io.DatasetReader]:
+        """
+        Yield the pooled dataset for `path` with exclusive access.
+
+        Use this for windowed reads; GDAL handles are not safe to read from
+        several threads at once.
+        """
+        handle = self._acquire(self.version(path))
+        try:
+            with handle.lock:
+                yield handle.src
+        finally:
+            self._release(handle)
+
+    def meta(self, path) -> RasterMeta:
+        version = self.version(path)
+        meta = self._meta.get(version)
+        if meta is None:
+            with self.open(path) as src:
+                meta = RasterMeta(
+                    path=version[0],
+                    version=version,
+                    transform=src.transform,
+                    crs=src.crs,
+                    width=src.width,
+                    height=src.height,
+                    count=src.count,
+                    bounds=src.bounds,
+                    nodata=src.nodata,
+                )
+            with self._lock:
+                self._meta[version] = meta
+        return meta
+
+    def band(self, path, index: int = 1) -> np.ndarray:
+        """
+        Return a band as a read-only float64 array with nodata set to NaN.
+        """
+        version = self.version(path)
+        key = (version, index)
+        with self._lock:
+            arr = self._bands.get(key)
+            if arr is not None:
+                self._bands.move_to_end(key)
+                return arr
+
+        with self.open(path) as src:
+            arr = src.read(index, masked=True).astype("float64").filled(np.nan)
+        arr.flags.writeable = False
+
+        with self._lock:
+            if key not in self._bands:
+                self._bands[key] = arr
+                self._band_bytes += arr.nbytes
+            # Always keep the newest band, even if it alone exceeds the budget
+            while self._band_bytes > self.max_band_bytes and len(self._bands) > 1:
+                self._band_bytes -= self._bands.popitem(last=False)[1].nbytes
+        return arr
+
+    def clear(self):
+        with self._lock:
+            closable = [h for h in self._handles.values() if self._retire(h)]
+            self._handles.clear()
+            self._bands.clear()
+            self._band_bytes = 0
+            self._meta.clear()
+        for handle in closable:
+            handle.src.close()
+
+
+REGISTRY = RasterRegistry()
+
+
+def get_band(path, index: int = 1) -> np.ndarray:
+    return REGISTRY.band(path, index)
+
+
+def get_meta(path) -> RasterMeta:
+    return REGISTRY.meta(path)
+
+
+def raster_version(path) -> RasterVersion:
+    return REGISTRY.version(path)
@@ -0,0 +1,210 @@
+import csv
+import math
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sklearn.neighbors import BallTree
+
+from src.data_engine.city_profiles import DATA_PATH, load_city_locations
+from src.data_engine.zonal_stats import CITIES_GEOJSON, load_zones
+
+REPORTS_PATH = Path(__file__).resolve().parents[2] / "data" / "community_reports.csv"
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Points further than this from every city get no nearest_city tag
+MAX_CITY_DISTANCE_KM = 50.0
+
+# Max point x edge pairs tested at once by the polygon index
+_CHUNK = 4_000_000
+
+
+class PolygonIndex:
+    """
+    Batch point-in-polygon over many zones.
+
+    Zone bounding boxes are bucketed into a uniform lat/lon grid, so each
+    point is only ray-cast against the zones sharing its cell. Holes and
+    multi-polygons are handled by the even-odd rule over all rings.
+    """
+
+    def __init__(self, zones: Sequence[Tuple[str, dict]], cell_deg: float = 0.5):
+        self.names: List[str] = [name for name, _ in zones]
+        self.cell_deg = cell_deg
+        self._edges: List[np.ndarray] = []
+        self._cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+
+        for z, (_, geom) in enumerate(zones):
+            rings = _rings(geom)
+            edges = np.concatenate(
+                [np.hstack([r[:-1], r[1:]]) for r in rings if len(r) > 1]
+            ) if rings else np.zeros((0, 4))
+            self._edges.append(edges)
+            if not len(edges):
+                continue
+            west, east = edges[:, [0, 2]].min(), edges[:, [0, 2]].max()
+            south, north = edges[:, [1, 3]].min(), edges[:, [1, 3]].max()
+            for ix in range(self._cell(west), self._cell(east) + 1):
+                for iy in range(self._cell(south), self._cell(north) + 1):
+                    self._cells[(ix, iy)].append(z)
+
+    def _cell(self, value: float) -> int:
+        return int(math.floor(value / self.cell_deg))
+
+    def locate(self, lats, lons) -> np.ndarray:
+        """
+        Index of the first zone containing each point, or -1.
+        """
+        lats = np.asarray(lats, dtype="float64")
+        lons = np.asarray(lons, dtype="float64")
+        flat_lat, flat_lon = lats.ravel(), lons.ravel()
+        out = np.full(flat_lat.shape, -1, dtype=np.int64)
+        if not self._cells or not flat_lat.size:
+            return out.reshape(lats.shape)
+
+        ix = np.floor(flat_lon / self.cell_deg).astype(np.int64)
+        iy = np.floor(flat_lat / self.cell_deg).astype(np.int64)
+        cells, inverse = np.unique(np.stack([ix, iy]), axis=1, return_inverse=True)
+        inverse = inverse.ravel()
+
+        by_zone: Dict[int, List[int]] = defaultdict(list)
+        for u, (cx, cy) in enumerate(cells.T):
+            for z in self._cells.get((int(cx), int(cy)), ()):
+                by_zone[z].append(u)
+
+        for z in sorted(by_zone):
+            idx = np.flatnonzero(np.isin(inverse, by_zone[z]) & (out < 0))
+            if idx.size:
+                inside = _contains(self._edges[z], flat_lon[idx], flat_lat[idx])
+                out[idx[inside]] = z
+        return out.reshape(lats.shape)
+
+
+def _rings(geom: dict) -> List[np.ndarray]:
+    if geom["type"] == "Polygon":
+        polygons = [geom["coordinates"]]
+    elif geom["type"] == "MultiPolygon":
+        polygons = geom["coordinates"]
+    else:
+        return []
+    return [np.asarray(ring, dtype="float64")[:, :2] for poly in polygons for ring in poly]
+
+
+def _contains(edges: np.ndarray, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+    inside = np.zeros(xs.shape, dtype=bool)
+    step = max(1, _CHUNK // max(len(edges), 1))
+    x1, y1, x2, y2 = edges.T
+    for start in range(0, xs.size, step):
+        px = xs[start:start + step, None]
+        py = ys[start:start + step, None]
+        crosses = (y1 > py) != (y2 > py)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_at = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+        inside[start:start + step] = (np.count_nonzero(crosses & (px < x_at), axis=1) % 2) == 1
+    return inside
+
+
+class CityIndex:
+    """
+    Nearest-city (haversine BallTree) and city/ward polygon lookups in batch.
+    """
+
+    def __init__(
+        self,
+        locations: Dict[str, Tuple[float, float]],
+        zones: Optional[Sequence[Tuple[str, dict]]] = None,
+    ):
+        self.cities = np.array(list(locations), dtype=object)
+        coords = np.radians(np.array(list(locations.values()), dtype="float64").reshape(-1, 2))
+        self._tree = BallTree(coords, metric="haversine") if len(coords) else None
+        self.polygons = PolygonIndex(zones or [])
+
+    def nearest(self, lats, lons, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The `k` nearest cities to each point and their distances in km.
+
+        Both results have shape `lats.shape + (k,)`, nearest first.
+        """
+        lats = np.asarray(lats, dtype="float64")
+        lons = np.asarray(lons, dtype="float64")
+        if self._tree is None:
+            raise ValueError("No cities in the index")
+        k = min(k, len(self.cities))
+        query = np.radians(np.stack([lats.ravel(), lons.ravel()], axis=1))
+        dist, idx = self._tree.query(query, k=k)
+        shape = lats.shape + (k,)
+        return self.cities[idx].reshape(shape), (dist * EARTH_RADIUS_KM).reshape(shape)
+
+    def locate(self, lats, lons) -> np.ndarray:
+        """
+        Name of the city/ward polygon containing each point ('' if none).
+        """
+        z = self.polygons.locate(lats, lons)
+        names = np.array(self.polygons.names + [""], dtype=object)
+        return names[z]
+
+    def tag(self, lats, lons, max_km: float = MAX_CITY_DISTANCE_KM) -> Dict[str, np.ndarray]:
+        """
+        Nearest city ('' beyond `max_km`), its distance and containing zone.
+        """
+        city, dist = self.nearest(lats, lons, k=1)
+        return {
+            "nearest_city": np.where(dist[..., 0] <= max_km, city[..., 0], ""),
+            "distance_km": dist[..., 0],
+            "zone": self.locate(lats, lons),
+        }
+
+
+_index: Dict[tuple, CityIndex] = {}
+_lock = threading.Lock()
+
+
+def _mtime(path: Path) -> int:
+    return path.stat().st_mtime_ns if path.exists() else 0
+
+
+def get_city_index(zones_path: Path = CITIES_GEOJSON) -> CityIndex:
+    """
+    Shared index, rebuilt when city_gases.csv or the boundary file changes.
+    """
+    key = (_mtime(DATA_PATH), str(zones_path), _mtime(Path(zones_path)))
+    with _lock:
+        index = _index.get(key)
+    if index is None:
+        index = CityIndex(load_city_locations(), load_zones(zones_path))
+        with _lock:
+            _index.clear()
+            _index[key] = index
+    return index
+
+
+def nearest_city(lat: float, lon: float) -> Tuple[str, float]:
+    city, dist = get_city_index().nearest(lat, lon, k=1)
+    return str(city[0]), float(dist[0])
+
+
+def tag_community_reports(path: Path = REPORTS_PATH, max_km: float = MAX_CITY_DISTANCE_KM) -> List[Dict[str, str]]:
+    """
+    Community reports with `nearest_city`, `distance_km` and `zone` added.
+
+    `nearest_city` is left empty for reports more than `max_km` from any
+    city, so a bad coordinate is never attributed to a far-away city.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    if not rows:
+        return rows
+
+    lats = np.array([float(r["lat"] or "nan") for r in rows])
+    lons = np.array([float(r["lon"] or "nan") for r in rows])
+    valid = ~(np.isnan(lats) | np.isnan(lons))
+
+    tags = get_city_index().tag(lats[valid], lons[valid], max_km)
+    for i, row_idx in enumerate(np.flatnonzero(valid)):
+        rows[row_idx]["nearest_city"] = str(tags["nearest_city"][i])
+        rows[row_idx]["distance_km"] = f"{tags['distance_km'][i]:.1f}"
+        rows[row_idx]["zone"] = str(tags["zone"][i])
+    return rows
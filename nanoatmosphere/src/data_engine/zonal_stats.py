@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from rasterio.features import rasterize
+
+from src.ai_core.breathability import NO2_WORST
+from src.data_engine.mosaic import get_catalog
+from src.data_engine.raster_registry import get_band, get_meta
+
+ROOT = Path(__file__).resolve().parents[2]
+CITIES_GEOJSON = ROOT / "assets" / "india_cities.geojson"
+ZONE_CACHE_DIR = ROOT / "data" / "cache" / "zones"
+
+DEFAULT_PERCENTILES: Tuple[float, ...] = (50.0, 90.0)
+
+# Property keys tried, in order, for a zone's display name
+NAME_KEYS = ("name", "NAME", "city", "ward", "ward_name")
+
+
+def load_zones(path=CITIES_GEOJSON) -> List[Tuple[str, dict]]:
+    """
+    Read (name, geometry) pairs from a GeoJSON FeatureCollection.
+
+    An empty or missing file yields no zones. Repeated names get a " #2",
+    " #3", ... suffix so every zone keeps its own row in the results.
+    """
+    path = Path(path)
+    if not path.exists() or path.stat().st_size == 0:
+        return []
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    zones = []
+    seen: Dict[str, int] = {}
+    for i, feature in enumerate(data.get("features", [])):
+        if not feature.get("geometry"):
+            continue
+        props = feature.get("properties") or {}
+        name = next((str(props[k]) for k in NAME_KEYS if props.get(k)), f"zone_{i}")
+        seen[name] = seen.get(name, 0) + 1
+        if seen[name] > 1:
+            name = f"{name} #{seen[name]}"
+        zones.append((name, feature["geometry"]))
+    return zones
+
+
+_zone_files: Dict[tuple, Tuple[List[Tuple[str, dict]], str]] = {}
+_labels: Dict[tuple, np.ndarray] = {}
+_lock = threading.Lock()
+
+
+def _file_key(path: Path) -> tuple:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return (str(path), 0, 0)
+    return (str(path), st.st_mtime_ns, st.st_size)
+
+
+def _zone_file(zones_path) -> Tuple[tuple, List[Tuple[str, dict]], str]:
+    """
+    (stat key, zones, content SHA-1) of a zone file; parsed and hashed only
+    when its mtime or size changes.
+    """
+    zones_path = Path(zones_path)
+    key = _file_key(zones_path)
+    with _lock:
+        cached = _zone_files.get(key)
+    if cached is None:
+        zone_bytes = zones_path.read_bytes() if key[2] else b""
+        cached = (load_zones(zones_path), hashlib.sha1(zone_bytes).hexdigest())
+        with _lock:
+            for old in [k for k in _zone_files if k[0] == key[0]]:
+                del _zone_files[old]
+            _zone_files[key] = cached
+    return (key,) + cached
+
+
+def label_grid(raster_path, zones_path=CITIES_GEOJSON) -> Tuple[np.ndarray, List[str]]:
+    """
+    Rasterize zones onto a raster's grid: 0 = no zone, i = zone i-1.
+
+    The grid is cached in memory (keyed by the zone file's stat and the
+    raster's grid) and as .npy (keyed by the zone file's content), so
+    polygons are burned in only once. Where zones overlap, the later
+    feature wins.
+    """
+    file_key, zones, zone_sha = _zone_file(zones_path)
+    names = [name for name, _ in zones]
+    meta = get_meta(raster_path)
+    grid_sig = (tuple(meta.transform)[:6], meta.width, meta.height)
+
+    with _lock:
+        grid = _labels.get((file_key, grid_sig))
+    if grid is not None:
+        return grid, names
+
+    key = hashlib.sha1((zone_sha + repr(grid_sig)).encode()).hexdigest()[:20]
+    cache_path = ZONE_CACHE_DIR / f"{key}.npy"
+    if cache_path.exists():
+        grid = np.load(cache_path)
+    else:
+        shape = (meta.height, meta.width)
+        if zones:
+            grid = rasterize(
+                ((geom, i + 1) for i, (_, geom) in enumerate(zones)),
+                out_shape=shape,
+                transform=meta.transform,
+                fill=0,
+                dtype="int32",
+            )
+        else:
+            grid = np.zeros(shape, dtype="int32")
+        ZONE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = cache_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp.npy")
+        np.save(tmp, grid)
+        tmp.replace(cache_path)
+
+    grid.flags.writeable = False
+    with _lock:
+        for old in [k for k in _labels if k[0][0] == file_key[0] and k[0] != file_key]:
+            del _labels[old]
+        _labels[(file_key, grid_sig)] = grid
+    return grid, names
+
+
+def _zone_values(raster_path, zones_path) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    grid, names = label_grid(raster_path, zones_path)
+    values = get_band(raster_path)
+    keep = (grid > 0) & ~np.isnan(values)
+    return grid[keep], values[keep], names
+
+
+def _reduce(
+    labels: np.ndarray,
+    values: np.ndarray,
+    names: Sequence[str],
+    percentiles: Sequence[float],
+    hotspot: float,
+) -> Dict[str, Dict[str, float]]:
+    n = len(names) + 1
+    count = np.bincount(labels, minlength=n)
+    total = np.bincount(labels, weights=values, minlength=n)
+    hot = np.bincount(labels, weights=(values > hotspot).astype("float64"), minlength=n)
+
+    # One sort by (zone, value) gives min/max/percentiles for every zone
+    order = np.lexsort((values, labels))
+    sorted_values = values[order]
+    start = np.concatenate([[0], np.cumsum(count)[:-1]])
+
+    stats = {}
+    for z in range(1, n):
+        c = int(count[z])
+        row = {"pixels": c, "hotspot_pixels": int(hot[z])}
+        if c == 0:
+            row.update({"mean": np.nan, "min": np.nan, "max": np.nan})
+            row.update({f"p{q:g}": np.nan for q in percentiles})
+        else:
+            zone_values = sorted_values[start[z]:start[z] + c]
+            row["mean"] = float(total[z] / c)
+            row["min"] = float(zone_values[0])
+            row["max"] = float(zone_values[-1])
+            for q in percentiles:
+                pos = q / 100.0 * (c - 1)
+                lo = int(np.floor(pos))
+                hi = min(lo + 1, c - 1)
+                row[f"p{q:g}"] = float(zone_values[lo] + (zone_values[hi] - zone_values[lo]) * (pos - lo))
+        stats[names[z - 1]] = row
+    return stats
+
+
+def zonal_stats(
+    raster_path,
+    zones_path=CITIES_GEOJSON,
+    percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+    hotspot: float = NO2_WORST,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Per-zone pixel count, mean, min, max, percentiles and hotspot count.
+
+    Everything comes from bincounts and one sort over the raster; there is
+    no per-zone masked read. Hotspots are pixels above `hotspot` NO2.
+    """
+    labels, values, names = _zone_values(raster_path, zones_path)
+    return _reduce(labels, values, names, percentiles, hotspot)
+
+
+def national_zonal_stats(
+    layer: str = "Recent",
+    zones_path=CITIES_GEOJSON,
+    percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+    hotspot: float = NO2_WORST,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Zonal stats over every raster of a mosaic layer, pooled per zone.
+    """
+    names = [name for name, _ in _zone_file(zones_path)[1]]
+    all_labels, all_values = [np.zeros(0, dtype="int32")], [np.zeros(0)]
+    for path in get_catalog(layer).paths:
+        labels, values, _ = _zone_values(path, zones_path)
+        all_labels.append(labels)
+        all_values.append(values)
+    return _reduce(
+        np.concatenate(all_labels), np.concatenate(all_values), names, percentiles, hotspot
+    )
+
+
+def derive_city_gases(
+    base: Optional[Dict[str, Dict[str, float]]] = None,
+    layer: str = "Recent",
+    zones_path=CITIES_GEOJSON,
+) -> Dict[str, Dict[str, float]]:
+    """
+    City gas table with NO2 replaced by the zonal mean from our rasters.
+
+    `base` (default: city_profiles.CITY_GASES) supplies SO2/CO and any city
+    our rasters do not cover.
+    """
+    if base is None:
+        from src.data_engine.city_profiles import CITY_GASES as base
+
+    merged = {city: dict(gases) for city, gases in base.items()}
+    for city, row in national_zonal_stats(layer, zones_path).items():
+        if row["pixels"]:
+            merged.setdefault(city, {"SO2": np.nan, "CO": np.nan})["NO2"] = row["mean"]
+    return merged
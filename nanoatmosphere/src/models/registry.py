@@ -0,0 +1,188 @@
+"""
+Versioned model artifacts for the predictors.
+
+Each artifact is a directory src/models/<name>/v<NNNN>/ holding one .npy
+file per weight array (loaded memory-mapped, never unpickled) and a
+meta.json with parameters, feature schema, training-data checksum and
+metrics. src/models/<name>/ACTIVE names the version served by default;
+it is re-read on every load, so switching models needs no restart.
+
+Version numbers are claimed with os.mkdir, which is atomic across
+processes (the app and the precompute job may save at the same time).
+meta.json is written last, so a version without it is still being
+written and is not listed.
+"""
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+MODELS_DIR = Path(__file__).resolve().parent
+
+_VERSION_RE = re.compile(r"^v(\d{4,})$")
+
+
+class ModelArtifact(NamedTuple):
+    name: str
+    version: int
+    arrays: Dict[str, np.ndarray]
+    meta: Dict[str, Any]
+
+    @property
+    def tag(self) -> str:
+        return f"{self.name}@v{self.version}"
+
+
+class ModelRegistry:
+    """
+    Save, list, activate and lazily load model artifacts.
+
+    Loaded artifacts are cached per process by (name, version); arrays are
+    read-only memory maps, so every Streamlit session shares one copy of
+    the weights through the OS page cache.
+    """
+
+    def __init__(self, root: Path = MODELS_DIR):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._loaded: Dict[tuple, ModelArtifact] = {}
+
+    def _dir(self, name: str) -> Path:
+        if not re.fullmatch(r"[\w\-]+", name):
+            raise ValueError(f"Invalid model name '{name}'")
+        return self.root / name
+
+    def versions(self, name: str) -> List[int]:
+        model_dir = self._dir(name)
+        if not model_dir.exists():
+            return []
+        found = (
+            _VERSION_RE.match(p.name) for p in model_dir.iterdir()
+            if p.is_dir() and (p / "meta.json").exists()
+        )
+        return sorted(int(m.group(1)) for m in found if m)
+
+    def _claim_version(self, model_dir: Path) -> int:
+        """
+        Create the next free v<NNNN>/ directory and return its number.
+        """
+        taken = [int(m.group(1)) for m in map(_VERSION_RE.match, os.listdir(model_dir)) if m]
+        version = max(taken, default=0) + 1
+        while True:
+            try:
+                os.mkdir(model_dir / f"v{version:04d}")
+                return version
+            except FileExistsError:
+                version += 1
+
+    def active_version(self, name: str) -> Optional[int]:
+        active = self._dir(name) / "ACTIVE"
+        if active.exists():
+            return int(active.read_text(encoding="utf-8").strip())
+        versions = self.versions(name)
+        return versions[-1] if versions else None
+
+    def set_active(self, name: str, version: int) -> None:
+        if version not in self.versions(name):
+            raise KeyError(f"{name} has no version {version}")
+        tmp = self._dir(name) / f"ACTIVE.{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp.write_text(str(version), encoding="utf-8")
+        tmp.replace(self._dir(name) / "ACTIVE")
+
+    def save(
+        self,
+        name: str,
+        arrays: Optional[Dict[str, np.ndarray]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        feature_schema: Optional[Dict[str, Any]] = None,
+        training_checksum: Optional[str] = None,
+        metrics: Optional[Dict[str, float]] = None,
+        activate: bool = True,
+    ) -> ModelArtifact:
+        """
+        Write a new version atomically and (by default) make it active.
+        """
+        arrays = arrays or {}
+        for key in arrays:
+            if not re.fullmatch(r"\w+", key):
+                raise ValueError(f"Invalid array name '{key}'")
+
+        model_dir = self._dir(name)
+        model_dir.mkdir(parents=True, exist_ok=True)
+        version = self._claim_version(model_dir)
+        version_dir = model_dir / f"v{version:04d}"
+
+        try:
+            for key, arr in arrays.items():
+                np.save(version_dir / f"{key}.npy", np.ascontiguousarray(arr), allow_pickle=False)
+        except BaseException:
+            shutil.rmtree(version_dir, ignore_errors=True)
+            raise
+
+        meta = {
+            "version": version,
+            "name": name,
+            "created_at": int(time.time()),
+            "params": params or {},
+            "feature_schema": feature_schema or {},
+            "training_checksum": training_checksum,
+            "metrics": metrics or {},
+            "arrays": sorted(arrays),
+        }
+
+        # Publishing meta.json completes the version
+        tmp = version_dir / "meta.json.tmp"
+        tmp.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        tmp.replace(version_dir / "meta.json")
+
+        if activate:
+            self.set_active(name, version)
+        return self.load(name, version)
+
+    def load(self, name: str, version: Optional[int] = None) -> ModelArtifact:
+        """
+        Load a version (default: the active one), once per process.
+        """
+        if version is None:
+            version = self.active_version(name)
+            if version is None:
+                raise FileNotFoundError(f"No saved versions of model '{name}'")
+
+        key = (name, version)
+        with self._lock:
+            artifact = self._loaded.get(key)
+        if artifact is not None:
+            return artifact
+
+        version_dir = self._dir(name) / f"v{version:04d}"
+        meta = json.loads((version_dir / "meta.json").read_text(encoding="utf-8"))
+        arrays = {
+            key_: np.load(version_dir / f"{key_}.npy", mmap_mode="r", allow_pickle=False)
+            for key_ in meta.get("arrays", [])
+        }
+        artifact = ModelArtifact(name=name, version=version, arrays=arrays, meta=meta)
+        with self._lock:
+            self._loaded[key] = artifact
+        return artifact
+
+    def find(self, name: str, training_checksum: str) -> Optional[ModelArtifact]:
+        """
+        The active version if it was trained on `training_checksum`, else the
+        newest version that was, else None.
+        """
+        active = self.active_version(name)
+        candidates = ([active] if active else []) + self.versions(name)[::-1]
+        for version in candidates:
+            artifact = self.load(name, version)
+            if artifact.meta.get("training_checksum") == training_checksum:
+                return artifact
+        return None
+
+
+REGISTRY = ModelRegistry()
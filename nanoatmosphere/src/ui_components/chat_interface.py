@@ -0,0 +1,259 @@
+"""
+Multi-turn policy chat on top of the one-shot advisor.
+
+Conversations are saved as JSON in data/cache/chats/<id>.json after every
+turn. Each follow-up prompt holds the system instruction, the city
+context, a running digest of older turns and only the most recent turns:
+once those exceed `token_budget`, the oldest are folded into the digest,
+which is itself capped at `digest_budget`. Prompt size, and with it
+latency and cost, therefore stays flat however long the conversation
+gets. Replies are streamed through gemini_stream, so they share its
+response cache and request coalescing.
+"""
+import json
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from src.ai_core.gemini_stream import StreamStats, stream_generate
+from src.ai_core.policy_advisor import GENERATION_CONFIG, PREDEFINED_FALLBACK, SYSTEM_INSTRUCTION
+from src.ai_core.response_cache import ResponseCache
+from src.ai_core.retrieval import estimate_tokens
+
+CHATS_DIR = Path(__file__).resolve().parents[2] / "data" / "cache" / "chats"
+
+TOKEN_BUDGET = 1200   # recent turns sent verbatim
+DIGEST_BUDGET = 300   # running digest of older turns
+KEEP_RECENT = 2       # turns always sent verbatim
+
+USER, ASSISTANT = "user", "assistant"
+
+
+class Conversation:
+    def __init__(self, id: str, context: str = "", owner: str = "", created_at: Optional[float] = None):
+        self.id = id
+        self.context = context
+        self.owner = owner
+        self.created_at = created_at or time.time()
+        self.turns: List[Dict] = []
+        self.digest = ""
+        # turns[:summarized] are already folded into the digest
+        self.summarized = 0
+
+    def add(self, role: str, text: str, **extra) -> Dict:
+        turn = {"role": role, "text": text, "ts": time.time(), **extra}
+        self.turns.append(turn)
+        return turn
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "context": self.context,
+            "owner": self.owner,
+            "created_at": self.created_at,
+            "digest": self.digest,
+            "summarized": self.summarized,
+            "turns": self.turns,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Conversation":
+        conv = cls(data["id"], data.get("context", ""), data.get("owner", ""), data.get("created_at"))
+        conv.turns = data.get("turns", [])
+        conv.digest = data.get("digest", "")
+        conv.summarized = data.get("summarized", 0)
+        return conv
+
+
+class ChatStore:
+    """
+    One JSON file per conversation, replaced atomically on save.
+    """
+
+    def __init__(self, root: Path = CHATS_DIR):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    def _path(self, conv_id: str) -> Path:
+        if not re.fullmatch(r"[0-9a-f]{8,32}", conv_id):
+            raise ValueError(f"Invalid conversation id '{conv_id}'")
+        return self.root / f"{conv_id}.json"
+
+    def create(self, context: str = "", owner: str = "") -> Conversation:
+        return Conversation(uuid.uuid4().hex[:16], context, owner)
+
+    def save(self, conv: Conversation) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self._path(conv.id)
+        tmp = path.with_suffix(f".json.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(conv.to_dict(), ensure_ascii=False, indent=1), encoding="utf-8")
+        with self._lock:
+            tmp.replace(path)
+
+    def load(self, conv_id: str) -> Optional[Conversation]:
+        path = self._path(conv_id)
+        if not path.exists():
+            return None
+        return Conversation.from_dict(json.loads(path.read_text(encoding="utf-8")))
+
+    def list(self, owner: Optional[str] = None) -> List[Dict]:
+        """
+        Newest first: [{"id", "context", "turns", "updated_at"}].
+        """
+        out = []
+        for path in self.root.glob("*.json"):
+            data = json.loads(path.read_text(encoding="utf-8"))
+            if owner is not None and data.get("owner") != owner:
+                continue
+            out.append({
+                "id": data["id"],
+                "context": data.get("context", ""),
+                "turns": len(data.get("turns", [])),
+                "updated_at": path.stat().st_mtime,
+            })
+        return sorted(out, key=lambda c: -c["updated_at"])
+
+
+def _first_line(text: str, max_chars: int) -> str:
+    for line in text.splitlines():
+        line = line.strip().lstrip("-*#0123456789. ").strip()
+        if len(line) > 3:
+            return line if len(line) <= max_chars else line[:max_chars - 1].rstrip() + "…"
+    return ""
+
+
+def extractive_digest(digest: str, turns: List[Dict], max_tokens: int = DIGEST_BUDGET) -> str:
+    """
+    Fold `turns` into `digest` locally: each question and the first line of
+    each answer, dropping the oldest lines once over `max_tokens`.
+    """
+    lines = [line for line in digest.splitlines() if line.strip()]
+    for turn in turns:
+        who = "User asked" if turn["role"] == USER else "Advisor said"
+        summary = _first_line(turn["text"], 160 if turn["role"] == USER else 120)
+        if summary:
+            lines.append(f"- {who}: {summary}")
+    while lines and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class ChatEngine:
+    """
+    Builds bounded prompts for a conversation and streams the replies.
+
+    `summarize(digest, turns)` folds turns into the digest; the default is
+    extractive_digest, which needs no extra model call. Any callable with
+    the same signature (e.g. one asking Gemini for a summary) can be used.
+    """
+
+    def __init__(
+        self,
+        model,
+        store: Optional[ChatStore] = None,
+        model_name: Optional[str] = None,
+        token_budget: int = TOKEN_BUDGET,
+        digest_budget: int = DIGEST_BUDGET,
+        keep_recent: int = KEEP_RECENT,
+        summarize: Optional[Callable[[str, List[Dict]], str]] = None,
+        cache: Optional[ResponseCache] = None,
+    ):
+        self.model = model
+        self.store = store or ChatStore()
+        self.model_name = model_name
+        self.token_budget = token_budget
+        self.digest_budget = digest_budget
+        self.keep_recent = keep_recent
+        self.cache = cache
+        self.summarize = summarize or (lambda digest, turns: extractive_digest(digest, turns, self.digest_budget))
+
+    def start(
+        self, context: str, question: str, answer: str, owner: str = "", fallback: bool = False,
+    ) -> Conversation:
+        """
+        New conversation seeded with the one-shot advisor exchange. Pass
+        `fallback=True` when `answer` is the canned fallback, so it is shown
+        but never sent back to Gemini as context.
+        """
+        conv = self.store.create(context, owner)
+        conv.add(USER, question)
+        if fallback:
+            conv.add(ASSISTANT, answer, fallback=True)
+        else:
+            conv.add(ASSISTANT, answer)
+        self.store.save(conv)
+        return conv
+
+    def _recent(self, conv: Conversation) -> List[Dict]:
+        return [t for t in conv.turns[conv.summarized:] if not t.get("fallback")]
+
+    def compact(self, conv: Conversation) -> None:
+        """
+        Fold the oldest unsummarised turns into the digest until the recent
+        turns fit `token_budget` (always keeping `keep_recent`).
+        """
+        start = conv.summarized
+        end = len(conv.turns) - self.keep_recent
+        total = sum(estimate_tokens(t["text"]) for t in self._recent(conv))
+        while total > self.token_budget and start < end:
+            if not conv.turns[start].get("fallback"):
+                total -= estimate_tokens(conv.turns[start]["text"])
+            start += 1
+        if start > conv.summarized:
+            conv.digest = self.summarize(conv.digest, [
+                t for t in conv.turns[conv.summarized:start] if not t.get("fallback")
+            ])
+            conv.summarized = start
+
+    def build_prompt(self, conv: Conversation) -> str:
+        parts = [SYSTEM_INSTRUCTION.strip()]
+        if conv.context:
+            parts.append(f"Context:\n{conv.context}")
+        if conv.digest:
+            parts.append(f"Earlier in this conversation (summary):\n{conv.digest}")
+        history = "\n\n".join(
+            f"{'User' if t['role'] == USER else 'Advisor'}: {t['text'].strip()}" for t in self._recent(conv)
+        )
+        parts.append(f"Recent conversation:\n{history}")
+        parts.append(
+            "Reply to the user's last message as Kalam NanoAtmosphere. Build on what was "
+            "already advised instead of repeating it; keep it short and use bullet points."
+        )
+        return "\n\n".join(parts)
+
+    def send(self, conv: Conversation, text: str, stats: Optional[StreamStats] = None) -> Iterator[str]:
+        """
+        Add a user turn and stream the reply; the conversation is saved
+        after the reply (or a fallback turn, if the stream fails).
+        """
+        stats = StreamStats() if stats is None else stats
+        conv.add(USER, text)
+        self.compact(conv)
+        prompt = self.build_prompt(conv)
+
+        parts = []
+        try:
+            for chunk in stream_generate(
+                self.model, prompt, GENERATION_CONFIG, stats, cache=self.cache, model_name=self.model_name,
+            ):
+                parts.append(chunk)
+                yield chunk
+        except Exception:
+            conv.add(ASSISTANT, PREDEFINED_FALLBACK, fallback=True)
+            self.store.save(conv)
+            raise
+        if not parts:
+            conv.add(ASSISTANT, PREDEFINED_FALLBACK, fallback=True)
+            self.store.save(conv)
+            return
+        conv.add(
+            ASSISTANT,
+            "".join(parts),
+            prompt_tokens=estimate_tokens(prompt),
+            first_chunk_s=stats.first_chunk_s,
+            total_s=stats.total_s,
+        )
+        self.store.save(conv)
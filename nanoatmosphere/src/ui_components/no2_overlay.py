@@ -0,0 +1,165 @@
+import base64
+import hashlib
+import io
+import os
+import threading
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+from src.data_engine.raster_registry import RasterVersion, get_band, get_meta, raster_version
+
+# Rendered PNGs, one per raster version and resolution level
+OVERLAY_DIR = Path(__file__).resolve().parents[2] / "data" / "cache" / "overlays"
+
+# Downsampling factors tried in order; the first that fits max_px wins
+LEVELS = (1, 2, 4, 8, 16, 32)
+
+# Low -> high NO2: green, yellow, orange, red, purple
+_COLOR_STOPS = np.array([
+    [0.00, 0, 153, 102],
+    [0.35, 255, 222, 51],
+    [0.60, 255, 153, 51],
+    [0.85, 204, 0, 51],
+    [1.00, 102, 0, 153],
+], dtype="float64")
+
+_LUT = np.stack(
+    [np.interp(np.linspace(0, 1, 256), _COLOR_STOPS[:, 0], _COLOR_STOPS[:, i]) for i in (1, 2, 3)],
+    axis=1,
+).astype(np.uint8)
+
+
+class Overlay(NamedTuple):
+    url: str
+    bounds: Tuple[Tuple[float, float], Tuple[float, float]]
+    level: int
+    vmin: float
+    vmax: float
+
+
+def colorize(arr: np.ndarray, vmin: float, vmax: float, alpha: int = 170) -> np.ndarray:
+    """
+    Map a 2D array to RGBA through the NO2 colour ramp; NaN is transparent.
+    """
+    span = vmax - vmin if vmax > vmin else 1.0
+    with np.errstate(invalid="ignore"):
+        idx = np.clip((arr - vmin) / span * 255.0, 0, 255)
+    valid = ~np.isnan(idx)
+
+    rgba = np.zeros(arr.shape + (4,), dtype=np.uint8)
+    rgba[valid, :3] = _LUT[idx[valid].astype(np.uint8)]
+    rgba[valid, 3] = alpha
+    return rgba
+
+
+def downsample(arr: np.ndarray, factor: int) -> np.ndarray:
+    """
+    Block-average by `factor` in both directions, ignoring NaN.
+    """
+    if factor == 1:
+        return arr
+    height, width = arr.shape
+    ph, pw = -height % factor, -width % factor
+    padded = np.pad(arr, ((0, ph), (0, pw)), constant_values=np.nan)
+    blocks = padded.reshape(padded.shape[0] // factor, factor, padded.shape[1] // factor, factor)
+    with np.errstate(invalid="ignore"):
+        valid = (~np.isnan(blocks)).sum(axis=(1, 3))
+        total = np.nansum(blocks, axis=(1, 3))
+        return np.where(valid > 0, total / np.maximum(valid, 1), np.nan)
+
+
+def pick_level(height: int, width: int, max_px: int) -> int:
+    for factor in LEVELS:
+        if max(height, width) / factor <= max_px:
+            return factor
+    return LEVELS[-1]
+
+
+def stretch(arr: np.ndarray) -> Tuple[float, float]:
+    # A strided sample is enough for robust limits on large rasters
+    step = max(1, int(np.sqrt(arr.size / 250_000)))
+    sample = arr[::step, ::step]
+    if np.isnan(sample).all():
+        return 0.0, 1.0
+    lo, hi = np.nanpercentile(sample, [2, 98])
+    return float(lo), float(hi)
+
+
+_cache: Dict[Tuple[RasterVersion, int], Overlay] = {}
+_lock = threading.Lock()
+
+
+def _cache_path(version: RasterVersion, level: int, out_dir: Path = OVERLAY_DIR) -> Path:
+    digest = hashlib.sha1(f"{version[0]}:{version[1]}".encode()).hexdigest()[:12]
+    return out_dir / f"{Path(version[0]).stem}_{digest}_L{level}.png"
+
+
+def _read_png(png_path: Path) -> Optional[Tuple[bytes, float, float]]:
+    """
+    A cached PNG and the colour limits stored in its text chunks, or None
+    if it is missing or predates the stored limits.
+    """
+    try:
+        png = png_path.read_bytes()
+        text = Image.open(io.BytesIO(png)).text
+        return png, float(text["vmin"]), float(text["vmax"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def get_overlay(path, max_px: int = 1024, out_dir: Path = OVERLAY_DIR) -> Overlay:
+    """
+    Return a colourised PNG overlay (as a data URL) for a NO2 raster.
+
+    The resolution level is chosen so the image is at most `max_px` on its
+    long side. Each (raster version, level) is rendered once, written to
+    disk with its colour limits, and kept in memory, so reruns are a
+    dictionary lookup and a fresh process only reads the PNG.
+    """
+    version = raster_version(path)
+    meta = get_meta(path)
+    level = pick_level(meta.height, meta.width, max_px)
+    key = (version, level)
+
+    with _lock:
+        overlay = _cache.get(key)
+    if overlay is not None:
+        return overlay
+
+    png_path = _cache_path(version, level, out_dir)
+    cached = _read_png(png_path)
+    if cached is not None:
+        png, vmin, vmax = cached
+    else:
+        arr = get_band(path)
+        vmin, vmax = stretch(arr)
+        rgba = colorize(downsample(arr, level), vmin, vmax)
+        info = PngInfo()
+        info.add_text("vmin", repr(vmin))
+        info.add_text("vmax", repr(vmax))
+        buf = io.BytesIO()
+        Image.fromarray(rgba).save(buf, format="PNG", optimize=True, pnginfo=info)
+        png = buf.getvalue()
+        out_dir.mkdir(parents=True, exist_ok=True)
+        tmp = png_path.with_suffix(f".png.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(png)
+        tmp.replace(png_path)
+
+    b = meta.bounds
+    overlay = Overlay(
+        url="data:image/png;base64," + base64.b64encode(png).decode("ascii"),
+        bounds=((b.bottom, b.left), (b.top, b.right)),
+        level=level,
+        vmin=vmin,
+        vmax=vmax,
+    )
+    with _lock:
+        # Forget other versions of this raster
+        for stale in [k for k in _cache if k[0][0] == version[0] and k[0] != version]:
+            del _cache[stale]
+        _cache[key] = overlay
+    return overlay
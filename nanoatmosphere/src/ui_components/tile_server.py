@@ -0,0 +1,286 @@
+"""
+Local XYZ tile service for NO2 rasters.
+
+Serves /tiles/<layer>/<z>/<x>/<y>.png for every data/NO2_*.tif and every
+national mosaic VRT, where <layer> is the file stem (e.g. NO2_Chennai_1,
+NO2_India_1). Tiles are rendered on demand
+from a downsampled pyramid of the raster, kept in an in-memory LRU and
+written to an on-disk cache keyed by raster version; a raster's older
+versions are removed from the disk cache when a new one is first served.
+
+Run standalone with:
+    python -m src.ui_components.tile_server --port 8765
+The mosaic VRTs are refreshed at startup and whenever a mosaic catalog is
+rebuilt; `python -m src.data_engine.mosaic` refreshes them on its own.
+"""
+import argparse
+import hashlib
+import io
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from src.data_engine.mosaic import MOSAIC_DIR, write_layer_vrts
+from src.data_engine.no2_sampler import latlon_to_pixel
+from src.data_engine.raster_registry import RasterVersion, get_band, get_meta, raster_version
+from src.ui_components.no2_overlay import LEVELS, colorize, downsample, stretch
+
+DATA_DIR = Path(__file__).resolve().parents[2] / "data"
+TILE_DIR = DATA_DIR / "cache" / "tiles"
+TILE_SIZE = 256
+
+HOST = os.getenv("NO2_TILE_HOST", "127.0.0.1")
+PORT = int(os.getenv("NO2_TILE_PORT", "8765"))
+# Base URL the browser uses to reach the server, if it differs from HOST:PORT
+PUBLIC_URL = os.getenv("NO2_TILE_PUBLIC_URL")
+
+_TILE_RE = re.compile(r"^/tiles/(?P<layer>[\w\-]+)/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.png$")
+
+
+def layer_paths(data_dir: Path = DATA_DIR, mosaic_dir: Path = MOSAIC_DIR) -> Dict[str, Path]:
+    # City exports plus any national mosaics written by mosaic.write_layer_vrt
+    paths = sorted(Path(data_dir).glob("NO2_*.tif")) + sorted(Path(mosaic_dir).glob("NO2_*.vrt"))
+    return {p.stem: p for p in paths}
+
+
+def _digest(version: RasterVersion) -> str:
+    return hashlib.sha1(f"{version[0]}:{version[1]}".encode()).hexdigest()[:12]
+
+
+def tile_pixel_centers(z: int, x: int, y: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lat/lon of the 256x256 pixel centres of a Web Mercator tile.
+    """
+    n = 2.0 ** z
+    offsets = (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE
+    lons = (x + offsets) / n * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + offsets) / n))))
+    lon_grid, lat_grid = np.meshgrid(lons, lats)
+    return lat_grid, lon_grid
+
+
+class TileRenderer:
+    """
+    Renders and caches PNG tiles for the NO2 rasters in DATA_DIR.
+
+    The layer -> path mapping is cached and only re-globbed when a layer
+    is not in it.
+    """
+
+    def __init__(
+        self,
+        max_tiles: int = 1024,
+        tile_dir: Path = TILE_DIR,
+        data_dir: Path = DATA_DIR,
+        mosaic_dir: Path = MOSAIC_DIR,
+    ):
+        self.max_tiles = max_tiles
+        self.tile_dir = tile_dir
+        self.data_dir = data_dir
+        self.mosaic_dir = mosaic_dir
+        self._paths: Dict[str, Path] = {}
+        self._tiles: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self._pyramids: Dict[RasterVersion, dict] = {}
+        self._lock = threading.Lock()
+        self._empty: Optional[bytes] = None
+
+    def _path(self, layer: str) -> Path:
+        with self._lock:
+            path = self._paths.get(layer)
+        if path is None:
+            paths = layer_paths(self.data_dir, self.mosaic_dir)
+            with self._lock:
+                self._paths = paths
+            path = paths.get(layer)
+            if path is None:
+                raise KeyError(layer)
+        return path
+
+    def _pyramid(self, path: Path) -> Tuple[RasterVersion, dict]:
+        version = raster_version(path)
+        with self._lock:
+            pyramid = self._pyramids.get(version)
+        if pyramid is None:
+            arr = get_band(path)
+            vmin, vmax = stretch(arr)
+            pyramid = {"levels": {1: arr}, "vmin": vmin, "vmax": vmax}
+            with self._lock:
+                for stale in [k for k in self._pyramids if k[0] == version[0]]:
+                    del self._pyramids[stale]
+                for stale in [k for k in self._tiles if k[0][0] == version[0] and k[0] != version]:
+                    del self._tiles[stale]
+                self._pyramids[version] = pyramid
+            # Tiles of older versions of this raster (from this or an earlier process)
+            layer_dir = self.tile_dir / Path(path).stem
+            if layer_dir.is_dir():
+                for old in layer_dir.iterdir():
+                    if old.name != _digest(version):
+                        shutil.rmtree(old, ignore_errors=True)
+        return version, pyramid
+
+    def _level(self, pyramid: dict, factor: int) -> np.ndarray:
+        levels = pyramid["levels"]
+        arr = levels.get(factor)
+        if arr is None:
+            arr = downsample(levels[1], factor)
+            with self._lock:
+                levels[factor] = arr
+        return arr
+
+    def limits(self, layer: str) -> Tuple[float, float]:
+        """
+        Colour-ramp limits (vmin, vmax) used for a layer's tiles.
+        """
+        _, pyramid = self._pyramid(self._path(layer))
+        return pyramid["vmin"], pyramid["vmax"]
+
+    def empty_tile(self) -> bytes:
+        if self._empty is None:
+            self._empty = _encode(np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8))
+        return self._empty
+
+    def render(self, layer: str, z: int, x: int, y: int) -> bytes:
+        path = self._path(layer)
+        version, pyramid = self._pyramid(path)
+        key = (version, z, x, y)
+        with self._lock:
+            png = self._tiles.get(key)
+            if png is not None:
+                self._tiles.move_to_end(key)
+                return png
+
+        disk_path = self.tile_dir / layer / _digest(version) / str(z) / str(x) / f"{y}.png"
+        if disk_path.exists():
+            png = disk_path.read_bytes()
+        else:
+            png = self._render(path, pyramid, z, x, y)
+            disk_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = disk_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(png)
+            tmp.replace(disk_path)
+
+        with self._lock:
+            self._tiles[key] = png
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+        return png
+
+    def _render(self, path: Path, pyramid: dict, z: int, x: int, y: int) -> bytes:
+        meta = get_meta(path)
+        b = meta.bounds
+        n = 2.0 ** z
+        tile_west, tile_east = x / n * 360.0 - 180.0, (x + 1) / n * 360.0 - 180.0
+        if tile_east <= b.left or tile_west >= b.right:
+            return self.empty_tile()
+
+        # Coarsest overview whose pixels are still finer than the tile's
+        tile_res = (tile_east - tile_west) / TILE_SIZE
+        src_res = abs(meta.transform.a)
+        factor = max([f for f in LEVELS if f * src_res <= tile_res] or [1])
+        arr = self._level(pyramid, factor)
+
+        lats, lons = tile_pixel_centers(z, x, y)
+        rows, cols = latlon_to_pixel(lats, lons, meta.transform)
+        rows, cols = rows // factor, cols // factor
+        height, width = arr.shape
+        inside = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+        if not inside.any():
+            return self.empty_tile()
+
+        values = np.full(rows.shape, np.nan)
+        values[inside] = arr[rows[inside], cols[inside]]
+        return _encode(colorize(values, pyramid["vmin"], pyramid["vmax"]))
+
+
+def _encode(rgba: np.ndarray) -> bytes:
+    buf = io.BytesIO()
+    Image.fromarray(rgba).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+RENDERER = TileRenderer()
+
+
+class TileHandler(BaseHTTPRequestHandler):
+    renderer = RENDERER
+
+    def do_GET(self):
+        match = _TILE_RE.match(self.path.split("?", 1)[0])
+        if not match:
+            self.send_error(404, "Unknown path")
+            return
+        try:
+            png = self.renderer.render(
+                match["layer"], int(match["z"]), int(match["x"]), int(match["y"])
+            )
+        except KeyError:
+            self.send_error(404, f"Unknown layer {match['layer']}")
+            return
+        except Exception as e:  # a broken raster must not drop the connection
+            self.send_error(500, f"Could not render tile: {type(e).__name__}")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(png)))
+        self.send_header("Cache-Control", "public, max-age=300")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(png)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_tile_server(host: str = HOST, port: int = PORT) -> bool:
+    """
+    Start the tile server on a daemon thread, once per process.
+
+    Returns False if the port is already taken, which normally means a
+    standalone server is running there already.
+    """
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return True
+        try:
+            _server = ThreadingHTTPServer((host, port), TileHandler)
+        except OSError:
+            return False
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, daemon=True).start()
+        return True
+
+
+def tile_url(layer: str, host: str = HOST, port: int = PORT) -> str:
+    base = PUBLIC_URL or f"http://{host}:{port}"
+    return f"{base.rstrip('/')}/tiles/{layer}/{{z}}/{{x}}/{{y}}.png"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve NO2 raster tiles.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+
+    # National mosaics are served like any other layer
+    write_layer_vrts()
+    server = ThreadingHTTPServer((args.host, args.port), TileHandler)
+    print(f"Serving NO2 tiles for {sorted(layer_paths())} on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Make `src` importable the same way the Streamlit pages see it
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.data_engine.no2_cube import NO2Cube  # noqa: E402
+
+
+@pytest.fixture
+def make_cube():
+    """
+    Factory for in-memory NO2Cubes on a 0.01° grid at 13°N, 80°E.
+    """
+    def make(data, hours=(-720.0, -168.0, 0.0)):
+        meta = {
+            "labels": [f"t{i}" for i in range(len(hours))],
+            "hours": list(hours),
+            "transform": [0.01, 0.0, 80.0, 0.0, -0.01, 13.0],
+            "crs": "EPSG:4326",
+        }
+        return NO2Cube(np.asarray(data, dtype="float32"), meta)
+
+    return make
@@ -0,0 +1,58 @@
+"""
+Local stand-in for google.generativeai.GenerativeModel used by the tests.
+
+Answers every prompt after `latency` seconds with a deterministic text,
+can reject the first `quota_failures` calls with ResourceExhausted (or
+every call with `error`), and
+records call counts and the peak number of concurrent async requests.
+"""
+import asyncio
+import threading
+import time
+
+import google.api_core.exceptions as gexceptions
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGemini:
+    model_name = "models/fake-gemini"
+
+    def __init__(self, latency=0.0, quota_failures=0, reply=None, error=None):
+        self.latency = latency
+        self.quota_failures = quota_failures
+        self.error = error
+        self.reply = reply or (lambda prompt: f"Brief for: {prompt.splitlines()[0][:40]}")
+        self.calls = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _next(self, prompt):
+        with self._lock:
+            self.calls += 1
+            if self.error is not None:
+                raise self.error
+            if self.quota_failures > 0:
+                self.quota_failures -= 1
+                raise gexceptions.ResourceExhausted("429 quota exceeded")
+        return self.reply(prompt)
+
+    def generate_content(self, contents, generation_config=None, stream=False, request_options=None):
+        time.sleep(self.latency)
+        text = self._next(contents)
+        if stream:
+            return iter([FakeResponse(word + " ") for word in text.split()])
+        return FakeResponse(text)
+
+    async def generate_content_async(self, contents, generation_config=None, request_options=None):
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            return FakeResponse(self._next(contents))
+        finally:
+            self.in_flight -= 1
@@ -0,0 +1,82 @@
+import pytest
+from fake_gemini import FakeGemini
+
+from src.ai_core.policy_advisor import PREDEFINED_FALLBACK
+from src.ai_core.response_cache import ResponseCache
+from src.ai_core.retrieval import estimate_tokens
+from src.ui_components.chat_interface import ChatEngine, ChatStore
+
+
+def long_reply(prompt):
+    question = prompt.rsplit("User: ", 1)[-1].splitlines()[0]
+    return f"On '{question}': " + "cycle lanes and bus priority " * 40
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return ChatEngine(
+        FakeGemini(reply=long_reply),
+        store=ChatStore(tmp_path / "chats"),
+        cache=ResponseCache(tmp_path / "c.sqlite"),
+        token_budget=600,
+        digest_budget=150,
+    )
+
+
+def test_prompt_size_stays_flat_as_the_conversation_grows(engine):
+    conv = engine.start("City: Chennai; Breathability 60/100.", "Cut NO2 by 20%", "- Start with buses")
+
+    sizes = []
+    for i in range(25):
+        reply = "".join(engine.send(conv, f"follow-up question {i}"))
+        assert reply.startswith(f"On 'follow-up question {i}'")
+        sizes.append(conv.turns[-1]["prompt_tokens"])
+
+    assert len(conv.turns) == 52
+    assert conv.summarized > 40
+    last_folded = [t for t in conv.turns[:conv.summarized] if t["role"] == "user"][-1]
+    assert last_folded["text"] in conv.digest
+    assert "Cut NO2 by 20%" not in conv.digest  # oldest lines dropped
+    assert estimate_tokens(conv.digest) <= 150
+    # Bounded by system + context + digest + budget, whatever the turn count
+    assert max(sizes[10:]) - min(sizes[10:]) < 100
+    assert max(sizes) < 1200
+
+
+def test_conversation_is_saved_and_reloaded(engine, tmp_path):
+    conv = engine.start("City: Delhi", "Reduce NO2", "- Odd-even trial", owner="a@b.c")
+    "".join(engine.send(conv, "What about trucks?"))
+
+    store = ChatStore(tmp_path / "chats")
+    loaded = store.load(conv.id)
+    assert [t["role"] for t in loaded.turns] == ["user", "assistant", "user", "assistant"]
+    assert loaded.turns[2]["text"] == "What about trucks?"
+    assert loaded.context == "City: Delhi"
+    assert [c["id"] for c in store.list(owner="a@b.c")] == [conv.id]
+    assert store.list(owner="someone@else") == []
+    with pytest.raises(ValueError):
+        store.load("../../etc/passwd")
+
+
+def test_failed_reply_is_recorded_as_fallback_and_kept_out_of_prompts(engine):
+    conv = engine.start("City: Pune", "Reduce NO2", "- Plant trees")
+    engine.model.error = ConnectionError("offline")
+    with pytest.raises(ConnectionError):
+        "".join(engine.send(conv, "And industry?"))
+
+    assert conv.turns[-1]["text"] == PREDEFINED_FALLBACK and conv.turns[-1]["fallback"]
+    engine.model.error = None
+    "".join(engine.send(conv, "Try again"))
+    assert PREDEFINED_FALLBACK.strip()[:40] not in engine.build_prompt(conv)
+
+
+def test_fallback_first_answer_is_kept_out_of_prompts_and_digest(engine):
+    conv = engine.start("City: Pune", "Reduce NO2", PREDEFINED_FALLBACK, fallback=True)
+    assert conv.turns[1]["fallback"]
+    assert ChatStore(engine.store.root).load(conv.id).turns[1]["fallback"]
+
+    for i in range(12):
+        "".join(engine.send(conv, f"Question {i}?"))
+    assert conv.summarized > 1
+    assert PREDEFINED_FALLBACK.strip()[:40] not in engine.build_prompt(conv)
+    assert PREDEFINED_FALLBACK.strip()[:40] not in conv.digest
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+import rasterio
+from affine import Affine
+
+from src.ai_core.breathability import RISK_HIGH, RISK_LOW, RISK_MEDIUM
+from src.data_engine import derived_rasters
+from src.data_engine.derived_rasters import derive_layer, risk_histogram
+from src.data_engine.raster_registry import get_band
+
+
+def write_no2(path, arr):
+    with rasterio.open(
+        path, "w", driver="GTiff", width=arr.shape[1], height=arr.shape[0], count=1, dtype="float32",
+        crs="EPSG:4326", transform=Affine(0.1, 0.0, 80.0, 0.0, -0.1, 13.0), nodata=np.nan,
+    ) as dst:
+        dst.write(arr.astype("float32"), 1)
+
+
+@pytest.fixture
+def no2(tmp_path):
+    # Breathability 100 (Low), 75 (Medium), 25 (High) and nodata
+    arr = np.array([[5e-5, 5e-5, 1e-4], [2e-4, 2e-4, np.nan]])
+    path = tmp_path / "NO2_Test.tif"
+    write_no2(path, arr)
+    return path
+
+
+def test_unchanged_source_is_not_derived_again(no2, tmp_path, monkeypatch):
+    out = tmp_path / "derived"
+    first = derive_layer(no2, out)
+    assert get_band(first.risk_path)[0].tolist() == [RISK_LOW, RISK_LOW, RISK_MEDIUM]
+
+    def fail(*args):
+        raise AssertionError("derived again")
+    monkeypatch.setattr(derived_rasters, "score_no2", fail)
+    assert derive_layer(no2, out) == first
+
+
+def test_changed_source_replaces_only_its_own_stale_outputs(no2, tmp_path):
+    out = tmp_path / "derived"
+    old = derive_layer(no2, out)
+    other = tmp_path / "NO2_Other.tif"
+    write_no2(other, np.full((2, 3), 1e-4))
+    kept = derive_layer(other, out)
+
+    write_no2(no2, np.full((2, 3), 2e-4))
+    new = derive_layer(no2, out)
+    assert new.checksum != old.checksum
+    assert not old.breathability_path.exists() and not old.risk_path.exists()
+    assert new.risk_path.exists() and kept.risk_path.exists()
+    assert set(np.unique(get_band(new.risk_path))) == {RISK_HIGH}
+
+
+def test_risk_histogram_counts_pixels_and_area(no2, tmp_path):
+    hist = risk_histogram(no2, tmp_path / "derived")
+    assert {label: h["pixels"] for label, h in hist.items()} == {"Low": 2, "Medium": 1, "High": 2}
+    # 0.1° pixels near 13°N are about 10.8 x 11.1 km
+    assert hist["Low"]["area_km2"] == pytest.approx(2 * 0.1 * 111.32 * np.cos(np.radians(12.95)) * 0.1 * 110.57)
@@ -0,0 +1,98 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import rasterio
+from affine import Affine
+
+from src.ai_core import forecast_precompute as fp
+
+
+def write_region(data_dir, region, west, values):
+    transform = Affine(0.01, 0.0, west, 0.0, -0.01, 13.0)
+    for n, value in enumerate(values, start=1):
+        arr = np.full((4, 5), value, dtype="float32")
+        arr[0, 0] = np.nan
+        with rasterio.open(
+            data_dir / f"NO2_{region}_{n}.tif", "w", driver="GTiff", width=5, height=4,
+            count=1, dtype="float32", crs="EPSG:4326", transform=transform, nodata=np.nan,
+        ) as dst:
+            dst.write(arr, 1)
+
+
+def test_run_writes_all_horizons_and_skips_unchanged(tmp_path):
+    data_dir, out_dir = tmp_path / "data", tmp_path / "out"
+    data_dir.mkdir()
+    write_region(data_dir, "Alpha", 80.0, [1.2e-4, 1.0e-4, 0.8e-4])
+    write_region(data_dir, "Beta", 81.0, [0.6e-4, 0.7e-4])
+
+    assert fp.run(data_dir, out_dir, workers=2) == {"Alpha": "updated", "Beta": "updated"}
+    manifest = fp.read_manifest(out_dir)
+    assert set(manifest["regions"]) == {"Alpha", "Beta"}
+    for region, entry in manifest["regions"].items():
+        assert sorted(entry["files"]) == ["24", "48", "72"]
+        for names in entry["files"].values():
+            for name in names.values():
+                assert (out_dir / region / entry["dir"] / name).exists()
+
+    forecast = fp.precomputed_forecast_at(12.985, 80.025, out_dir)
+    assert sorted(forecast) == [24, 48, 72]
+    assert 0.8e-4 <= forecast[72]["no2"] <= 1.2e-4
+    assert fp.precomputed_forecast_at(12.995, 80.005, out_dir) is None  # nodata pixel
+    assert fp.precomputed_forecast_at(20.0, 70.0, out_dir) is None
+
+    trend = fp.precomputed_trend_paths(12.985, 81.025, out_dir)
+    assert trend["slope"].parent == out_dir / "Beta" / manifest["regions"]["Beta"]["dir"]
+    assert all(p.exists() for p in trend.values())
+    assert fp.precomputed_trend_paths(20.0, 70.0, out_dir) is None
+
+    assert fp.run(data_dir, out_dir, workers=2) == {"Alpha": "skipped", "Beta": "skipped"}
+
+    write_region(data_dir, "Beta", 81.0, [0.9e-4, 0.7e-4])
+    old_dir = manifest["regions"]["Beta"]["dir"]
+    assert fp.run(data_dir, out_dir, workers=2) == {"Alpha": "skipped", "Beta": "updated"}
+    assert not (out_dir / "Beta" / old_dir).exists()
+
+
+def test_old_outputs_outlive_the_manifest_swap_and_reads_route_by_bounds(tmp_path, monkeypatch):
+    data_dir, out_dir = tmp_path / "data", tmp_path / "out"
+    data_dir.mkdir()
+    write_region(data_dir, "Alpha", 80.0, [1.2e-4, 1.0e-4, 0.8e-4])
+    write_region(data_dir, "Beta", 81.0, [0.6e-4, 0.7e-4])
+    fp.run(data_dir, out_dir, workers=1)
+    old_dir = out_dir / "Beta" / fp.read_manifest(out_dir)["regions"]["Beta"]["dir"]
+
+    # The old output must still exist when the new manifest is written
+    write_manifest = fp._write_manifest
+    seen = []
+    monkeypatch.setattr(fp, "_write_manifest", lambda m, d: (seen.append(old_dir.exists()), write_manifest(m, d)))
+    assert fp.run(data_dir, out_dir, workers=1, force=True) == {"Alpha": "updated", "Beta": "updated"}
+    assert seen == [True]
+    new_dir = out_dir / "Beta" / fp.read_manifest(out_dir)["regions"]["Beta"]["dir"]
+    assert new_dir != old_dir and new_dir.exists() and not old_dir.exists()
+
+    # Only the region containing the point is sampled
+    sampled = []
+    sample = fp.sample_raster_batch
+    monkeypatch.setattr(fp, "sample_raster_batch", lambda p, *a: (sampled.append(p), sample(p, *a))[1])
+    assert fp.precomputed_forecast_at(12.985, 81.025, out_dir) is not None
+    assert {p.parent for p in sampled} == {new_dir}
+
+    # Files deleted under a reader are skipped, not raised
+    for f in new_dir.iterdir():
+        f.unlink()
+    assert fp.precomputed_forecast_at(12.985, 81.025, out_dir) is None
+
+
+def test_concurrent_runs_merge_their_regions_into_one_manifest(tmp_path):
+    data_dir, out_dir = tmp_path / "data", tmp_path / "out"
+    data_dir.mkdir()
+    write_region(data_dir, "Alpha", 80.0, [1.2e-4, 1.0e-4, 0.8e-4])
+    write_region(data_dir, "Beta", 81.0, [0.6e-4, 0.7e-4])
+
+    # Both runs read an empty manifest; the second to finish must not drop the first's region
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = list(pool.map(lambda r: fp.run(data_dir, out_dir, regions=[r], workers=1), ["Alpha", "Beta"]))
+    assert results == [{"Alpha": "updated"}, {"Beta": "updated"}]
+    assert set(fp.read_manifest(out_dir)["regions"]) == {"Alpha", "Beta"}
+    assert not (out_dir / fp.MANIFEST_LOCK).exists()
+    assert not list(out_dir.glob("*.tmp"))
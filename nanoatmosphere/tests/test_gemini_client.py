@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+import google.api_core.exceptions as gexceptions
+import pytest
+from fake_gemini import FakeGemini
+
+from src.ai_core.gemini_client import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, GeminiClient,
+)
+
+
+def test_breaker_opens_fails_fast_then_probes_half_open():
+    fake = FakeGemini(error=gexceptions.ServiceUnavailable("down"), latency=0.02)
+    client = GeminiClient(fake, breaker=CircuitBreaker(failure_threshold=3, reset_timeout=0.1))
+
+    for _ in range(3):
+        with pytest.raises(gexceptions.ServiceUnavailable):
+            client.generate_content("prompt")
+    assert client.breaker.state == OPEN
+
+    started = time.perf_counter()
+    with pytest.raises(CircuitOpenError):
+        client.generate_content("prompt")
+    assert time.perf_counter() - started < 0.01
+    assert fake.calls == 3
+
+    time.sleep(0.12)
+    assert client.breaker.state == HALF_OPEN
+    with pytest.raises(gexceptions.ServiceUnavailable):
+        client.generate_content("prompt")  # failed probe re-opens
+    assert client.breaker.state == OPEN
+
+    time.sleep(0.12)
+    fake.error = None
+    assert client.generate_content("City: Pune").text.startswith("Brief for")
+    assert client.breaker.state == CLOSED
+
+
+def test_request_errors_do_not_trip_the_breaker():
+    client = GeminiClient(FakeGemini(error=gexceptions.InvalidArgument("bad")),
+                          breaker=CircuitBreaker(failure_threshold=1))
+    with pytest.raises(gexceptions.InvalidArgument):
+        client.generate_content("prompt")
+    assert client.breaker.state == CLOSED
+
+
+def test_stream_deadline_and_async_path_count_as_failures():
+    slow = FakeGemini(latency=0.0)
+    client = GeminiClient(slow, deadline=0.05, breaker=CircuitBreaker(failure_threshold=2))
+
+    def slow_stream(*args, **kwargs):
+        for word in ["a", "b", "c"]:
+            time.sleep(0.03)
+            yield word
+    slow.generate_content = slow_stream
+    with pytest.raises(gexceptions.DeadlineExceeded):
+        list(client.generate_content("prompt", stream=True))
+    assert client.breaker.failures == 1
+
+    async_client = GeminiClient(FakeGemini(quota_failures=5), breaker=client.breaker)
+    with pytest.raises(gexceptions.ResourceExhausted):
+        asyncio.run(async_client.generate_content_async("prompt"))
+    assert client.breaker.state == OPEN
+
+
+def test_dropped_stream_releases_the_half_open_probe():
+    client = GeminiClient(FakeGemini(error=gexceptions.ServiceUnavailable("down")),
+                          breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.01))
+    with pytest.raises(gexceptions.ServiceUnavailable):
+        client.generate_content("prompt")
+    time.sleep(0.02)
+    client.model.error = None
+
+    # The probe's stream is never iterated; dropping it frees the probe
+    stream = client.generate_content("prompt", stream=True)
+    with pytest.raises(CircuitOpenError):
+        client.generate_content("prompt")
+    del stream
+    assert client.breaker.state == HALF_OPEN
+
+    stream = client.generate_content("prompt", stream=True)
+    assert "".join(c.text for c in stream).startswith("Brief for")
+    assert client.breaker.state == CLOSED
@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+from fake_gemini import FakeGemini
+
+from src.ai_core.gemini_stream import StreamStats, coalescing_stats, stream_generate
+from src.ai_core.response_cache import ResponseCache
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeStreamingModel:
+    model_name = "models/fake-flash"
+
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def generate_content(self, contents, generation_config=None, stream=False):
+        assert stream
+        self.calls += 1
+        for i, text in enumerate(self.chunks):
+            if i == self.fail_after:
+                raise ConnectionError("stream dropped")
+            yield FakeChunk(text)
+
+
+def test_chunks_arrive_in_order_and_complete_stream_is_cached(tmp_path):
+    cache = ResponseCache(tmp_path / "c.sqlite")
+    model = FakeStreamingModel(["- Cut ", "diesel ", "idling"])
+
+    stats = StreamStats()
+    assert list(stream_generate(model, "prompt", cache=cache, stats=stats)) == ["- Cut ", "diesel ", "idling"]
+    assert stats.chunks == 3 and stats.chars == len("- Cut diesel idling")
+    assert 0 <= stats.first_chunk_s <= stats.total_s
+
+    again = StreamStats()
+    assert list(stream_generate(model, "prompt", cache=cache, stats=again)) == ["- Cut diesel idling"]
+    assert again.from_cache and model.calls == 1
+
+
+def test_failure_partway_is_raised_and_not_cached(tmp_path):
+    cache = ResponseCache(tmp_path / "c.sqlite")
+    model = FakeStreamingModel(["partial ", "answer"], fail_after=1)
+
+    stats = StreamStats()
+    received = []
+    with pytest.raises(ConnectionError):
+        for chunk in stream_generate(model, "prompt", cache=cache, stats=stats):
+            received.append(chunk)
+    assert received == ["partial "]
+    assert "stream dropped" in stats.error
+    assert stats.total_s is not None
+    assert cache.stats()["entries"] == 0
+
+
+def test_concurrent_identical_requests_share_one_upstream_call(tmp_path):
+    cache = ResponseCache(tmp_path / "c.sqlite")
+    model = FakeGemini(latency=0.2)
+    before = coalescing_stats()
+
+    results, stats = [None] * 20, [StreamStats() for _ in range(20)]
+
+    def ask(i):
+        results[i] = "".join(stream_generate(model, "City: Chennai  goal", cache=cache, stats=stats[i]))
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert model.calls == 1
+    assert len(set(results)) == 1 and results[0].startswith("Brief for")
+    after = coalescing_stats()
+    assert after["upstream"] - before["upstream"] == 1
+    assert after["coalesced"] - before["coalesced"] == 19 == sum(s.coalesced for s in stats)
+    assert after["in_flight"] == 0
+
+    # A different prompt is its own flight
+    "".join(stream_generate(model, "City: Delhi", cache=cache))
+    assert model.calls == 2
@@ -0,0 +1,64 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from src.models.registry import ModelRegistry
+
+
+def test_save_load_roundtrip_is_memory_mapped(tmp_path):
+    registry = ModelRegistry(tmp_path)
+    weights = np.arange(12, dtype="float32").reshape(3, 4)
+    saved = registry.save(
+        "demo",
+        arrays={"weights": weights},
+        params={"alpha": 0.5},
+        training_checksum="abc",
+        metrics={"rmse": 1.0},
+    )
+
+    fresh = ModelRegistry(tmp_path).load("demo")
+    assert fresh.version == saved.version == 1
+    assert isinstance(fresh.arrays["weights"], np.memmap)
+    np.testing.assert_array_equal(fresh.arrays["weights"], weights)
+    assert fresh.meta["params"] == {"alpha": 0.5}
+    assert fresh.meta["training_checksum"] == "abc"
+
+
+def test_active_version_switch_and_lookup_by_checksum(tmp_path):
+    registry = ModelRegistry(tmp_path)
+    registry.save("demo", params={"v": 1}, training_checksum="one")
+    registry.save("demo", params={"v": 2}, training_checksum="two")
+    assert registry.versions("demo") == [1, 2]
+    assert registry.load("demo").meta["params"] == {"v": 2}
+
+    registry.set_active("demo", 1)
+    assert registry.load("demo").meta["params"] == {"v": 1}
+    assert registry.find("demo", "two").version == 2
+    assert registry.find("demo", "three") is None
+
+    with pytest.raises(KeyError):
+        registry.set_active("demo", 9)
+
+
+def _save_many(root, n=5):
+    registry = ModelRegistry(root)
+    return [registry.save("demo", arrays={"w": np.zeros(4)}, activate=False).version for _ in range(n)]
+
+
+def test_concurrent_processes_get_distinct_versions(tmp_path):
+    # Like the app and the precompute job: separate processes, no shared lock
+    with ProcessPoolExecutor(max_workers=4, mp_context=multiprocessing.get_context("spawn")) as pool:
+        saved = [v for batch in pool.map(_save_many, [tmp_path] * 8) for v in batch]
+
+    assert sorted(saved) == list(range(1, 41))
+    assert ModelRegistry(tmp_path).versions("demo") == list(range(1, 41))
+
+
+def test_versions_skip_directories_still_being_written(tmp_path):
+    registry = ModelRegistry(tmp_path)
+    registry.save("demo", params={"v": 1})
+    (tmp_path / "demo" / "v0002").mkdir()
+    assert registry.versions("demo") == [1]
+    assert registry.save("demo", params={"v": 3}).version == 3
@@ -0,0 +1,53 @@
+import numpy as np
+import rasterio
+from affine import Affine
+
+from src.data_engine.mosaic import MosaicCatalog
+
+
+def write_raster(path, west, north, values):
+    values = np.asarray(values, dtype="float32")
+    with rasterio.open(
+        path, "w", driver="GTiff", width=values.shape[1], height=values.shape[0], count=1,
+        dtype="float32", crs="EPSG:4326", transform=Affine(0.1, 0.0, west, 0.0, -0.1, north), nodata=np.nan,
+    ) as dst:
+        dst.write(values, 1)
+    return path
+
+
+def overlapping_catalog(tmp_path):
+    # A covers lon 80.0-80.4, B covers 80.2-80.6; both lat 12.6-13.0.
+    # A is NaN in its top-right pixel, which lies in the overlap.
+    a = np.full((4, 4), 1.0)
+    a[0, 3] = np.nan
+    b = np.full((4, 4), 3.0)
+    return MosaicCatalog([
+        write_raster(tmp_path / "a.tif", 80.0, 13.0, a),
+        write_raster(tmp_path / "b.tif", 80.2, 13.0, b),
+    ], cell_deg=0.25)
+
+
+def test_route_assigns_points_to_covering_footprints(tmp_path):
+    catalog = overlapping_catalog(tmp_path)
+    lats = np.array([12.95, 12.95, 12.95, 12.95, 14.0])
+    lons = np.array([80.05, 80.25, 80.55, 81.0, 80.05])
+
+    routes = catalog.route(lats, lons)
+    assert routes[0].tolist() == [True, True, False, False, False]
+    assert routes[1].tolist() == [False, True, True, False, False]
+    np.testing.assert_allclose(catalog.extent, (80.0, 12.6, 80.6, 13.0))
+
+
+def test_merge_modes_on_overlap(tmp_path):
+    catalog = overlapping_catalog(tmp_path)
+    # Only A, overlap, overlap where A is NaN, only B, outside
+    lats = np.array([12.95, 12.75, 12.95, 12.75, 12.0])
+    lons = np.array([80.05, 80.25, 80.35, 80.55, 80.05])
+
+    first = catalog.sample(lats, lons, merge="first")
+    mean = catalog.sample(lats, lons, merge="mean")
+    high = catalog.sample(lats, lons, merge="max")
+
+    np.testing.assert_array_equal(first, [1.0, 1.0, 3.0, 3.0, np.nan])
+    np.testing.assert_array_equal(mean, [1.0, 2.0, 3.0, 3.0, np.nan])
+    np.testing.assert_array_equal(high, [1.0, 3.0, 3.0, 3.0, np.nan])
@@ -0,0 +1,102 @@
+import itertools
+import os
+import warnings
+
+import numpy as np
+import pytest
+import rasterio
+from affine import Affine
+
+from src.data_engine.no2_cube import build_cube, load_cube
+
+AGES = {"Recent": 0.0, "Last Week": 168.0, "Last Month": 720.0}
+TRANSFORM = Affine(0.01, 0.0, 80.0, 0.0, -0.01, 13.0)
+
+_bump = itertools.count(1)
+
+
+def write_layer(path, arr):
+    with rasterio.open(
+        path, "w", driver="GTiff", width=arr.shape[1], height=arr.shape[0], count=1, dtype="float32",
+        crs="EPSG:4326", transform=TRANSFORM, nodata=np.nan,
+    ) as dst:
+        dst.write(arr.astype("float32"), 1)
+    # Distinct mtimes even on coarse filesystem clocks
+    stamp = os.stat(path).st_mtime_ns + 10 ** 9 * next(_bump)
+    os.utime(path, ns=(stamp, stamp))
+
+
+def read(path):
+    with rasterio.open(path) as src:
+        return src.read(1)
+
+
+@pytest.fixture
+def layers(tmp_path):
+    rng = np.random.default_rng(0)
+    out = {}
+    for label in AGES:
+        arr = rng.uniform(5e-5, 2e-4, (6, 8))
+        arr[rng.random(arr.shape) < 0.2] = np.nan
+        out[label] = str(tmp_path / f"NO2_{label.replace(' ', '')}.tif")
+        write_layer(tmp_path / f"NO2_{label.replace(' ', '')}.tif", arr)
+    return out
+
+
+def test_build_stacks_layers_oldest_first(layers, tmp_path):
+    cube = build_cube(layers, AGES, tmp_path / "cube")
+    assert cube.labels == ["Last Month", "Last Week", "Recent"]
+    assert cube.hours.tolist() == [-720.0, -168.0, 0.0]
+    for i, label in enumerate(cube.labels):
+        np.testing.assert_array_equal(cube.data[i], read(layers[label]))
+    assert load_cube(tmp_path / "cube", layers=layers, ages=AGES) is cube
+
+
+def test_stale_source_rebuilds_and_prunes_old_builds(layers, tmp_path):
+    out = tmp_path / "cube"
+    first = load_cube(out, layers=layers, ages=AGES)
+    write_layer(tmp_path / "NO2_Recent.tif", np.full((6, 8), 1e-4))
+    second = load_cube(out, layers=layers, ages=AGES)
+    assert second is not first
+    np.testing.assert_array_equal(second.layer("Recent"), np.float32(1e-4))
+    write_layer(tmp_path / "NO2_Recent.tif", np.full((6, 8), 2e-4))
+    third = load_cube(out, layers=layers, ages=AGES)
+    np.testing.assert_array_equal(third.layer("Recent"), np.float32(2e-4))
+
+    # The current build and the one it replaced remain, each as a matching pair
+    current = (out / "CURRENT").read_text(encoding="utf-8")
+    builds = sorted(p.name[len("cube-"):-len(".npy")] for p in out.glob("cube-*.npy"))
+    assert len(builds) == 2 and builds[-1] == current
+    assert sorted(p.name[len("cube-"):-len(".json")] for p in out.glob("cube-*.json")) == builds
+
+
+def test_time_series_and_temporal_stats_match_direct_reads(layers, tmp_path):
+    cube = build_cube(layers, AGES, tmp_path / "cube")
+    stack = np.stack([read(layers[label]) for label in cube.labels]).astype("float64")
+
+    rows, cols = np.array([0, 3, 5]), np.array([0, 4, 7])
+    lats, lons = 13.0 - 0.01 * (rows + 0.5), 80.0 + 0.01 * (cols + 0.5)
+    series = cube.time_series(lats, lons)
+    np.testing.assert_array_equal(series, stack[:, rows, cols].T.astype("float32"))
+    assert np.isnan(cube.time_series(20.0, 70.0)).all()
+
+    # All-NaN pixels make nanmean & co. warn
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        expected = {
+            "mean": np.nanmean(stack, axis=0),
+            "min": np.nanmin(stack, axis=0),
+            "max": np.nanmax(stack, axis=0),
+            "delta": stack[-1] - stack[0],
+        }
+    for stat, want in expected.items():
+        np.testing.assert_allclose(cube.temporal_stat(stat), want, rtol=1e-6, equal_nan=True)
+
+    slope = cube.temporal_stat("slope")
+    for r in range(stack.shape[1]):
+        for c in range(stack.shape[2]):
+            ok = ~np.isnan(stack[:, r, c])
+            if ok.sum() >= 2:
+                assert slope[r, c] == pytest.approx(np.polyfit(cube.hours[ok], stack[ok, r, c], 1)[0], rel=1e-4)
+            else:
+                assert np.isnan(slope[r, c])
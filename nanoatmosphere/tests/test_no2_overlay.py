@@ -0,0 +1,51 @@
+import os
+
+import numpy as np
+import pytest
+import rasterio
+from affine import Affine
+
+from src.ui_components import no2_overlay
+from src.ui_components.no2_overlay import get_overlay
+
+
+def write_no2(path, arr):
+    with rasterio.open(
+        path, "w", driver="GTiff", width=arr.shape[1], height=arr.shape[0], count=1, dtype="float32",
+        crs="EPSG:4326", transform=Affine(0.01, 0.0, 80.0, 0.0, -0.01, 13.0), nodata=np.nan,
+    ) as dst:
+        dst.write(arr.astype("float32"), 1)
+
+
+@pytest.fixture
+def raster(tmp_path, monkeypatch):
+    monkeypatch.setattr(no2_overlay, "_cache", {})
+    path = tmp_path / "NO2_Test.tif"
+    write_no2(path, np.linspace(1e-5, 2e-4, 60).reshape(6, 10))
+    return path
+
+
+def test_cached_png_is_reused_without_reading_the_raster(raster, tmp_path, monkeypatch):
+    out = tmp_path / "overlays"
+    first = get_overlay(raster, out_dir=out)
+    assert first.vmin < first.vmax
+    assert len(list(out.glob("*.png"))) == 1 and not list(out.glob("*.tmp"))
+
+    # A new process: empty memory cache, and the band must not be touched
+    monkeypatch.setattr(no2_overlay, "_cache", {})
+    monkeypatch.setattr(no2_overlay, "get_band", lambda path: pytest.fail("raster read on a cache hit"))
+    again = get_overlay(raster, out_dir=out)
+    assert again == first
+
+
+def test_new_raster_version_renders_a_new_overlay(raster, tmp_path):
+    out = tmp_path / "overlays"
+    first = get_overlay(raster, out_dir=out)
+
+    write_no2(raster, np.linspace(1e-4, 5e-4, 60).reshape(6, 10))
+    os.utime(raster, ns=(os.stat(raster).st_mtime_ns + 10 ** 9,) * 2)
+    second = get_overlay(raster, out_dir=out)
+    assert second.url != first.url and second.vmin > first.vmin
+    assert len(list(out.glob("*.png"))) == 2
+    # Only the current version stays in memory
+    assert [key[0] for key in no2_overlay._cache] == [no2_overlay.raster_version(raster)]
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+import rasterio
+from affine import Affine
+
+from src.data_engine.no2_sampler import neighborhood_stats, sample_raster_batch
+
+
+def pixel_center(row, col):
+    # (lat, lon) of a pixel centre on the 0.1° grid used below
+    return 12.95 - 0.1 * row, 80.05 + 0.1 * col
+
+
+@pytest.fixture
+def raster(tmp_path):
+    # arr[r, c] = 10r + c is linear, so bilinear interpolation is exact
+    arr = (10.0 * np.arange(4)[:, None] + np.arange(5)[None, :]).astype("float32")
+    arr[3, 4] = np.nan
+    path = tmp_path / "no2.tif"
+    with rasterio.open(
+        path, "w", driver="GTiff", width=5, height=4, count=1, dtype="float32",
+        crs="EPSG:4326", transform=Affine(0.1, 0.0, 80.0, 0.0, -0.1, 13.0), nodata=np.nan,
+    ) as dst:
+        dst.write(arr, 1)
+    return path
+
+
+def test_bilinear_interior_edges_and_nodata(raster):
+    lats = np.array([12.9, 12.85, 12.99, 12.99, 12.8, 12.7])
+    lons = np.array([80.1, 80.15, 80.01, 79.99, 80.2, 80.4])
+    out = sample_raster_batch(raster, lats, lons, mode="bilinear")
+
+    assert out[0] == pytest.approx(5.5)    # corner shared by pixels 0, 1, 10, 11
+    assert out[1] == pytest.approx(11.0)   # exactly on a pixel centre
+    assert out[2] == pytest.approx(0.0)    # edge pixel: off-raster neighbours dropped
+    assert np.isnan(out[3])                # just outside the raster
+    assert out[4] == pytest.approx(16.5)   # row 1.5, col 1.5
+    # Next to the NaN pixel (3, 4): weights renormalised over 23, 24, 33
+    assert out[5] == pytest.approx((23 + 24 + 33) / 3)
+
+
+def test_window_modes_with_odd_and_even_size(raster):
+    lat, lon = pixel_center(2, 2)
+    assert sample_raster_batch(raster, lat, lon, mode="mean", size=3) == pytest.approx(22.0)
+    # Even sizes take the extra row/column above and to the left
+    assert sample_raster_batch(raster, lat, lon, mode="mean", size=2) == pytest.approx((11 + 12 + 21 + 22) / 4)
+    assert sample_raster_batch(raster, lat, lon, mode="max", size=4) == pytest.approx(33.0)
+
+    lat, lon = pixel_center(0, 0)
+    assert sample_raster_batch(raster, lat, lon, mode="mean", size=3) == pytest.approx(5.5)
+    lat, lon = pixel_center(3, 4)
+    assert sample_raster_batch(raster, lat, lon, mode="max", size=3) == pytest.approx(33.0)
+    assert np.isnan(sample_raster_batch(raster, lat, lon, mode="nearest"))
+
+
+def test_neighborhood_stats_uses_a_disk_and_skips_off_raster_pixels(raster):
+    # 12 km covers the pixel and its four edge neighbours (~11 km away), not diagonals
+    lats, lons = zip(pixel_center(2, 2), pixel_center(0, 0), (20.0, 80.0))
+    stats = neighborhood_stats(raster, np.array(lats), np.array(lons), radius_km=12.0)
+
+    assert stats["count"].tolist() == [5, 3, 0]
+    assert stats["mean"][0] == pytest.approx(22.0)
+    assert (stats["min"][0], stats["max"][0]) == (12.0, 32.0)
+    assert stats["mean"][1] == pytest.approx(11 / 3)
+    assert np.isnan(stats["mean"][2])
+
+
+def test_neighborhood_stats_ignores_nan_and_far_off_raster_points(raster):
+    lats, lons = map(np.array, zip(pixel_center(2, 2), pixel_center(0, 0)))
+    clean = neighborhood_stats(raster, lats, lons, radius_km=12.0)
+
+    # A NaN latitude and an off-raster point near the pole ride along in the batch
+    mixed = neighborhood_stats(
+        raster, np.r_[lats, np.nan, 89.9], np.r_[lons, 80.1, 80.1], radius_km=12.0
+    )
+    for key, values in clean.items():
+        np.testing.assert_array_equal(mixed[key][:2], values)
+    assert mixed["count"][2:].tolist() == [0, 0]
+    assert np.isnan(mixed["mean"][2:]).all()
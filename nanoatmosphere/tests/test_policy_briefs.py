@@ -0,0 +1,83 @@
+import json
+import time
+
+import google.api_core.exceptions as gexceptions
+from fake_gemini import FakeGemini
+
+from src.ai_core import policy_briefs
+from src.ai_core.gemini_client import CLOSED, CircuitBreaker, GeminiClient
+from src.ai_core.policy_advisor import PREDEFINED_FALLBACK
+
+CITIES = {f"City {i}": {"NO2": 1e-4 + i * 1e-6, "SO2": 5e-5, "CO": 0.03} for i in range(60)}
+
+
+def test_briefs_run_concurrently_under_the_cap_and_land_on_disk(tmp_path):
+    model = FakeGemini(latency=0.05)
+    started = time.perf_counter()
+    index = policy_briefs.run(model, tmp_path, CITIES, concurrency=10, rate=1000)
+    elapsed = time.perf_counter() - started
+
+    # 60 x 50 ms serially would take 3 s
+    assert elapsed < 1.0
+    assert model.peak_in_flight == 10
+
+    summary = json.loads(index.read_text(encoding="utf-8"))["cities"]
+    assert len(summary) == 60
+    assert all(c["status"] == "ok" for c in summary.values())
+    text = (tmp_path / summary["City 7"]["file"]).read_text(encoding="utf-8")
+    assert text.startswith("# City 7") and "Brief for:" in text
+
+
+def test_quota_errors_are_retried_then_fall_back(tmp_path):
+    model = FakeGemini(quota_failures=3)
+    cities = dict(list(CITIES.items())[:2])
+    index = policy_briefs.run(model, tmp_path, cities, concurrency=1, rate=1000, base_delay=0.001)
+    summary = json.loads(index.read_text(encoding="utf-8"))["cities"]
+    assert {c["status"] for c in summary.values()} == {"ok"}
+    assert sum(c["attempts"] for c in summary.values()) == 5
+
+    hopeless = FakeGemini(quota_failures=100)
+    index = policy_briefs.run(hopeless, tmp_path / "b", cities, rate=1000, max_retries=2, base_delay=0.001)
+    summary = json.loads(index.read_text(encoding="utf-8"))["cities"]
+    assert all(c["status"] == "fallback" and c["attempts"] == 3 for c in summary.values())
+    assert PREDEFINED_FALLBACK.strip()[:40] in (tmp_path / "b" / summary["City 0"]["file"]).read_text(encoding="utf-8")
+
+
+def test_open_breaker_delays_briefs_instead_of_failing_them(tmp_path):
+    cities = dict(list(CITIES.items())[:40])
+    for concurrency, quota_failures in [(1, 3), (8, 8)]:
+        fake = FakeGemini(quota_failures=quota_failures)
+        client = GeminiClient(fake, breaker=CircuitBreaker(failure_threshold=3, reset_timeout=0.05))
+        index = policy_briefs.run(
+            client, tmp_path / str(concurrency), cities, concurrency=concurrency, rate=1000, base_delay=0.001,
+        )
+        summary = json.loads(index.read_text(encoding="utf-8"))["cities"]
+        assert {c["status"] for c in summary.values()} == {"ok"}
+        assert fake.calls == 40 + quota_failures
+        assert client.breaker.state == CLOSED
+
+
+def test_sustained_outage_behind_the_breaker_ends_in_bounded_time(tmp_path):
+    cities = dict(list(CITIES.items())[:60])
+    for fake in [FakeGemini(quota_failures=10 ** 6), FakeGemini(error=gexceptions.ServiceUnavailable("down"))]:
+        client = GeminiClient(fake, breaker=CircuitBreaker(failure_threshold=3, reset_timeout=0.2))
+        started = time.perf_counter()
+        index = policy_briefs.run(client, tmp_path, cities, concurrency=8, rate=1000, max_retries=2, base_delay=0.01)
+        # Each city waits on the open breaker at most max_retries times
+        assert time.perf_counter() - started < 1.5
+        summary = json.loads(index.read_text(encoding="utf-8"))["cities"]
+        assert {c["status"] for c in summary.values()} == {"fallback"}
+        assert all(c["attempts"] <= 3 for c in summary.values())
+        assert fake.calls < 20
+
+
+def test_token_bucket_limits_request_rate(tmp_path):
+    model = FakeGemini()
+    cities = dict(list(CITIES.items())[:12])
+    started = time.perf_counter()
+    policy_briefs.run(model, tmp_path, cities, concurrency=12, rate=40)
+    # A 40-token burst covers all 12 at once; at 10/s the last two wait for refills
+    assert time.perf_counter() - started < 0.5
+    started = time.perf_counter()
+    policy_briefs.run(model, tmp_path, cities, concurrency=12, rate=10)
+    assert time.perf_counter() - started > 0.1
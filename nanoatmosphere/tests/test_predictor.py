@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from src.ai_core.predictor import HORIZONS, NO2Forecaster
+
+
+def test_forecast_shapes_and_decay_towards_mean(make_cube):
+    rng = np.random.default_rng(0)
+    cube = make_cube(rng.normal(1e-4, 2e-5, (3, 20, 30)))
+    model = NO2Forecaster().fit(cube)
+
+    forecasts = model.forecast(cube)
+    assert set(forecasts) == set(HORIZONS)
+
+    latest = cube.data[-1].astype("float64")
+    mean = cube.data.astype("float64").mean(axis=0)
+    previous = np.abs(latest - mean)
+    for h in HORIZONS:
+        assert forecasts[h].shape == (20, 30)
+        gap = np.abs(forecasts[h] - mean)
+        assert np.all(gap <= previous + 1e-12)
+        previous = gap
+
+
+def test_fit_and_forecast_do_not_depend_on_chunking(make_cube):
+    rng = np.random.default_rng(1)
+    data = rng.normal(1e-4, 2e-5, (3, 17, 13))
+    data[:, 0, :5] = np.nan
+    cube = make_cube(data)
+
+    whole = NO2Forecaster().fit(cube)
+    chunked = NO2Forecaster().fit(cube, chunk_pixels=7)
+    assert whole.tau_hours == pytest.approx(chunked.tau_hours)
+
+    a = whole.forecast(cube)
+    b = chunked.forecast(cube, chunk_pixels=7)
+    for h in HORIZONS:
+        np.testing.assert_allclose(a[h], b[h], equal_nan=True)
+    assert np.isnan(a[24][0, :5]).all()
+
+
+def test_point_forecast_matches_raster_forecast(make_cube):
+    rng = np.random.default_rng(2)
+    cube = make_cube(rng.normal(1e-4, 2e-5, (3, 10, 10)))
+    model = NO2Forecaster().fit(cube)
+
+    lat, lon = 13.0 - 0.045, 80.0 + 0.035  # centre of pixel (row 4, col 3)
+    points = model.forecast_points(cube, lat, lon)
+    raster = model.forecast(cube)
+    for h in HORIZONS:
+        assert float(points[h]) == pytest.approx(float(raster[h][4, 3]), rel=1e-5)
+
+
+def test_unfitted_model_refuses_to_predict():
+    with pytest.raises(RuntimeError):
+        NO2Forecaster().predict(1e-4, 1e-4, 24)
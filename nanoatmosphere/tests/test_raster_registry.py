@@ -0,0 +1,61 @@
+import threading
+
+import numpy as np
+import rasterio
+from affine import Affine
+from rasterio.windows import Window
+
+from src.data_engine.raster_registry import RasterRegistry
+
+
+def write_raster(path, value, shape=(20, 30)):
+    with rasterio.open(
+        path, "w", driver="GTiff", width=shape[1], height=shape[0], count=1, dtype="float32",
+        crs="EPSG:4326", transform=Affine(0.01, 0.0, 80.0, 0.0, -0.01, 13.0), nodata=np.nan,
+    ) as dst:
+        dst.write(np.full(shape, value, dtype="float32"), 1)
+    return path
+
+
+def test_evicted_handles_stay_open_until_released(tmp_path):
+    paths = [write_raster(tmp_path / f"r{i}.tif", float(i)) for i in range(4)]
+    registry = RasterRegistry(max_handles=1)
+    errors = []
+
+    def reader(seed):
+        rng = np.random.default_rng(seed)
+        try:
+            for i in rng.integers(0, len(paths), 100):
+                with registry.open(paths[i]) as src:
+                    assert src.read(1, window=Window(0, 0, 4, 4))[0, 0] == float(i)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=reader, args=(seed,)) for seed in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+
+    with registry.open(paths[0]) as held:
+        with registry.open(paths[1]):
+            pass
+        # Evicted by the open above, but still usable by its holder
+        assert not held.closed
+        held.read(1)
+    assert held.closed
+    registry.clear()
+
+
+def test_band_pool_is_bounded_by_bytes(tmp_path):
+    paths = [write_raster(tmp_path / f"r{i}.tif", float(i)) for i in range(6)]
+    band_bytes = 20 * 30 * 8
+    registry = RasterRegistry(max_band_bytes=3 * band_bytes)
+
+    bands = [registry.band(p) for p in paths]
+    assert [b[0, 0] for b in bands] == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
+    assert registry._band_bytes == 3 * band_bytes
+    assert registry.band(paths[-1]) is bands[-1]
+    assert registry.band(paths[0]) is not bands[0]
+    registry.clear()
@@ -0,0 +1,60 @@
+import time
+
+from src.ai_core.response_cache import ResponseCache, cache_key, generate_cached
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    model_name = "models/fake-flash"
+
+    def __init__(self, text="advice"):
+        self.text = text
+        self.calls = 0
+
+    def generate_content(self, contents, generation_config=None):
+        self.calls += 1
+        return FakeResponse(f"{self.text} #{self.calls}")
+
+
+CONFIG = {"temperature": 0.4, "max_output_tokens": 2048}
+
+
+def test_repeat_prompt_is_served_from_disk_across_restarts(tmp_path):
+    path = tmp_path / "responses.sqlite"
+    model = FakeModel()
+    cache = ResponseCache(path)
+
+    assert generate_cached(model, "City: Chennai\n  NO2: 1e-4", CONFIG, cache) == ("advice #1", False)
+    # Whitespace differences normalise to the same key
+    assert generate_cached(model, "City: Chennai NO2: 1e-4 ", CONFIG, cache) == ("advice #1", True)
+    cache.close()
+
+    reopened = ResponseCache(path)
+    assert generate_cached(model, "City: Chennai NO2: 1e-4", CONFIG, reopened) == ("advice #1", True)
+    assert model.calls == 1
+    assert reopened.stats()["hits"] == 2
+    assert reopened.stats()["misses"] == 1
+
+    # Model name and generation config are part of the key
+    assert generate_cached(model, "City: Chennai NO2: 1e-4", {"temperature": 0.9}, reopened)[1] is False
+    assert cache_key("p", "a") != cache_key("p", "b")
+
+
+def test_ttl_and_size_eviction(tmp_path):
+    cache = ResponseCache(tmp_path / "c.sqlite", ttl_seconds=0.05, max_entries=2)
+    cache.put("old", "x")
+    time.sleep(0.1)
+    assert cache.get("old") is None
+
+    cache.ttl_seconds = 60
+    for key in ("a", "b", "c"):
+        cache.put(key, key)
+        time.sleep(0.01)
+    assert cache.get("a") is None
+    assert cache.get("b") == "b" and cache.get("c") == "c"
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["evictions"] >= 1
@@ -0,0 +1,62 @@
+import numpy as np
+
+from src.ai_core.policy_advisor import build_policy_prompt
+from src.ai_core.retrieval import (
+    Snippet, VectorIndex, advisory_snippets, build_context, city_snippets, embed, estimate_tokens,
+    report_snippets,
+)
+
+GASES = {
+    "Chennai": {"NO2": 1.1e-4, "SO2": 1.1e-4, "CO": 0.042},
+    "Mumbai": {"NO2": 2.0e-4, "SO2": 9.0e-5, "CO": 0.044},
+    "Bengaluru": {"NO2": 7.8e-5, "SO2": 2.0e-5, "CO": 0.037},
+}
+
+
+def test_embeddings_are_unit_length_and_similar_text_scores_higher():
+    vecs = embed(["diesel trucks near the port", "diesel truck ban at the port", "school timings", ""])
+    norms = np.linalg.norm(vecs, axis=1)
+    np.testing.assert_allclose(norms[:3], 1.0, rtol=1e-5)
+    assert norms[3] == 0
+    assert vecs[0] @ vecs[1] > vecs[0] @ vecs[2]
+
+
+def test_search_prefers_the_asked_city_and_context_fits_budget(tmp_path):
+    run = tmp_path / "2026-01-30"
+    run.mkdir()
+    (run / "Mumbai.md").write_text(
+        "# Mumbai\n\n- Shift port truck entry to night hours and add shore power for docked ships.\n",
+        encoding="utf-8",
+    )
+    snippets = city_snippets(GASES) + advisory_snippets(tmp_path) + [
+        Snippet("report", "Chennai", "Community report near Chennai: Smoke, severity 4/5: \"garbage burning\""),
+    ]
+    index = VectorIndex(snippets)
+
+    hits = index.search("port trucks at night", k=3, city="Mumbai")
+    assert hits[0].snippet.source == "advisory" and hits[0].snippet.city == "Mumbai"
+    assert all(a.score >= b.score for a, b in zip(hits, hits[1:]))
+
+    context = build_context("garbage burning smoke", city="Chennai", max_tokens=60, index=index)
+    assert "garbage burning" in context
+    assert estimate_tokens(context) <= 60
+
+    prompt = build_policy_prompt("Chennai", 1.1e-4, 76, "Medium", "cut smoke", context=context)
+    assert "Local evidence" in prompt and "garbage burning" in prompt
+    assert "Local evidence" not in build_policy_prompt("Chennai", 1.1e-4, 76, "Medium", "cut smoke")
+
+
+def test_far_away_reports_are_not_attributed_to_the_nearest_city(tmp_path):
+    path = tmp_path / "reports.csv"
+    path.write_text(
+        "id,category,severity,city,lat,lon,description,timestamp,status\n"
+        "a,Smoke,3,mumbai,19.08,72.88,tyre burning by the creek,2026-01-18 10:00:00,Resolved\n"
+        "b,Smoke,3,chennai,0.2,0.23,smoke over the market,2026-01-21 11:48:56,Under Review\n"
+        "c,Smoke,2,,0.2,0.23,no city and nowhere near one,2026-01-22 09:00:00,Under Review\n",
+        encoding="utf-8",
+    )
+    snippets = report_snippets(path)
+    assert [s.city for s in snippets] == ["Mumbai", "Chennai"]
+    assert snippets[0].text.startswith("Community report near Mumbai (2026-01-18)")
+    # 8,000 km from Mumbai: keeps the typed city, flagged, never "near Mumbai"
+    assert snippets[1].text.startswith("Community report for Chennai (2026-01-21, location unverified)")
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from src.data_engine.spatial_index import CityIndex, PolygonIndex
+
+SQUARE_WITH_HOLE = {"type": "Polygon", "coordinates": [
+    [[80.0, 12.0], [81.0, 12.0], [81.0, 13.0], [80.0, 13.0], [80.0, 12.0]],
+    [[80.4, 12.4], [80.6, 12.4], [80.6, 12.6], [80.4, 12.6], [80.4, 12.4]],
+]}
+TWO_ISLANDS = {"type": "MultiPolygon", "coordinates": [
+    [[[72.0, 18.0], [72.5, 18.0], [72.5, 18.5], [72.0, 18.5], [72.0, 18.0]]],
+    [[[73.0, 19.0], [73.5, 19.0], [73.5, 19.5], [73.0, 19.5], [73.0, 19.0]]],
+]}
+
+
+def test_polygon_index_handles_holes_and_multipolygons():
+    index = PolygonIndex([("Chennai", SQUARE_WITH_HOLE), ("Mumbai", TWO_ISLANDS)])
+    lats = np.array([12.2, 12.5, 12.5, 18.2, 19.2, 18.7, 25.0])
+    lons = np.array([80.2, 80.5, 80.8, 72.2, 73.2, 72.7, 80.5])
+
+    # Outer ring, inside the hole, beyond the hole, island 1, island 2,
+    # between the islands, nowhere
+    assert index.locate(lats, lons).tolist() == [0, -1, 0, 1, 1, -1, -1]
+    assert index.locate(lats.reshape(7, 1), lons.reshape(7, 1)).shape == (7, 1)
+
+
+def test_nearest_cities_and_distance_cap():
+    index = CityIndex(
+        {"Chennai": (13.0827, 80.2707), "Bengaluru": (12.9716, 77.5946), "Mumbai": (19.0760, 72.8777)},
+        zones=[("Chennai", SQUARE_WITH_HOLE)],
+    )
+    cities, dist = index.nearest([13.0, 12.9], [80.2, 77.6], k=2)
+    assert cities.tolist() == [["Chennai", "Bengaluru"], ["Bengaluru", "Chennai"]]
+    assert dist[0, 0] == pytest.approx(11.8, abs=0.5)
+    assert np.all(np.diff(dist, axis=1) > 0)
+
+    # A point in the sea far from every city is not attributed to one
+    tags = index.tag([12.9, 0.2], [80.2, 0.23], max_km=50.0)
+    assert tags["nearest_city"].tolist() == ["Chennai", ""]
+    assert tags["distance_km"][1] > 1000
+    assert tags["zone"].tolist() == ["Chennai", ""]
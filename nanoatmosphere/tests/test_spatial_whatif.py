@@ -0,0 +1,31 @@
+import numpy as np
+from affine import Affine
+from scipy.signal import convolve2d
+
+from src.ai_core.spatial_whatif import (
+    Intervention, _fast_len, apply_interventions, disk_mask, disperse, gaussian_kernel,
+)
+
+TRANSFORM = Affine(0.01, 0.0, 80.0, 0.0, -0.01, 13.3)
+
+
+def test_fft_dispersion_matches_direct_convolution():
+    rng = np.random.default_rng(1)
+    field = rng.random((37, 52))
+    expected = convolve2d(field, gaussian_kernel(2.0, 3.0), mode="same")
+    np.testing.assert_allclose(disperse(field, 2.0, 3.0), expected, atol=1e-12)
+    assert all(_fast_len(n) >= n for n in range(1, 200))
+
+
+def test_interventions_lower_no2_around_mask_only():
+    no2 = np.full((60, 60), 1.5e-4)
+    no2[0, :] = np.nan
+    mask = disk_mask(TRANSFORM, no2.shape, 13.0, 80.3, radius_km=3.0)
+    result = apply_interventions(no2, TRANSFORM, [Intervention("trees", mask, 2000)], dispersion_km=0.5)
+
+    gain = result.breathability_after - result.breathability_before
+    assert np.isnan(result.no2_after[0]).all()
+    assert gain[30, 30] > 5
+    assert abs(gain[-1, -1]) < 1e-9
+    assert result.impact["mean_after"] > result.impact["mean_before"]
+    assert 0 < result.impact["improved_km2"] < result.impact["area_km2"]
@@ -0,0 +1,103 @@
+import io
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pytest
+import rasterio
+from affine import Affine
+from PIL import Image
+
+from src.data_engine.no2_sampler import sample_raster_batch
+from src.ui_components import tile_server
+from src.ui_components.no2_overlay import colorize
+from src.ui_components.tile_server import TileHandler, TileRenderer, tile_pixel_centers
+
+# z16 tile containing (12.99°N, 80.02°E); its pixels are far finer than the raster's
+Z, X, Y = 16, 47335, 30382
+
+
+def write_no2(path, arr):
+    with rasterio.open(
+        path, "w", driver="GTiff", width=arr.shape[1], height=arr.shape[0], count=1, dtype="float32",
+        crs="EPSG:4326", transform=Affine(0.001, 0.0, 80.0, 0.0, -0.001, 13.0), nodata=np.nan,
+    ) as dst:
+        dst.write(arr.astype("float32"), 1)
+
+
+@pytest.fixture
+def renderer(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    arr = np.linspace(5e-5, 2e-4, 40 * 50).reshape(40, 50)
+    arr[:3, :3] = np.nan
+    write_no2(data / "NO2_Test.tif", arr)
+    return TileRenderer(tile_dir=tmp_path / "tiles", data_dir=data, mosaic_dir=tmp_path / "mosaic")
+
+
+def decode(png):
+    return np.asarray(Image.open(io.BytesIO(png)))
+
+
+def test_tile_pixel_centers_span_the_tile():
+    lats, lons = tile_pixel_centers(1, 1, 0)
+    assert lats.shape == lons.shape == (256, 256)
+    assert lons[0, 0] == pytest.approx(180.0 / 512)
+    assert lons[0, -1] == pytest.approx(180.0 - 180.0 / 512)
+    assert np.all(np.diff(lats[:, 0]) < 0) and 0 < lats[-1, 0] < lats[0, 0] < 85.06
+    # The equator is the bottom edge of row 0 tiles at z1
+    assert tile_pixel_centers(1, 0, 1)[0][0, 0] < 0 < lats[-1, 0]
+
+
+def test_rendered_pixels_match_sample_raster_batch(renderer, tmp_path):
+    lats, lons = tile_pixel_centers(Z, X, Y)
+    assert lats.min() > 12.96 and lons.max() < 80.05  # inside the raster
+
+    rgba = decode(renderer.render("NO2_Test", Z, X, Y))
+    vmin, vmax = renderer.limits("NO2_Test")
+    expected = colorize(sample_raster_batch(tmp_path / "data" / "NO2_Test.tif", lats, lons), vmin, vmax)
+    np.testing.assert_array_equal(rgba, expected)
+
+
+def test_layer_lookup_is_cached_and_old_versions_leave_the_disk_cache(renderer, tmp_path, monkeypatch):
+    calls = []
+    glob = tile_server.layer_paths
+    monkeypatch.setattr(tile_server, "layer_paths", lambda *a: (calls.append(1), glob(*a))[1])
+    for _ in range(3):
+        renderer.render("NO2_Test", Z, X, Y)
+    assert len(calls) == 1
+    with pytest.raises(KeyError):
+        renderer.render("NO2_Missing", Z, X, Y)
+    assert len(calls) == 2
+
+    path = tmp_path / "data" / "NO2_Test.tif"
+    old = list((tmp_path / "tiles" / "NO2_Test").iterdir())
+    write_no2(path, np.full((40, 50), 1e-4))
+    stamp = os.stat(path).st_mtime_ns + 10 ** 9
+    os.utime(path, ns=(stamp, stamp))
+    renderer.render("NO2_Test", Z, X, Y)
+    new = list((tmp_path / "tiles" / "NO2_Test").iterdir())
+    assert len(old) == len(new) == 1 and old != new
+
+
+def test_http_status_for_unknown_layers_and_render_errors(renderer, monkeypatch):
+    handler = type("Handler", (TileHandler,), {"renderer": renderer})
+    server = tile_server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}/tiles"
+    try:
+        with urllib.request.urlopen(f"{base}/NO2_Test/{Z}/{X}/{Y}.png") as resp:
+            assert resp.status == 200 and resp.headers["Content-Type"] == "image/png"
+        with pytest.raises(urllib.error.HTTPError) as err:
+            urllib.request.urlopen(f"{base}/NO2_Missing/0/0/0.png")
+        assert err.value.code == 404
+
+        monkeypatch.setattr(renderer, "_render", lambda *a: 1 / 0)
+        with pytest.raises(urllib.error.HTTPError) as err:
+            urllib.request.urlopen(f"{base}/NO2_Test/15/0/0.png")
+        assert err.value.code == 500
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from src.ai_core.trend_model import fit_trend, get_trend_rasters
+
+HOURS = [-720.0, -500.0, -168.0, -24.0, 0.0]
+
+
+def test_matches_polyfit_per_pixel_including_gaps(make_cube):
+    rng = np.random.default_rng(0)
+    data = rng.normal(1e-4, 2e-5, (5, 6, 7)).astype("float32")
+    data[1, 0, :3] = np.nan
+    fit = fit_trend(make_cube(data, HOURS))
+
+    for row, col in [(3, 4), (0, 1)]:
+        y = data[:, row, col].astype("float64")
+        keep = ~np.isnan(y)
+        slope, intercept = np.polyfit(np.array(HOURS)[keep], y[keep], 1)
+        assert fit.slope[row, col] == pytest.approx(slope, rel=1e-4)
+        assert fit.intercept[row, col] == pytest.approx(intercept, rel=1e-4)
+
+
+def test_exact_line_has_zero_residual_and_extrapolates(make_cube):
+    hours = np.array(HOURS)
+    data = (1e-4 + 2e-8 * hours)[:, None, None] * np.ones((1, 2, 2))
+    data[:, 1, 1] = np.nan
+    fit = fit_trend(make_cube(data, HOURS))
+
+    assert fit.residual_variance[0, 0] == pytest.approx(0.0, abs=1e-15)
+    assert fit.predict(24.0)[0, 0] == pytest.approx(1e-4 + 2e-8 * 24, rel=1e-4)
+    assert np.isnan(fit.slope[1, 1])
+
+
+def test_many_layers_with_late_gaps(make_cube):
+    hours = np.arange(-69.0, 1.0) * 24.0
+    rng = np.random.default_rng(2)
+    data = (1e-4 + 1e-8 * hours)[:, None, None] + rng.normal(0, 1e-6, (70, 3, 4))
+    data[66, 0, 0] = np.nan
+    data[[3, 68], 1, 2] = np.nan
+    fit = fit_trend(make_cube(data, hours))
+
+    for row, col in [(0, 0), (1, 2), (2, 3)]:
+        y = data[:, row, col]
+        keep = ~np.isnan(y)
+        slope, _ = np.polyfit(hours[keep], y[keep], 1)
+        assert fit.slope[row, col] == pytest.approx(slope, rel=1e-3)
+
+
+def test_refit_only_replaces_the_same_period(make_cube, tmp_path):
+    rng = np.random.default_rng(3)
+    cube = make_cube(rng.normal(1e-4, 2e-5, (5, 4, 4)), HOURS)
+    linear = get_trend_rasters(cube, None, tmp_path)
+    seasonal = get_trend_rasters(cube, 168.0, tmp_path)
+
+    newer = make_cube(rng.normal(1e-4, 2e-5, (5, 4, 4)), HOURS)
+    newer.meta["sources"] = {"Recent": ["x", 1]}
+    relinear = get_trend_rasters(newer, None, tmp_path)
+
+    assert all(p.exists() for p in seasonal.values())
+    assert all(p.exists() for p in relinear.values())
+    assert not any(p.exists() for p in linear.values())
@@ -0,0 +1,75 @@
+import numpy as np
+
+from src.ai_core import whatif
+from src.ai_core.breathability import breathability_index
+from src.ai_core.whatif import (
+    LEVERS, MIN_POOL_DRAWS, PERCENTILES, _simulate, cheapest_package, monte_carlo, pareto_frontier,
+    policy_reduction, sweep, uncertainty_for,
+)
+
+
+def test_sweep_matches_single_package_math():
+    result = sweep(1.8e-4)
+    assert len(result.cost) == 21 * 11 * 13
+
+    i = 1234
+    levels = {name: result.levels[name][i] for name in result.levels}
+    expected = max(1.8e-4 - policy_reduction(levels), 0.0)
+    assert result.no2[i] == expected
+    assert result.breathability[i] == breathability_index(expected)
+    assert result.cost[i] == sum(l.cost_per_unit * levels[l.name] for l in LEVERS)
+
+
+def test_frontier_is_non_dominated_and_cheapest_hits_target():
+    result = sweep(1.8e-4)
+    frontier = pareto_frontier(result.cost, result.breathability)
+    assert np.all(np.diff(result.cost[frontier]) > 0)
+    assert np.all(np.diff(result.breathability[frontier]) > 0)
+    for i in frontier:
+        dominated = (result.cost <= result.cost[i]) & (result.breathability > result.breathability[i])
+        assert not dominated.any()
+
+    best = cheapest_package(result, 40)
+    reach = result.breathability >= 40
+    assert result.breathability[best] >= 40
+    assert result.cost[best] == result.cost[reach].min()
+    assert cheapest_package(result, 101) is None
+
+
+def test_monte_carlo_bands_are_ordered_and_memoised():
+    levels = {"trees": 500, "buses": 10, "trucks": 4}
+    bands = monte_carlo(1.1e-4, levels, draws=50_000)
+    assert np.all(np.diff(bands.no2) > 0)
+    assert np.all(np.diff(bands.breathability) > 0)
+    # The point estimate sits inside the 90% band
+    point = 1.1e-4 - policy_reduction(levels)
+    assert bands.no2[0] < point < bands.no2[-1]
+
+    still = monte_carlo(1.1e-4, {"trees": 0, "buses": 0, "trucks": 0}, draws=1000, no2_std=0.0)
+    np.testing.assert_allclose(still.no2, 1.1e-4, rtol=1e-6)
+
+    first = uncertainty_for((13.05, 80.25), 1.1e-4, levels, draws=10_000)
+    assert uncertainty_for((13.05, 80.25), 1.1e-4, dict(levels), draws=10_000) is first
+    # New raster values at the same point are not served from the memo
+    assert uncertainty_for((13.05, 80.25), 1.3e-4, levels, draws=10_000) is not first
+    assert uncertainty_for((13.05, 80.25), 1.1e-4, levels, no2_std=2e-5, draws=10_000) is not first
+    nan_std = uncertainty_for((13.05, 80.25), 1.1e-4, levels, no2_std=float("nan"), draws=10_000)
+    assert uncertainty_for((13.05, 80.25), 1.1e-4, levels, no2_std=float("nan"), draws=10_000) is nan_std
+
+
+def test_monte_carlo_on_the_process_pool_is_reproducible():
+    levels = {"trees": 500, "buses": 10, "trucks": 4}
+    draws = MIN_POOL_DRAWS
+    first = monte_carlo(1.1e-4, levels, draws=draws, seed=7, workers=2)
+    again = monte_carlo(1.1e-4, levels, draws=draws, seed=7, workers=2)
+    np.testing.assert_array_equal(first.no2, again.no2)
+    assert first.p_high_risk == again.p_high_risk
+    assert first.draws == draws
+    assert whatif._pool is not None
+
+    # Same chunks as the pool ran, simulated in this process
+    reductions = np.array([l.reduction_per_unit * levels[l.name] for l in LEVERS])
+    spreads = np.array([l.reduction_spread for l in LEVERS])
+    seeds = np.random.SeedSequence(7).spawn(2)
+    local = np.concatenate([_simulate(1.1e-4, 1.1e-5, reductions, spreads, draws // 2, s) for s in seeds])
+    np.testing.assert_allclose(first.no2, np.percentile(local, PERCENTILES))
@@ -0,0 +1,78 @@
+import json
+
+import numpy as np
+import pytest
+import rasterio
+from affine import Affine
+from rasterio.features import rasterize
+
+from src.data_engine import zonal_stats as zs
+
+
+def box(west, south, east, north):
+    return {"type": "Polygon", "coordinates": [[
+        [west, south], [east, south], [east, north], [west, north], [west, south],
+    ]]}
+
+
+@pytest.fixture
+def scene(tmp_path, monkeypatch):
+    monkeypatch.setattr(zs, "ZONE_CACHE_DIR", tmp_path / "zones")
+    rng = np.random.default_rng(0)
+    values = rng.normal(1e-4, 3e-5, (30, 40)).astype("float32")
+    values[5:8, 5:9] = np.nan
+    transform = Affine(0.01, 0.0, 80.0, 0.0, -0.01, 13.0)
+    raster = tmp_path / "no2.tif"
+    with rasterio.open(
+        raster, "w", driver="GTiff", width=40, height=30, count=1, dtype="float32",
+        crs="EPSG:4326", transform=transform, nodata=np.nan,
+    ) as dst:
+        dst.write(values, 1)
+
+    geometries = [box(80.0, 12.85, 80.15, 13.0), box(80.2, 12.75, 80.4, 12.9), box(80.05, 12.72, 80.1, 12.8)]
+    zones = tmp_path / "zones.geojson"
+    zones.write_text(json.dumps({"type": "FeatureCollection", "features": [
+        {"type": "Feature", "properties": {"name": name}, "geometry": geom}
+        for name, geom in zip(["Alpha", "Beta", "Alpha"], geometries)
+    ]}), encoding="utf-8")
+    return raster, zones, values.astype("float64"), geometries, transform
+
+
+def test_matches_brute_force_reduction_per_zone(scene):
+    raster, zones, values, geometries, transform = scene
+    stats = zs.zonal_stats(raster, zones, percentiles=(50, 90), hotspot=1.2e-4)
+
+    # A repeated name gets its own row instead of overwriting the first
+    assert list(stats) == ["Alpha", "Beta", "Alpha #2"]
+    for name, geom in zip(stats, geometries):
+        mask = rasterize([(geom, 1)], out_shape=values.shape, transform=transform).astype(bool)
+        expected = values[mask & ~np.isnan(values)]
+        row = stats[name]
+        assert row["pixels"] == expected.size
+        assert row["hotspot_pixels"] == int((expected > 1.2e-4).sum())
+        assert row["mean"] == pytest.approx(expected.mean(), rel=1e-6)
+        assert row["min"] == pytest.approx(expected.min())
+        assert row["max"] == pytest.approx(expected.max())
+        assert row["p50"] == pytest.approx(np.percentile(expected, 50), rel=1e-6)
+        assert row["p90"] == pytest.approx(np.percentile(expected, 90), rel=1e-6)
+
+
+def test_label_grid_parses_the_zone_file_only_when_it_changes(scene, monkeypatch):
+    raster, zones, *_ = scene
+    calls = []
+    load_zones = zs.load_zones
+    monkeypatch.setattr(zs, "load_zones", lambda path: calls.append(path) or load_zones(path))
+
+    grid, names = zs.label_grid(raster, zones)
+    again, _ = zs.label_grid(raster, zones)
+    assert again is grid
+    assert len(calls) == 1
+
+    # A rewritten file (new size and mtime) is parsed again and re-rasterized
+    data = json.loads(zones.read_text(encoding="utf-8"))
+    data["features"] = data["features"][:1]
+    zones.write_text(json.dumps(data), encoding="utf-8")
+    grid2, names2 = zs.label_grid(raster, zones)
+    assert len(calls) == 2
+    assert names2 == ["Alpha"]
+    assert set(np.unique(grid2)) == {0, 1}